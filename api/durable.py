@@ -0,0 +1,199 @@
+"""Write-ahead log and snapshots for MemoryStore
+
+The data directory holds generations of files:
+
+    snapshot-<gen>.json   full store state when log generation <gen> began
+    wal-<gen>.log         one JSON record per mutation, appended in order
+
+Startup loads the newest complete snapshot, replays its log and any later
+ones, then compacts: a fresh snapshot is written and older files removed.
+A torn last line from a crash mid-write is ignored. Every append reaches
+the OS immediately; fsync is batched, either every `fsync_batch` records
+or every `fsync_interval` seconds, whichever comes first.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _fsync_dir(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class DurableLog:
+    """Persists a MemoryStore's mutations so it survives restarts"""
+
+    def __init__(self, directory, fsync_batch=32, fsync_interval=1.0, snapshot_every=10000):
+        self.directory = directory
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self._store = None
+        self._file = None
+        self._generation = 0
+        self._since_snapshot = 0
+        self._unsynced = 0
+        self._io_lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._flusher = None
+
+    def _path(self, kind, generation):
+        extension = 'json' if kind == 'snapshot' else 'log'
+        return os.path.join(self.directory, f"{kind}-{generation:08d}.{extension}")
+
+    def _generations(self, kind):
+        prefix = f"{kind}-"
+        found = []
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and not name.endswith('.tmp'):
+                try:
+                    found.append(int(name[len(prefix):].split('.')[0]))
+                except ValueError:
+                    continue
+        return sorted(found)
+
+    # Recovery
+
+    def open(self, store):
+        """Recover store from disk, then log its mutations from now on"""
+        os.makedirs(self.directory, exist_ok=True)
+        started = time.perf_counter()
+
+        base = 0
+        for generation in reversed(self._generations('snapshot')):
+            try:
+                with open(self._path('snapshot', generation)) as f:
+                    store.restore(json.load(f))
+                base = generation
+                break
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable snapshot {generation}: {e}")
+
+        replayed = 0
+        for generation in self._generations('wal'):
+            if generation >= base:
+                replayed += self._replay(store, self._path('wal', generation))
+
+        self._store = store
+        self._generation = max([base] + self._generations('wal'))
+        self._compact()
+        store.log = self
+
+        if self.fsync_interval and self.fsync_batch != 1:
+            self._flusher = threading.Thread(target=self._flush_loop, name='wal-fsync', daemon=True)
+            self._flusher.start()
+
+        logger.info(
+            f"Loaded {len(store.users)} users and {len(store.entries)} entries "
+            f"({replayed} log records) in {time.perf_counter() - started:.3f}s"
+        )
+        return store
+
+    @staticmethod
+    def _replay(store, path):
+        count = 0
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Only a crash mid-append leaves a partial line, and it is last
+                    logger.warning(f"Ignoring torn record at end of {os.path.basename(path)}")
+                    break
+                store.apply(record)
+                count += 1
+        return count
+
+    # Logging
+
+    def append(self, record):
+        """Write one mutation; called by the store with its lock held"""
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self._io_lock:
+            self._file.write(line)
+            self._file.flush()
+            self._unsynced += 1
+            if self.fsync_batch and self._unsynced >= self.fsync_batch:
+                self._sync()
+        self._since_snapshot += 1
+        if self.snapshot_every and self._since_snapshot >= self.snapshot_every:
+            self._compact(background=True)
+
+    def _sync(self):
+        if self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.fsync_interval)
+            with self._io_lock:
+                if self._file is None:
+                    return
+                self._sync()
+
+    # Compaction
+
+    def _compact(self, background=False):
+        """Start a new log generation and snapshot the state it starts from
+
+        Runs with the store lock held (from append, or before logging starts),
+        so the snapshot matches the generation boundary exactly. Writing the
+        snapshot can happen in the background; the previous log is kept
+        until it is durable.
+        """
+        state = self._store.snapshot_state()
+        with self._io_lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+            self._generation += 1
+            self._file = open(self._path('wal', self._generation), 'a', encoding='utf-8')
+            _fsync_dir(self.directory)
+        self._since_snapshot = 0
+
+        if background:
+            threading.Thread(
+                target=self._write_snapshot, args=(state, self._generation),
+                name='wal-snapshot', daemon=True
+            ).start()
+        else:
+            self._write_snapshot(state, self._generation)
+
+    def _write_snapshot(self, state, generation):
+        with self._snapshot_lock:
+            path = self._path('snapshot', generation)
+            tmp_path = path + '.tmp'
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, separators=(',', ':'))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+                _fsync_dir(self.directory)
+            except OSError as e:
+                logger.error(f"Snapshot {generation} failed: {e}")
+                return
+
+            for kind in ('snapshot', 'wal'):
+                for old in self._generations(kind):
+                    if old < generation:
+                        os.remove(self._path(kind, old))
+
+    def close(self):
+        """Flush and fsync the log; the store stops logging"""
+        if self._store is not None:
+            self._store.log = None
+        with self._io_lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
@@ -2,9 +2,13 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+import atexit
 import json
+import math
 import os
 from datetime import datetime, timedelta
+from durable import DurableLog
+from store import MemoryStore
 
 app = Flask(__name__)
 
@@ -16,10 +20,21 @@ app.config['JWT_SECRET_KEY'] = 'oI4WuOz_wVv-ZpJlI__QtihZmuxZfgRAotehuIDtC-A'
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
 jwt = JWTManager(app)
 
-# Simple in-memory storage (for demo purposes)
-users = {}
-entries = {}
-user_counter = 1
+# Indexed in-memory storage (for demo purposes)
+store = MemoryStore()
+
+# Optional durability: set STORE_DATA_DIR to a persistent volume to keep
+# users and entries across restarts (write-ahead log plus snapshots)
+STORE_DATA_DIR = os.getenv('STORE_DATA_DIR')
+if STORE_DATA_DIR:
+    store_log = DurableLog(
+        STORE_DATA_DIR,
+        fsync_batch=int(os.getenv('STORE_FSYNC_BATCH', '32')),
+        fsync_interval=float(os.getenv('STORE_FSYNC_INTERVAL', '1.0')),
+        snapshot_every=int(os.getenv('STORE_SNAPSHOT_EVERY', '10000'))
+    )
+    store_log.open(store)
+    atexit.register(store_log.close)
 
 @app.route('/')
 def root():
@@ -44,23 +59,12 @@ def register():
         if not username or not password or not email:
             return jsonify({'error': 'Username, password, and email required'}), 400
             
-        # Check if user exists
-        for user in users.values():
-            if user['username'] == username or user['email'] == email:
-                return jsonify({'error': 'User already exists'}), 400
-        
-        global user_counter
-        user_id = user_counter
-        user_counter += 1
-        
-        users[user_id] = {
-            'id': user_id,
-            'username': username,
-            'password': password,  # In real app, hash this!
-            'email': email
-        }
+        # In real app, hash the password!
+        user = store.add_user(username, email, password)
+        if user is None:
+            return jsonify({'error': 'User already exists'}), 400
         
-        return jsonify({'message': 'User registered successfully', 'user_id': user_id}), 201
+        return jsonify({'message': 'User registered successfully', 'user_id': user['id']}), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -75,13 +79,9 @@ def login():
             return jsonify({'error': 'Username and password required'}), 400
         
         # Find user
-        user = None
-        for u in users.values():
-            if u['username'] == username and u['password'] == password:
-                user = u
-                break
+        user = store.get_user_by_username(username)
                 
-        if not user:
+        if not user or user['password'] != password:
             return jsonify({'error': 'Invalid credentials'}), 401
         
         access_token = create_access_token(identity=str(user['id']))
@@ -97,52 +97,86 @@ def login():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def number_field(data, key, default):
+    """data[key] as a finite number, or default when absent; ValueError otherwise"""
+    value = data.get(key)
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        raise ValueError(f"{key} must be a number")
+    if not isinstance(value, (int, float)):
+        try:
+            value = int(value) if str(value).lstrip('-').isdigit() else float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{key} must be a number")
+    if not math.isfinite(value):
+        raise ValueError(f"{key} must be a number")
+    return value
+
+def date_field(data, key):
+    """data[key] as an ISO YYYY-MM-DD string, or None when absent; ValueError otherwise"""
+    value = data.get(key)
+    if value is None or value == '':
+        return None
+    try:
+        if not isinstance(value, str) or len(value) != 10:
+            raise ValueError
+        datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f"{key} must be a YYYY-MM-DD date")
+    return value
+
 @app.route('/api/v1/entries', methods=['POST'])
 @jwt_required()
 def create_entry():
     try:
         user_id = int(get_jwt_identity())
         data = request.get_json()
+        if not isinstance(data, dict):
+            return jsonify({'error': 'JSON object required'}), 400
+        
+        date = date_field(data, 'date')
+        scores = {
+            'mood': number_field(data, 'mood', 5),
+            'energy': number_field(data, 'energy', 5),
+            'focus': number_field(data, 'focus', 5),
+            'creativity': number_field(data, 'creativity', 5),
+            'anxiety': number_field(data, 'anxiety', 0)
+        }
         
         # Calculate THC mg
         method = data.get('method', 'vape')
         thc_mg = 0.0
         
         if method in ['vape', 'smoke']:
-            puffs = float(data.get('puffs', 0))
-            thc_percent = float(data.get('thc_percent', 75))
+            puffs = float(number_field(data, 'puffs', 0))
+            thc_percent = float(number_field(data, 'thc_percent', 75))
             thc_mg = puffs * (thc_percent / 100) * 2.5
         elif method in ['edible', 'tincture']:
-            thc_mg = float(data.get('amount', 0))
+            thc_mg = float(number_field(data, 'amount', 0))
         
-        entry_id = len(entries) + 1
         timestamp = datetime.now().isoformat()
         
-        entry = {
-            'id': entry_id,
-            'user_id': user_id,
+        entry = store.add_entry(user_id, {
             'thc_mg': thc_mg,
             'timestamp': timestamp,
-            'date': data.get('date'),
+            'date': date,
             'time': data.get('time'),
             'method': method,
             'amount': data.get('amount'),
             'puffs': data.get('puffs'),
             'thc_percent': data.get('thc_percent'),
             'strain': data.get('strain'),
-            'mood': data.get('mood', 5),
-            'energy': data.get('energy', 5),
-            'focus': data.get('focus', 5),
-            'creativity': data.get('creativity', 5),
-            'anxiety': data.get('anxiety', 0),
+            **scores,
             'activities': data.get('activities', []),
             'notes': data.get('notes'),
             'created_at': timestamp,
             'updated_at': timestamp
-        }
+        })
         
-        entries[entry_id] = entry
         return jsonify(entry), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -151,9 +185,7 @@ def create_entry():
 def get_entries():
     try:
         user_id = int(get_jwt_identity())
-        user_entries = [entry for entry in entries.values() if entry['user_id'] == user_id]
-        user_entries.sort(key=lambda x: x['timestamp'], reverse=True)
-        return jsonify(user_entries), 200
+        return jsonify(store.user_entries(user_id)), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -162,9 +194,12 @@ def get_entries():
 def get_stats():
     try:
         user_id = int(get_jwt_identity())
-        user_entries = [entry for entry in entries.values() if entry['user_id'] == user_id]
+        # Today and the six days before it, as the main backend's 7d window;
+        # create_entry only accepts ISO dates, so they compare lexically
+        week_start = (datetime.now().date() - timedelta(days=6)).isoformat()
+        sessions, total_thc, mood_sum = store.window_totals(user_id, week_start)
         
-        if not user_entries:
+        if not sessions:
             return jsonify({
                 'weekly_total': 0,
                 'daily_avg': 0,
@@ -172,15 +207,11 @@ def get_stats():
                 'total_sessions': 0
             }), 200
         
-        # Calculate basic stats
-        total_thc = sum(entry['thc_mg'] for entry in user_entries)
-        avg_mood = sum(entry['mood'] for entry in user_entries) / len(user_entries)
-        
         stats = {
             'weekly_total': total_thc,
             'daily_avg': total_thc / 7,
-            'avg_mood': avg_mood,
-            'total_sessions': len(user_entries)
+            'avg_mood': mood_sum / sessions,
+            'total_sessions': sessions
         }
         
         return jsonify(stats), 200
@@ -193,8 +224,7 @@ def delete_entry(entry_id):
     try:
         user_id = int(get_jwt_identity())
         
-        if entry_id in entries and entries[entry_id]['user_id'] == user_id:
-            del entries[entry_id]
+        if store.delete_entry(user_id, entry_id):
             return jsonify({'message': 'Entry deleted successfully'}), 200
         else:
             return jsonify({'error': 'Entry not found'}), 404
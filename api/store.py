@@ -0,0 +1,214 @@
+"""Indexed in-memory storage for the lightweight API in index.py
+
+Users are indexed by id, username and email. Each user's entries are kept
+in a (timestamp, id) ordered index maintained with bisect on insert and
+delete, alongside per-day totals, so listing needs no sort and a stats
+window touches only the days it covers. Ids come from monotonic counters
+and are never reused after a delete.
+
+Mutations are reported to an optional write-ahead log (see durable.py) as
+small records that apply() can replay.
+"""
+import math
+import re
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+_ISO_DAY = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+class MemoryStore:
+    """Thread-safe users and entries with secondary indexes"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.users = {}
+        self.entries = {}
+        self._by_username = {}
+        self._by_email = {}
+        # user_id -> sorted [(timestamp, entry_id)]
+        self._timeline = {}
+        # user_id -> sorted [day] and {day: [sessions, thc_mg, mood_sum]}
+        self._days = {}
+        self._day_totals = {}
+        self._next_user_id = 1
+        self._next_entry_id = 1
+        # Set by DurableLog.open(); receives every mutation as a record
+        self.log = None
+
+    # Users
+
+    def add_user(self, username, email, password):
+        """Create a user; returns None if the username or email is taken"""
+        with self._lock:
+            if username in self._by_username or email in self._by_email:
+                return None
+            user = {
+                'id': self._next_user_id,
+                'username': username,
+                'password': password,
+                'email': email
+            }
+            self._next_user_id += 1
+            self._insert_user(user)
+            self._record({'op': 'user', 'user': user})
+            return user
+
+    def _insert_user(self, user):
+        self.users[user['id']] = user
+        self._by_username[user['username']] = user
+        self._by_email[user['email']] = user
+        self._timeline[user['id']] = []
+        self._days[user['id']] = []
+        self._day_totals[user['id']] = {}
+
+    def get_user_by_username(self, username):
+        return self._by_username.get(username)
+
+    # Entries
+
+    @staticmethod
+    def _entry_day(entry):
+        return entry.get('date') or entry['timestamp'][:10]
+
+    @classmethod
+    def check_entry(cls, fields):
+        """Raise ValueError unless fields can be indexed
+
+        The timeline needs a string timestamp and the day totals an ISO
+        day plus numeric thc_mg and mood; checking first means a bad entry
+        changes nothing instead of leaving the indexes half updated.
+        """
+        if not isinstance(fields.get('timestamp'), str):
+            raise ValueError("timestamp must be a string")
+        day = cls._entry_day(fields)
+        if not isinstance(day, str) or not _ISO_DAY.fullmatch(day):
+            raise ValueError("date must be YYYY-MM-DD")
+        for field in ('thc_mg', 'mood'):
+            value = fields.get(field)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+                raise ValueError(f"{field} must be a number")
+
+    def add_entry(self, user_id, fields):
+        """Store a new entry for user_id and return it with its id
+
+        Raises ValueError (see check_entry) before anything is stored.
+        """
+        self.check_entry(fields)
+        with self._lock:
+            entry = {'id': self._next_entry_id, 'user_id': user_id, **fields}
+            self._next_entry_id += 1
+            self._insert_entry(entry)
+            self._record({'op': 'entry', 'entry': entry})
+            return entry
+
+    def _insert_entry(self, entry):
+        user_id = entry['user_id']
+        self.entries[entry['id']] = entry
+        insort(self._timeline.setdefault(user_id, []), (entry['timestamp'], entry['id']))
+        self._adjust_day(user_id, entry, 1)
+
+    def delete_entry(self, user_id, entry_id):
+        """Delete one of user_id's entries; False if there is no such entry"""
+        with self._lock:
+            entry = self.entries.get(entry_id)
+            if entry is None or entry['user_id'] != user_id:
+                return False
+            self._remove_entry(entry)
+            self._record({'op': 'delete', 'user_id': user_id, 'id': entry_id})
+            return True
+
+    def _remove_entry(self, entry):
+        user_id = entry['user_id']
+        del self.entries[entry['id']]
+        timeline = self._timeline[user_id]
+        del timeline[bisect_left(timeline, (entry['timestamp'], entry['id']))]
+        self._adjust_day(user_id, entry, -1)
+
+    def _adjust_day(self, user_id, entry, sign):
+        day = self._entry_day(entry)
+        totals = self._day_totals.setdefault(user_id, {})
+        days = self._days.setdefault(user_id, [])
+        current = totals.get(day)
+        if current is None:
+            current = totals[day] = [0, 0.0, 0]
+            insort(days, day)
+        current[0] += sign
+        current[1] += sign * entry['thc_mg']
+        current[2] += sign * entry['mood']
+        if current[0] <= 0:
+            del totals[day]
+            del days[bisect_left(days, day)]
+
+    def user_entries(self, user_id):
+        """A user's entries, newest first"""
+        with self._lock:
+            return [self.entries[entry_id] for _, entry_id in reversed(self._timeline.get(user_id, []))]
+
+    def window_totals(self, user_id, start_day, end_day=None):
+        """(sessions, thc_mg, mood_sum) for entries dated start_day..end_day
+
+        Days are ISO strings, compared lexically; end_day defaults to open.
+        """
+        with self._lock:
+            days = self._days.get(user_id, [])
+            totals = self._day_totals.get(user_id, {})
+            lo = bisect_left(days, start_day)
+            hi = len(days) if end_day is None else bisect_right(days, end_day)
+            sessions, thc_mg, mood_sum = 0, 0.0, 0
+            for day in days[lo:hi]:
+                day_sessions, day_thc, day_mood = totals[day]
+                sessions += day_sessions
+                thc_mg += day_thc
+                mood_sum += day_mood
+            return sessions, thc_mg, mood_sum
+
+    # Persistence
+
+    def _record(self, record):
+        if self.log is not None:
+            self.log.append(record)
+
+    def apply(self, record):
+        """Replay one logged mutation without logging it again"""
+        with self._lock:
+            op = record['op']
+            if op == 'user':
+                user = record['user']
+                self._insert_user(user)
+                self._next_user_id = max(self._next_user_id, user['id'] + 1)
+            elif op == 'entry':
+                entry = record['entry']
+                self._insert_entry(entry)
+                self._next_entry_id = max(self._next_entry_id, entry['id'] + 1)
+            elif op == 'delete':
+                entry = self.entries.get(record['id'])
+                if entry is not None and entry['user_id'] == record['user_id']:
+                    self._remove_entry(entry)
+            else:
+                raise ValueError(f"Unknown log record {op!r}")
+
+    def snapshot_state(self):
+        """Point-in-time copy of the primary data; indexes are rebuilt on restore
+
+        Users and entries are never mutated in place, so a shallow copy is a
+        consistent snapshot. Taken from inside a log append (as DurableLog
+        does), it lines up exactly with that log position.
+        """
+        with self._lock:
+            return {
+                'next_user_id': self._next_user_id,
+                'next_entry_id': self._next_entry_id,
+                'users': list(self.users.values()),
+                'entries': list(self.entries.values()),
+            }
+
+    def restore(self, state):
+        """Load a snapshot_state() into an empty store"""
+        with self._lock:
+            for user in state['users']:
+                self._insert_user(user)
+            for entry in state['entries']:
+                self._insert_entry(entry)
+            self._next_user_id = state['next_user_id']
+            self._next_entry_id = state['next_entry_id']
@@ -0,0 +1,314 @@
+"""Dictionary-encoded activities and per-user, per-activity rollups
+
+Entries keep the activity strings the user chose in entries.activities for
+display, and the same set as sorted catalog ids in entries.activity_ids.
+The (user_id, activity_ids) GIN index answers containment filters such as
+"sessions where I was gaming" without scanning the user's history.
+activity_rollups holds sessions, THC total and effect-score sums per
+(user_id, activity_id) and activity_pairs counts how often two activities
+share a session; both are adjusted in the same transaction as each entry
+write, so the breakdown endpoint never touches entries. The tables are
+created by migration 7 in migrations.py.
+"""
+
+ACTIVITY_SORTS = {
+    'sessions': 'r.sessions DESC',
+    'thc_mg': 'r.thc_mg_total DESC',
+    'mood': 'r.mood_sum::numeric / r.sessions DESC',
+    'energy': 'r.energy_sum::numeric / r.sessions DESC',
+    'focus': 'r.focus_sum::numeric / r.sessions DESC',
+    'creativity': 'r.creativity_sum::numeric / r.sessions DESC',
+    'anxiety': 'r.anxiety_sum::numeric / r.sessions ASC',
+}
+
+MATCH_MODES = ('all', 'any')
+
+MAX_FILTER_ACTIVITIES = 10
+
+# Co-occurring activities listed per activity in the breakdown
+PAIRED_LIMIT = 3
+
+MAX_STATS_LIMIT = 500
+
+_ROLLUP_COLUMNS = """
+    INSERT INTO activity_rollups (
+        user_id, activity_id, sessions, thc_mg_total,
+        mood_sum, energy_sum, focus_sum, creativity_sum, anxiety_sum
+    )
+"""
+
+_ADD_ON_CONFLICT = """
+    ON CONFLICT (user_id, activity_id) DO UPDATE SET
+        sessions = activity_rollups.sessions + EXCLUDED.sessions,
+        thc_mg_total = activity_rollups.thc_mg_total + EXCLUDED.thc_mg_total,
+        mood_sum = activity_rollups.mood_sum + EXCLUDED.mood_sum,
+        energy_sum = activity_rollups.energy_sum + EXCLUDED.energy_sum,
+        focus_sum = activity_rollups.focus_sum + EXCLUDED.focus_sum,
+        creativity_sum = activity_rollups.creativity_sum + EXCLUDED.creativity_sum,
+        anxiety_sum = activity_rollups.anxiety_sum + EXCLUDED.anxiety_sum
+"""
+
+_PAIR_COLUMNS = "INSERT INTO activity_pairs (user_id, activity_id, other_id, sessions)"
+
+_PAIR_ON_CONFLICT = """
+    ON CONFLICT (user_id, activity_id, other_id) DO UPDATE SET
+        sessions = activity_pairs.sessions + EXCLUDED.sessions
+"""
+
+_BATCH_CHUNK = 1000
+
+
+def normalize(name):
+    """Catalog key for an activity: 'Gaming ' and 'gaming' match"""
+    if not isinstance(name, str):
+        return None
+    return ' '.join(name.casefold().split())[:100] or None
+
+
+def display_name(name):
+    """Tidied spelling stored the first time an activity is seen"""
+    return ' '.join(name.split())[:100]
+
+
+def lookup(cur, names):
+    """Catalog ids of existing activities; returns {normalized: activity_id}"""
+    keys = list({key for key in map(normalize, names) if key is not None})
+    if not keys:
+        return {}
+    cur.execute("SELECT normalized, id FROM activities WHERE normalized = ANY(%s)", (keys,))
+    return dict(cur.fetchall())
+
+
+def resolve_many(cur, names):
+    """Resolve activity names, adding unseen ones; returns {normalized: activity_id}"""
+    spellings = {}
+    for name in names:
+        key = normalize(name)
+        if key is not None:
+            spellings.setdefault(key, display_name(name))
+    if not spellings:
+        return {}
+
+    ids = lookup(cur, list(spellings))
+    missing = [key for key in spellings if key not in ids]
+    if missing:
+        # A no-op DO UPDATE makes RETURNING yield ids for rows that already exist
+        values_sql = ', '.join(['(%s, %s)'] * len(missing))
+        params = [value for key in missing for value in (spellings[key], key)]
+        cur.execute(f"""
+            INSERT INTO activities (name, normalized) VALUES {values_sql}
+            ON CONFLICT (normalized) DO UPDATE SET normalized = EXCLUDED.normalized
+            RETURNING normalized, id
+        """, tuple(params))
+        ids.update(cur.fetchall())
+    return ids
+
+
+def encode(catalog, names):
+    """Sorted, de-duplicated activity ids for one entry's activity names"""
+    if not names:
+        return []
+    return sorted({catalog[key] for key in map(normalize, names) if key in catalog})
+
+
+def resolve(cur, names):
+    """activity_ids for one entry's activity names, adding unseen ones"""
+    return encode(resolve_many(cur, names or []), names)
+
+
+def _pairs(activity_ids):
+    return [
+        (first, second)
+        for i, first in enumerate(activity_ids)
+        for second in activity_ids[i + 1:]
+    ]
+
+
+def _write(cur, user_id, totals, pair_counts):
+    """Upsert {activity_id: [sessions, thc_mg, *effect sums]} and {(a, b): sessions}"""
+    items = list(totals.items())
+    for start in range(0, len(items), _BATCH_CHUNK):
+        chunk = items[start:start + _BATCH_CHUNK]
+        values_sql = ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s, %s)'] * len(chunk))
+        params = []
+        for activity_id, sums in chunk:
+            params.extend((user_id, activity_id, *sums))
+        cur.execute(f"{_ROLLUP_COLUMNS} VALUES {values_sql} {_ADD_ON_CONFLICT}", tuple(params))
+
+    items = list(pair_counts.items())
+    for start in range(0, len(items), _BATCH_CHUNK):
+        chunk = items[start:start + _BATCH_CHUNK]
+        values_sql = ', '.join(['(%s, %s, %s, %s)'] * len(chunk))
+        params = []
+        for (first, second), sessions in chunk:
+            params.extend((user_id, first, second, sessions))
+        cur.execute(f"{_PAIR_COLUMNS} VALUES {values_sql} {_PAIR_ON_CONFLICT}", tuple(params))
+
+
+def apply_entry(cur, user_id, activity_ids, thc_mg, mood, energy, focus, creativity, anxiety, sign=1):
+    """Add (sign=1) or remove (sign=-1) one entry's contribution to its activity rollups"""
+    if not activity_ids:
+        return
+    activity_ids = sorted(set(activity_ids))
+    sums = [sign, sign * thc_mg, sign * mood, sign * energy, sign * focus, sign * creativity, sign * anxiety]
+    _write(
+        cur, user_id,
+        {activity_id: sums for activity_id in activity_ids},
+        {pair: sign for pair in _pairs(activity_ids)}
+    )
+    if sign < 0:
+        cur.execute("""
+            DELETE FROM activity_rollups
+            WHERE user_id = %s AND activity_id = ANY(%s) AND sessions <= 0
+        """, (user_id, activity_ids))
+        cur.execute("""
+            DELETE FROM activity_pairs
+            WHERE user_id = %s AND activity_id = ANY(%s) AND sessions <= 0
+        """, (user_id, activity_ids))
+
+
+def apply_batch(cur, user_id, rows):
+    """Add many new entries to their activity rollups with multi-row upserts
+
+    rows are (activity_ids, thc_mg, mood, energy, focus, creativity, anxiety);
+    rows without activities are skipped.
+    """
+    totals = {}
+    pair_counts = {}
+    for activity_ids, *measures in rows:
+        if not activity_ids:
+            continue
+        for activity_id in activity_ids:
+            current = totals.setdefault(activity_id, [0, 0, 0, 0, 0, 0, 0])
+            current[0] += 1
+            for i, value in enumerate(measures, start=1):
+                current[i] += value
+        for pair in _pairs(activity_ids):
+            pair_counts[pair] = pair_counts.get(pair, 0) + 1
+    _write(cur, user_id, totals, pair_counts)
+
+
+def entry_filter(cur, names, match='all'):
+    """SQL condition and params restricting entries to the named activities
+
+    Returns (sql, params), or None if no entry can match (an unknown
+    activity under match='all', or no known activities at all).
+    """
+    keys = {key for key in map(normalize, names) if key is not None}
+    ids = lookup(cur, keys)
+    if not ids or (match == 'all' and len(ids) < len(keys)):
+        return None
+    operator = '@>' if match == 'all' else '&&'
+    return f"AND activity_ids {operator} %s::integer[]", (sorted(ids.values()),)
+
+
+def user_activity_stats(cur, user_id, sort='sessions', limit=None):
+    """Per-activity aggregates and top co-occurring activities for one user
+
+    Reads only activity_rollups and activity_pairs.
+    """
+    order = ACTIVITY_SORTS[sort]
+    sql = f"""
+        SELECT a.id, a.name, r.sessions, r.thc_mg_total,
+               r.mood_sum, r.energy_sum, r.focus_sum, r.creativity_sum, r.anxiety_sum
+        FROM activity_rollups r JOIN activities a ON a.id = r.activity_id
+        WHERE r.user_id = %s AND r.sessions > 0
+        ORDER BY {order}, a.name
+    """
+    params = (user_id,)
+    if limit:
+        sql += " LIMIT %s"
+        params += (limit,)
+    cur.execute(sql, params)
+
+    stats = []
+    names = {}
+    for activity_id, name, sessions, total_mg, *sums in cur.fetchall():
+        names[activity_id] = name
+        stats.append({
+            'id': activity_id,
+            'name': name,
+            'sessions': sessions,
+            'total_thc_mg': round(float(total_mg), 2),
+            'avg_thc_mg': round(float(total_mg) / sessions, 2),
+            **{
+                f'avg_{effect}': round(value / sessions, 2)
+                for effect, value in zip(('mood', 'energy', 'focus', 'creativity', 'anxiety'), sums)
+            },
+            'paired_with': []
+        })
+    if not stats:
+        return stats
+
+    cur.execute("""
+        SELECT p.activity_id, p.other_id, p.sessions, a.name, o.name
+        FROM activity_pairs p
+        JOIN activities a ON a.id = p.activity_id
+        JOIN activities o ON o.id = p.other_id
+        WHERE p.user_id = %s AND p.sessions > 0
+        ORDER BY p.sessions DESC
+    """, (user_id,))
+    by_id = {row['id']: row for row in stats}
+    for first, second, sessions, first_name, second_name in cur.fetchall():
+        for this, other, other_name in ((first, second, second_name), (second, first, first_name)):
+            row = by_id.get(this)
+            if row is not None and len(row['paired_with']) < PAIRED_LIMIT:
+                row['paired_with'].append({'id': other, 'name': other_name, 'sessions': sessions})
+    return stats
+
+
+def rebuild(cur, user_id=None):
+    """Encode entries.activities into activity_ids and recompute the rollups
+
+    Resolves every distinct activity spelling in entries (all users, or
+    one), rewrites entries.activity_ids, and rebuilds activity_rollups and
+    activity_pairs from scratch. Returns the number of rollup rows written.
+    The caller commits.
+    """
+    user_filter, params = ("AND user_id = %s", (user_id,)) if user_id is not None else ("", ())
+    cur.execute(f"""
+        SELECT DISTINCT unnest(activities) FROM entries
+        WHERE activities IS NOT NULL {user_filter}
+    """, params)
+    spellings = [row[0] for row in cur.fetchall()]
+    ids = resolve_many(cur, spellings)
+
+    cur.execute("""
+        CREATE TEMPORARY TABLE activity_spellings (
+            spelling TEXT PRIMARY KEY, activity_id INTEGER NOT NULL
+        ) ON COMMIT DROP
+    """)
+    known = [spelling for spelling in spellings if normalize(spelling) in ids]
+    for start in range(0, len(known), _BATCH_CHUNK):
+        chunk = known[start:start + _BATCH_CHUNK]
+        values_sql = ', '.join(['(%s, %s)'] * len(chunk))
+        values = [value for spelling in chunk for value in (spelling, ids[normalize(spelling)])]
+        cur.execute(f"INSERT INTO activity_spellings VALUES {values_sql}", tuple(values))
+    cur.execute(f"""
+        UPDATE entries SET activity_ids = COALESCE((
+            SELECT array_agg(DISTINCT s.activity_id ORDER BY s.activity_id)
+            FROM unnest(entries.activities) AS u(spelling)
+            JOIN activity_spellings s ON s.spelling = u.spelling
+        ), '{{}}')
+        WHERE TRUE {user_filter}
+    """, params)
+
+    cur.execute(f"DELETE FROM activity_rollups WHERE TRUE {user_filter}", params)
+    cur.execute(f"DELETE FROM activity_pairs WHERE TRUE {user_filter}", params)
+    cur.execute(f"""
+        {_ROLLUP_COLUMNS}
+        SELECT user_id, activity_id, COUNT(*), COALESCE(SUM(thc_mg), 0),
+               SUM(mood), SUM(energy), SUM(focus), SUM(creativity), SUM(anxiety)
+        FROM entries, unnest(activity_ids) AS a(activity_id)
+        WHERE user_id IS NOT NULL {user_filter}
+        GROUP BY user_id, activity_id
+    """, params)
+    written = cur.rowcount
+    cur.execute(f"""
+        {_PAIR_COLUMNS}
+        SELECT user_id, a.id, b.id, COUNT(*)
+        FROM entries, unnest(activity_ids) AS a(id), unnest(activity_ids) AS b(id)
+        WHERE a.id < b.id AND user_id IS NOT NULL {user_filter}
+        GROUP BY user_id, a.id, b.id
+    """, params)
+    return written
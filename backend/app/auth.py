@@ -1,12 +1,15 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_async_db
 from app import models
+from password_hashing import HasherBusy, hasher_from_env
+from ttl_cache import TTLCache
 import os
 
 # JWT Configuration
@@ -14,19 +17,55 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing on a bounded worker pool (BCRYPT_ROUNDS, PASSWORD_HASH_*)
+password_hasher = hasher_from_env()
+
+# Short-lived cache of resolved users keyed by token subject (username), so
+# authenticated requests normally skip the users lookup. crud.user
+# invalidates entries when a user is updated or deleted.
+principal_cache = TTLCache(
+    max_size=int(os.getenv("PRINCIPAL_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+)
+PRINCIPAL_FIELDS = ("id", "username", "email", "created_at", "updated_at")
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+def _hasher_busy(e: HasherBusy):
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please retry",
+        headers={"Retry-After": "1"},
+    )
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    try:
+        return password_hasher.verify(plain_password, hashed_password)
+    except HasherBusy as e:
+        raise _hasher_busy(e)
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    try:
+        return password_hasher.hash(password)
+    except HasherBusy as e:
+        raise _hasher_busy(e)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password without blocking the event loop"""
+    try:
+        return await password_hasher.verify_async(plain_password, hashed_password)
+    except HasherBusy as e:
+        raise _hasher_busy(e)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password without blocking the event loop"""
+    try:
+        return await password_hasher.hash_async(password)
+    except HasherBusy as e:
+        raise _hasher_busy(e)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token"""
@@ -58,9 +97,33 @@ def authenticate_user(db: Session, username: str, password: str):
         return False
     if not verify_password(password, user.hashed_password):
         return False
+    # Upgrade hashes made with a different cost factor; best effort
+    if password_hasher.needs_rehash(user.hashed_password):
+        try:
+            user.hashed_password = password_hasher.hash(password)
+            db.commit()
+        except HasherBusy:
+            pass
     return user
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def authenticate_user_async(db: AsyncSession, username: str, password: str):
+    """Authenticate a user over an async session"""
+    result = await db.execute(select(models.User).where(models.User.username == username))
+    user = result.scalars().first()
+    if not user:
+        return False
+    if not await verify_password_async(password, user.hashed_password):
+        return False
+    # Upgrade hashes made with a different cost factor; best effort
+    if password_hasher.needs_rehash(user.hashed_password):
+        try:
+            user.hashed_password = await password_hasher.hash_async(password)
+            await db.commit()
+        except HasherBusy:
+            pass
+    return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     """Get the current authenticated user"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -68,7 +131,18 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         headers={"WWW-Authenticate": "Bearer"},
     )
     username = verify_token(token, credentials_exception)
-    user = db.query(models.User).filter(models.User.username == username).first()
+
+    # Cached principals come back as detached User instances carrying the
+    # public columns only; they are read-only snapshots, not session members.
+    cache_key = (username,)
+    snapshot = principal_cache.get(cache_key)
+    if snapshot is not None:
+        return models.User(**snapshot)
+    generation = principal_cache.generation(username)
+
+    result = await db.execute(select(models.User).where(models.User.username == username))
+    user = result.scalars().first()
     if user is None:
         raise credentials_exception
+    principal_cache.set(cache_key, {name: getattr(user, name) for name in PRINCIPAL_FIELDS}, generation)
     return user
@@ -1,26 +1,212 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from datetime import datetime, timedelta
-from typing import List
+from sqlalchemy import func, desc, asc, tuple_, delete, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
 from app import models
 from app.schemas import entry as entry_schema
+from pagination import NEXT, clamp_page_size, decode_cursor, page_cursors
+import bulk_import
+import os
+import re
+import activities
+import strains
+from ttl_cache import TTLCache
+
+# Per-process cache of get_entry_stats results, keyed by the user's data
+# version so other workers' writes are seen; local writes also invalidate it
+stats_cache = TTLCache(
+    max_size=int(os.getenv("STATS_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("STATS_CACHE_TTL", "30"))
+)
 
 def calculate_thc_mg(data: entry_schema.EntryCreate) -> float:
     """Calculate THC mg based on method"""
     if data.method in ['vape', 'smoke']:
         # Assuming 0.3g per session, each puff ~2.5mg at 75% THC
-        mg_per_puff = (data.thc_percent or 75) / 100 * 2.5
+        thc_percent = 75 if data.thc_percent is None else data.thc_percent
+        mg_per_puff = thc_percent / 100 * 2.5
         return float(data.puffs or 0) * mg_per_puff
     elif data.method in ['edible', 'tincture']:
         return float(data.amount or 0)
     return 0.0
 
-def create_entry(db: Session, entry: entry_schema.EntryCreate, user_id: int):
-    """Create a new entry"""
+ROLLUP_SUMS = ("mood", "energy", "focus", "creativity", "anxiety")
+
+def _entry_day(value) -> date:
+    """entries.date as a date; the model maps the DATE column as a string"""
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+def _rollup_key(db_entry: models.Entry):
+    """Rollup contribution of an entry as (day, method, thc_mg, effect scores)
+
+    Keyed on entries.date like rollups.py and the Flask routes.
+    """
+    return (
+        _entry_day(db_entry.date), db_entry.method, db_entry.thc_mg,
+        tuple(getattr(db_entry, name) for name in ROLLUP_SUMS)
+    )
+
+# %s placeholders and %% escapes in the shared pg8000-style SQL
+_FORMAT_PARAM = re.compile(r"%[s%]")
+
+class _SessionCursor:
+    """Minimal DB-API cursor over a sync Session for the shared catalog modules
+
+    strains.py and activities.py write %s SQL against a
+    cursor. This runs it through session.execute(text(...)) in the
+    session's transaction, so the same helpers work here, and on the async
+    engine inside AsyncSession.run_sync.
+    """
+
+    def __init__(self, session: Session):
+        self._session = session
+        self._result = None
+
+    def execute(self, sql, params=()):
+        counter = iter(range(len(params)))
+        # Parenthesised so a following ::cast isn't read as part of the name
+        bound = _FORMAT_PARAM.sub(
+            lambda m: "%" if m.group(0) == "%%" else f"(:p{next(counter)})", sql
+        )
+        self._result = self._session.execute(
+            text(bound), {f"p{i}": value for i, value in enumerate(params)}
+        )
+
+    def fetchall(self):
+        return [tuple(row) for row in self._result.fetchall()]
+
+    def fetchone(self):
+        row = self._result.fetchone()
+        return tuple(row) if row is not None else None
+
+def _catalog_key(db_entry: models.Entry):
+    """Strain and activity rollup contribution of an entry as
+    (strain_id, activity_ids, thc_mg, effect scores)"""
+    return (
+        db_entry.strain_id, tuple(db_entry.activity_ids or ()), db_entry.thc_mg,
+        tuple(getattr(db_entry, name) for name in ROLLUP_SUMS)
+    )
+
+def _link_catalog(session: Session, db_entry: models.Entry):
+    """Point the entry at its catalog strain and activities, adding unseen ones"""
+    cur = _SessionCursor(session)
+    db_entry.strain_id = strains.resolve(cur, db_entry.strain)
+    db_entry.activity_ids = activities.resolve(cur, db_entry.activities or [])
+
+def _apply_catalog_rollup(session: Session, user_id: int, key, sign: int = 1):
+    """Add or remove an entry's contribution to its strain and activity rollups"""
+    strain_id, activity_ids, thc_mg, scores = key
+    cur = _SessionCursor(session)
+    strains.apply_entry(cur, user_id, strain_id, thc_mg, *scores, sign=sign)
+    activities.apply_entry(cur, user_id, list(activity_ids), thc_mg, *scores, sign=sign)
+
+def _update_catalog(session: Session, user_id: int, db_entry: models.Entry, old_key, relink: bool):
+    """Re-resolve the catalog links after an update and move the rollup contribution"""
+    if relink:
+        _link_catalog(session, db_entry)
+    new_key = _catalog_key(db_entry)
+    if new_key != old_key:
+        _apply_catalog_rollup(session, user_id, old_key, sign=-1)
+        _apply_catalog_rollup(session, user_id, new_key)
+
+def _relinks_catalog(entry_update: entry_schema.EntryUpdate) -> bool:
+    """Whether an update changes the strain or activities, needing new catalog links"""
+    return bool({"strain", "activities"} & entry_update.model_fields_set)
+
+def _bulk_catalog(session: Session, user_id: int, prepared):
+    """Resolve catalog strains and activities for bulk-import rows and add
+    their strain and activity rollups
+
+    Returns (strain_ids, activity_ids) with one item per row, in order.
+    """
+    cur = _SessionCursor(session)
+    catalog = strains.resolve_many(cur, [entry.strain for entry, _, _ in prepared])
+    strain_ids = [catalog.get(strains.normalize(entry.strain)) for entry, _, _ in prepared]
+    activity_catalog = activities.resolve_many(
+        cur, [name for entry, _, _ in prepared for name in entry.activities]
+    )
+    activity_ids = [activities.encode(activity_catalog, entry.activities) for entry, _, _ in prepared]
+
+    strains.apply_batch(cur, user_id, [
+        (strain_id, thc_mg, *(getattr(entry, name) for name in ROLLUP_SUMS))
+        for strain_id, (entry, _, thc_mg) in zip(strain_ids, prepared)
+    ])
+    activities.apply_batch(cur, user_id, [
+        (ids, thc_mg, *(getattr(entry, name) for name in ROLLUP_SUMS))
+        for ids, (entry, _, thc_mg) in zip(activity_ids, prepared)
+    ])
+    return strain_ids, activity_ids
+
+def _rollup_statements(user_id: int, key, sign: int = 1, sessions: int = 1):
+    """Statements that add or remove entries' contribution to a daily rollup row
+
+    key holds summed thc_mg and scores when sessions > 1. Shared by the sync
+    and async CRUD layers; execute them in the entry write's transaction.
+    """
+    day, method, thc_mg, scores = key
+    values = {
+        "user_id": user_id,
+        "day": day,
+        "method": method,
+        "sessions": sign * sessions,
+        "thc_mg_total": sign * thc_mg,
+    }
+    values.update({f"{name}_sum": sign * score for name, score in zip(ROLLUP_SUMS, scores)})
+
+    table = models.EntryRollup.__table__
+    stmt = insert(table).values(**values)
+    counters = ["sessions", "thc_mg_total"] + [f"{name}_sum" for name in ROLLUP_SUMS]
+    statements = [stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.day, table.c.method],
+        set_={name: table.c[name] + stmt.excluded[name] for name in counters}
+    )]
+    if sign < 0:
+        statements.append(delete(table).where(
+            table.c.user_id == user_id,
+            table.c.day == day,
+            table.c.method == method,
+            table.c.sessions <= 0
+        ))
+    return statements
+
+def _apply_rollup(db: Session, user_id: int, key, sign: int = 1, sessions: int = 1):
+    """Add or remove entries' contribution to a daily rollup row"""
+    for statement in _rollup_statements(user_id, key, sign, sessions):
+        db.execute(statement)
+
+def _rollup_totals(prepared):
+    """Sum bulk-import rows into {(day, method): (sessions, thc_mg, scores)}"""
+    totals = {}
+    for entry, timestamp, thc_mg in prepared:
+        key = (_entry_day(entry.date), entry.method)
+        current = totals.setdefault(key, [0, 0.0, [0] * len(ROLLUP_SUMS)])
+        current[0] += 1
+        current[1] += thc_mg
+        for i, name in enumerate(ROLLUP_SUMS):
+            current[2][i] += getattr(entry, name)
+    return {key: (sessions, thc_mg, tuple(scores)) for key, (sessions, thc_mg, scores) in totals.items()}
+
+def _bulk_rows(prepared, user_id: int, strain_ids, activity_ids):
+    """Insert parameters for prepared bulk-import rows"""
+    return [
+        {
+            "user_id": user_id,
+            "thc_mg": thc_mg,
+            "timestamp": timestamp,
+            "strain_id": strain_id,
+            "activity_ids": ids,
+            **entry.model_dump(),
+        }
+        for strain_id, ids, (entry, timestamp, thc_mg) in zip(strain_ids, activity_ids, prepared)
+    ]
+
+def _new_entry(entry: entry_schema.EntryCreate, user_id: int) -> models.Entry:
+    """Build an unsaved Entry with its derived timestamp and thc_mg"""
     timestamp = datetime.fromisoformat(f"{entry.date} {entry.time}")
     thc_mg = calculate_thc_mg(entry)
 
-    db_entry = models.Entry(
+    return models.Entry(
         user_id=user_id,
         thc_mg=thc_mg,
         timestamp=timestamp,
@@ -39,15 +225,97 @@ def create_entry(db: Session, entry: entry_schema.EntryCreate, user_id: int):
         activities=entry.activities,
         notes=entry.notes
     )
+
+def create_entry(db: Session, entry: entry_schema.EntryCreate, user_id: int):
+    """Create a new entry"""
+    db_entry = _new_entry(entry, user_id)
+    _link_catalog(db, db_entry)
     db.add(db_entry)
+    _apply_rollup(db, user_id, _rollup_key(db_entry))
+    _apply_catalog_rollup(db, user_id, _catalog_key(db_entry))
+    _bump_data_version(db, user_id)
     db.commit()
+    stats_cache.invalidate_user(user_id)
     db.refresh(db_entry)
     return db_entry
 
-def get_entries(db: Session, user_id: int, skip: int = 0, limit: int = 100):
-    """Get entries for a user"""
-    return db.query(models.Entry).filter(models.Entry.user_id == user_id)\
-        .order_by(desc(models.Entry.timestamp)).offset(skip).limit(limit).all()
+def _data_version_statement(user_id: int):
+    """Statement marking the user's entries as changed"""
+    return update(models.User).where(models.User.id == user_id).values(
+        data_version=models.User.data_version + 1,
+        data_updated_at=func.timezone("utc", func.now())
+    ).execution_options(synchronize_session=False)
+
+def _data_version_query(user_id: int):
+    """The user's current data version, bumped by every entry write"""
+    return select(models.User.data_version).where(models.User.id == user_id)
+
+def _bump_data_version(db: Session, user_id: int):
+    """Mark the user's entries as changed within the current transaction"""
+    db.execute(_data_version_statement(user_id))
+
+def create_entries_bulk(db: Session, rows: List[Dict[str, Any]], user_id: int, all_or_nothing: bool = False):
+    """Validate and insert many entries in one transaction
+
+    Returns {"inserted": n, "errors": [...]} with per-row errors by index.
+    Rows are written with batched multi-row INSERTs.
+    """
+    prepared, errors = bulk_import.prepare_rows(rows)
+    if not prepared or (errors and all_or_nothing):
+        return {"inserted": 0, "errors": errors}
+
+    strain_ids, activity_ids = _bulk_catalog(db, user_id, prepared)
+    db.execute(insert(models.Entry.__table__), _bulk_rows(prepared, user_id, strain_ids, activity_ids))
+    for (day, method), (sessions, thc_mg, scores) in _rollup_totals(prepared).items():
+        _apply_rollup(db, user_id, (day, method, thc_mg, scores), sessions=sessions)
+
+    _bump_data_version(db, user_id)
+    db.commit()
+    stats_cache.invalidate_user(user_id)
+    return {"inserted": len(prepared), "errors": errors}
+
+def _entries_page_statement(user_id: int, cursor: Optional[str], limit: Optional[int]):
+    """Build the keyset page query; returns (statement, direction, limit)
+
+    Raises pagination.InvalidCursor for malformed cursors or page sizes.
+    """
+    limit = clamp_page_size(limit)
+    stmt = select(models.Entry).where(models.Entry.user_id == user_id)
+    position = tuple_(models.Entry.timestamp, models.Entry.id)
+
+    direction = NEXT
+    if cursor:
+        cursor_ts, cursor_id, direction = decode_cursor(cursor)
+        if direction == NEXT:
+            stmt = stmt.where(position < (cursor_ts, cursor_id))
+        else:
+            stmt = stmt.where(position > (cursor_ts, cursor_id))
+
+    order = desc if direction == NEXT else asc
+    stmt = stmt.order_by(order(models.Entry.timestamp), order(models.Entry.id)).limit(limit + 1)
+    return stmt, direction, limit
+
+def _entries_page(rows, limit: int, direction: str, cursor: Optional[str]):
+    """Trim an over-fetched page and attach its cursors"""
+    entries, next_cursor, prev_cursor = page_cursors(
+        rows, limit, direction, bool(cursor),
+        key=lambda entry: (entry.timestamp, entry.id)
+    )
+    return {
+        "entries": entries,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+        "limit": limit
+    }
+
+def get_entries(db: Session, user_id: int, cursor: Optional[str] = None, limit: Optional[int] = None):
+    """Get a keyset-paginated page of entries for a user, newest first
+
+    Raises pagination.InvalidCursor for malformed cursors or page sizes.
+    """
+    stmt, direction, limit = _entries_page_statement(user_id, cursor, limit)
+    rows = db.execute(stmt).scalars().all()
+    return _entries_page(rows, limit, direction, cursor)
 
 def get_entry(db: Session, entry_id: int, user_id: int):
     """Get a specific entry"""
@@ -56,27 +324,21 @@ def get_entry(db: Session, entry_id: int, user_id: int):
         models.Entry.user_id == user_id
     ).first()
 
-def update_entry(db: Session, entry_id: int, entry_update: entry_schema.EntryUpdate, user_id: int):
-    """Update an entry"""
-    db_entry = db.query(models.Entry).filter(
-        models.Entry.id == entry_id,
-        models.Entry.user_id == user_id
-    ).first()
-
-    if not db_entry:
-        return None
-
-    # Update timestamp if date/time changed
+def _apply_entry_update(db_entry: models.Entry, entry_update: entry_schema.EntryUpdate):
+    """Apply an EntryUpdate to a loaded entry in place"""
+    # Move date, time and timestamp together if date/time changed
     if entry_update.date or entry_update.time:
         new_date = entry_update.date or db_entry.date
         new_time = entry_update.time or db_entry.time
         db_entry.timestamp = datetime.fromisoformat(f"{new_date} {new_time}")
+        db_entry.date = new_date
+        db_entry.time = new_time
 
     # Recalculate THC mg if relevant fields changed
     if (entry_update.method or entry_update.amount or entry_update.puffs or entry_update.thc_percent):
         temp_entry = entry_schema.EntryCreate(
-            date=db_entry.date,
-            time=db_entry.time,
+            date=str(db_entry.date),
+            time=str(db_entry.time),
             method=entry_update.method or db_entry.method,
             amount=entry_update.amount or db_entry.amount,
             puffs=entry_update.puffs or db_entry.puffs,
@@ -97,7 +359,30 @@ def update_entry(db: Session, entry_id: int, entry_update: entry_schema.EntryUpd
         if key not in ['date', 'time', 'method', 'amount', 'puffs', 'thc_percent']:
             setattr(db_entry, key, value)
 
+def update_entry(db: Session, entry_id: int, entry_update: entry_schema.EntryUpdate, user_id: int):
+    """Update an entry"""
+    db_entry = db.query(models.Entry).filter(
+        models.Entry.id == entry_id,
+        models.Entry.user_id == user_id
+    ).first()
+
+    if not db_entry:
+        return None
+
+    old_rollup_key = _rollup_key(db_entry)
+    old_catalog_key = _catalog_key(db_entry)
+
+    _apply_entry_update(db_entry, entry_update)
+
+    new_rollup_key = _rollup_key(db_entry)
+    if new_rollup_key != old_rollup_key:
+        _apply_rollup(db, user_id, old_rollup_key, sign=-1)
+        _apply_rollup(db, user_id, new_rollup_key)
+    _update_catalog(db, user_id, db_entry, old_catalog_key, _relinks_catalog(entry_update))
+
+    _bump_data_version(db, user_id)
     db.commit()
+    stats_cache.invalidate_user(user_id)
     db.refresh(db_entry)
     return db_entry
 
@@ -109,36 +394,56 @@ def delete_entry(db: Session, entry_id: int, user_id: int):
     ).first()
 
     if db_entry:
+        _apply_rollup(db, user_id, _rollup_key(db_entry), sign=-1)
+        _apply_catalog_rollup(db, user_id, _catalog_key(db_entry), sign=-1)
         db.delete(db_entry)
+        _bump_data_version(db, user_id)
         db.commit()
+        stats_cache.invalidate_user(user_id)
         return True
     return False
 
-def get_entry_stats(db: Session, user_id: int):
-    """Get entry statistics for the last 7 days"""
-    week_ago = datetime.utcnow() - timedelta(days=7)
+def _stats_window_start():
+    """First day of the 7-day window: today and the six days before, as in main.py"""
+    return datetime.utcnow().date() - timedelta(days=6)
 
-    # Get entries from last 7 days
-    recent_entries = db.query(models.Entry).filter(
-        models.Entry.user_id == user_id,
-        models.Entry.timestamp >= week_ago
-    ).all()
+def _stats_statement(user_id: int, since):
+    """Totals over the user's rollup rows since a day"""
+    return select(
+        func.coalesce(func.sum(models.EntryRollup.thc_mg_total), 0.0),
+        func.coalesce(func.sum(models.EntryRollup.mood_sum), 0),
+        func.coalesce(func.sum(models.EntryRollup.sessions), 0)
+    ).where(
+        models.EntryRollup.user_id == user_id,
+        models.EntryRollup.day >= since
+    )
 
-    if not recent_entries:
+def _stats_from_totals(totals):
+    total_thc, mood_sum, sessions = float(totals[0]), float(totals[1]), int(totals[2])
+    if not sessions:
         return {
             "weekly_total": 0.0,
             "daily_avg": 0.0,
             "avg_mood": 0.0,
             "total_sessions": 0
         }
-
-    total_thc = sum(entry.thc_mg for entry in recent_entries)
-    avg_daily = total_thc / 7
-    avg_mood = sum(entry.mood for entry in recent_entries) / len(recent_entries)
-
     return {
         "weekly_total": round(total_thc, 1),
-        "daily_avg": round(avg_daily, 1),
-        "avg_mood": round(avg_mood, 1),
-        "total_sessions": len(recent_entries)
+        "daily_avg": round(total_thc / 7, 1),
+        "avg_mood": round(mood_sum / sessions, 1),
+        "total_sessions": sessions
     }
+
+def get_entry_stats(db: Session, user_id: int):
+    """Get entry statistics for the last 7 days from the daily rollups"""
+    week_start = _stats_window_start()
+    version = db.execute(_data_version_query(user_id)).scalar()
+    cache_key = (user_id, "7d", week_start, version)
+    cached = stats_cache.get(cache_key)
+    if cached is not None:
+        return dict(cached)
+    generation = stats_cache.generation(user_id)
+
+    stats = _stats_from_totals(db.execute(_stats_statement(user_id, week_start)).one())
+    stats_cache.set(cache_key, stats, generation)
+    return dict(stats)
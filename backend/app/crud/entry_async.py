@@ -0,0 +1,127 @@
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional
+from app import models
+from app.schemas import entry as entry_schema
+from app.crud.entry import (
+    stats_cache, _apply_catalog_rollup, _apply_entry_update, _bulk_catalog,
+    _bulk_rows, _catalog_key, _data_version_query, _data_version_statement, _entries_page,
+    _entries_page_statement, _link_catalog, _new_entry, _relinks_catalog, _rollup_key,
+    _rollup_statements, _rollup_totals, _stats_from_totals, _stats_statement,
+    _stats_window_start, _update_catalog
+)
+import bulk_import
+
+# Async twins of app.crud.entry. Statements, rollup maintenance and cache
+# invalidation are shared with the sync module; only execution differs.
+# Catalog bookkeeping (strains.py, activities.py) runs through AsyncSession.run_sync.
+
+async def _apply_rollup(db: AsyncSession, user_id: int, key, sign: int = 1, sessions: int = 1):
+    """Add or remove entries' contribution to a daily rollup row"""
+    for statement in _rollup_statements(user_id, key, sign, sessions):
+        await db.execute(statement)
+
+async def _get_owned_entry(db: AsyncSession, entry_id: int, user_id: int):
+    result = await db.execute(select(models.Entry).where(
+        models.Entry.id == entry_id,
+        models.Entry.user_id == user_id
+    ))
+    return result.scalars().first()
+
+async def create_entry(db: AsyncSession, entry: entry_schema.EntryCreate, user_id: int):
+    """Create a new entry"""
+    db_entry = _new_entry(entry, user_id)
+    await db.run_sync(_link_catalog, db_entry)
+    db.add(db_entry)
+    await _apply_rollup(db, user_id, _rollup_key(db_entry))
+    await db.run_sync(_apply_catalog_rollup, user_id, _catalog_key(db_entry))
+    await db.execute(_data_version_statement(user_id))
+    await db.commit()
+    stats_cache.invalidate_user(user_id)
+    await db.refresh(db_entry)
+    return db_entry
+
+async def create_entries_bulk(db: AsyncSession, rows: List[Dict[str, Any]], user_id: int, all_or_nothing: bool = False):
+    """Validate and insert many entries in one transaction
+
+    Returns {"inserted": n, "errors": [...]} with per-row errors by index.
+    """
+    prepared, errors = bulk_import.prepare_rows(rows)
+    if not prepared or (errors and all_or_nothing):
+        return {"inserted": 0, "errors": errors}
+
+    strain_ids, activity_ids = await db.run_sync(_bulk_catalog, user_id, prepared)
+    await db.execute(insert(models.Entry.__table__), _bulk_rows(prepared, user_id, strain_ids, activity_ids))
+    for (day, method), (sessions, thc_mg, scores) in _rollup_totals(prepared).items():
+        await _apply_rollup(db, user_id, (day, method, thc_mg, scores), sessions=sessions)
+
+    await db.execute(_data_version_statement(user_id))
+    await db.commit()
+    stats_cache.invalidate_user(user_id)
+    return {"inserted": len(prepared), "errors": errors}
+
+async def get_entries(db: AsyncSession, user_id: int, cursor: Optional[str] = None, limit: Optional[int] = None):
+    """Get a keyset-paginated page of entries for a user, newest first
+
+    Raises pagination.InvalidCursor for malformed cursors or page sizes.
+    """
+    stmt, direction, limit = _entries_page_statement(user_id, cursor, limit)
+    rows = (await db.execute(stmt)).scalars().all()
+    return _entries_page(rows, limit, direction, cursor)
+
+async def get_entry(db: AsyncSession, entry_id: int, user_id: int):
+    """Get a specific entry"""
+    return await _get_owned_entry(db, entry_id, user_id)
+
+async def update_entry(db: AsyncSession, entry_id: int, entry_update: entry_schema.EntryUpdate, user_id: int):
+    """Update an entry"""
+    db_entry = await _get_owned_entry(db, entry_id, user_id)
+    if not db_entry:
+        return None
+
+    old_rollup_key = _rollup_key(db_entry)
+    old_catalog_key = _catalog_key(db_entry)
+
+    _apply_entry_update(db_entry, entry_update)
+
+    new_rollup_key = _rollup_key(db_entry)
+    if new_rollup_key != old_rollup_key:
+        await _apply_rollup(db, user_id, old_rollup_key, sign=-1)
+        await _apply_rollup(db, user_id, new_rollup_key)
+    await db.run_sync(
+        _update_catalog, user_id, db_entry, old_catalog_key, _relinks_catalog(entry_update)
+    )
+
+    await db.execute(_data_version_statement(user_id))
+    await db.commit()
+    stats_cache.invalidate_user(user_id)
+    await db.refresh(db_entry)
+    return db_entry
+
+async def delete_entry(db: AsyncSession, entry_id: int, user_id: int):
+    """Delete an entry"""
+    db_entry = await _get_owned_entry(db, entry_id, user_id)
+    if db_entry:
+        await _apply_rollup(db, user_id, _rollup_key(db_entry), sign=-1)
+        await db.run_sync(_apply_catalog_rollup, user_id, _catalog_key(db_entry), sign=-1)
+        await db.delete(db_entry)
+        await db.execute(_data_version_statement(user_id))
+        await db.commit()
+        stats_cache.invalidate_user(user_id)
+        return True
+    return False
+
+async def get_entry_stats(db: AsyncSession, user_id: int):
+    """Get entry statistics for the last 7 days from the daily rollups"""
+    week_start = _stats_window_start()
+    version = (await db.execute(_data_version_query(user_id))).scalar()
+    cache_key = (user_id, "7d", week_start, version)
+    cached = stats_cache.get(cache_key)
+    if cached is not None:
+        return dict(cached)
+    generation = stats_cache.generation(user_id)
+
+    stats = _stats_from_totals((await db.execute(_stats_statement(user_id, week_start))).one())
+    stats_cache.set(cache_key, stats, generation)
+    return dict(stats)
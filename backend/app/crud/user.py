@@ -2,7 +2,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from app import models
 from app.schemas import user as user_schema
-from app.auth import get_password_hash
+from app.auth import get_password_hash, principal_cache
 
 def get_user(db: Session, user_id: int):
     """Get a user by ID"""
@@ -38,10 +38,13 @@ def update_user(db: Session, user_id: int, user_update: user_schema.UserBase):
     try:
         db_user = db.query(models.User).filter(models.User.id == user_id).first()
         if db_user:
+            old_username = db_user.username
             for key, value in user_update.dict(exclude_unset=True).items():
                 setattr(db_user, key, value)
             db.commit()
             db.refresh(db_user)
+            principal_cache.invalidate_user(old_username)
+            principal_cache.invalidate_user(db_user.username)
         return db_user
     except IntegrityError:
         db.rollback()
@@ -51,7 +54,9 @@ def delete_user(db: Session, user_id: int):
     """Delete a user"""
     db_user = db.query(models.User).filter(models.User.id == user_id).first()
     if db_user:
+        username = db_user.username
         db.delete(db_user)
         db.commit()
+        principal_cache.invalidate_user(username)
         return True
     return False
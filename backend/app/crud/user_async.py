@@ -0,0 +1,69 @@
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models
+from app.schemas import user as user_schema
+from app.auth import get_password_hash_async, principal_cache
+
+# Async twins of app.crud.user
+
+async def _first_user(db: AsyncSession, *criteria):
+    result = await db.execute(select(models.User).where(*criteria))
+    return result.scalars().first()
+
+async def get_user(db: AsyncSession, user_id: int):
+    """Get a user by ID"""
+    return await _first_user(db, models.User.id == user_id)
+
+async def get_user_by_username(db: AsyncSession, username: str):
+    """Get a user by username"""
+    return await _first_user(db, models.User.username == username)
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    """Get a user by email"""
+    return await _first_user(db, models.User.email == email)
+
+async def create_user(db: AsyncSession, user: user_schema.UserCreate):
+    """Create a new user"""
+    try:
+        hashed_password = await get_password_hash_async(user.password)
+        db_user = models.User(
+            username=user.username,
+            email=user.email,
+            hashed_password=hashed_password
+        )
+        db.add(db_user)
+        await db.commit()
+        await db.refresh(db_user)
+        return db_user
+    except IntegrityError:
+        await db.rollback()
+        return None
+
+async def update_user(db: AsyncSession, user_id: int, user_update: user_schema.UserBase):
+    """Update user information"""
+    try:
+        db_user = await get_user(db, user_id)
+        if db_user:
+            old_username = db_user.username
+            for key, value in user_update.dict(exclude_unset=True).items():
+                setattr(db_user, key, value)
+            await db.commit()
+            await db.refresh(db_user)
+            principal_cache.invalidate_user(old_username)
+            principal_cache.invalidate_user(db_user.username)
+        return db_user
+    except IntegrityError:
+        await db.rollback()
+        return None
+
+async def delete_user(db: AsyncSession, user_id: int):
+    """Delete a user"""
+    db_user = await get_user(db, user_id)
+    if db_user:
+        username = db_user.username
+        await db.delete(db_user)
+        await db.commit()
+        principal_cache.invalidate_user(username)
+        return True
+    return False
@@ -1,8 +1,11 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 from decouple import config
+from querytrace import tracer_from_env
 
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://localhost/cannabis_tracker")
@@ -14,9 +17,38 @@ engine = create_engine(
     echo=False  # Set to True for SQL debugging
 )
 
+# Per-statement timings and slow-query log for both engines (QUERY_SLOW_MS,
+# QUERY_EXPLAIN); asgi.py serves the top statements at /admin/queries
+query_tracer = tracer_from_env()
+query_tracer.instrument_engine(engine)
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _async_url(url: str):
+    """Same database as url, reached through the asyncpg driver"""
+    url = make_url(url)
+    if url.drivername.startswith("postgres"):
+        url = url.set(drivername="postgresql+asyncpg")
+    return url
+
+# Async engine for the FastAPI routers; queries await the network instead
+# of blocking the event loop. ASYNC_DATABASE_URL overrides the derived URL.
+async_engine = create_async_engine(
+    os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL),
+    pool_pre_ping=True,
+    pool_size=int(os.getenv("ASYNC_DB_POOL_SIZE", "20")),
+    max_overflow=int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "20")),
+    pool_timeout=float(os.getenv("ASYNC_DB_POOL_TIMEOUT", "5")),
+    echo=False
+)
+query_tracer.instrument_engine(async_engine)
+
+# expire_on_commit=False: attributes can't lazy-load after commit under asyncio
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 # Base class for models
 Base = declarative_base()
 
@@ -27,3 +59,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency to get an async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
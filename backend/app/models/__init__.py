@@ -1 +1,4 @@
 # Models package
+from app.models.user import User
+from app.models.entry import Entry
+from app.models.rollup import EntryRollup
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, ARRAY
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, ARRAY, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -21,6 +21,8 @@ class Entry(Base):
     puffs = Column(String, nullable=True)   # for vape/smoke
     thc_percent = Column(Float, nullable=True)  # for vape/smoke
     strain = Column(String, nullable=True)
+    # Catalog strain (strains.py); the table is managed by migrations.py
+    strain_id = Column(Integer, nullable=True)
 
     # Effects (0-10 scale)
     mood = Column(Integer, nullable=False, default=5)
@@ -31,6 +33,8 @@ class Entry(Base):
 
     # Activities and notes
     activities = Column(ARRAY(String), nullable=True)
+    # Catalog ids of the activities (activities.py), sorted
+    activity_ids = Column(ARRAY(Integer), nullable=False, default=list)
     notes = Column(Text, nullable=True)
 
     # Timestamps
@@ -39,3 +43,8 @@ class Entry(Base):
 
     # Relationship
     user = relationship("User")
+
+    # Serves per-user timeline reads and keyset pagination (migration 3)
+    __table_args__ = (
+        Index("idx_entries_user_timestamp", user_id, timestamp.desc(), id.desc()),
+    )
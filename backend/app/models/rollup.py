@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey
+from app.database import Base
+
+class EntryRollup(Base):
+    """Per-user, per-day, per-method aggregates maintained on entry writes"""
+    __tablename__ = "entry_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    method = Column(String, primary_key=True)
+
+    sessions = Column(Integer, nullable=False, default=0)
+    thc_mg_total = Column(Float, nullable=False, default=0)
+
+    # Sums of effect scores; divide by sessions for means
+    mood_sum = Column(Integer, nullable=False, default=0)
+    energy_sum = Column(Integer, nullable=False, default=0)
+    focus_sum = Column(Integer, nullable=False, default=0)
+    creativity_sum = Column(Integer, nullable=False, default=0)
+    anxiety_sum = Column(Integer, nullable=False, default=0)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -11,3 +11,7 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # Bumped on every entry write; backs conditional GETs (migration 4)
+    data_version = Column(BigInteger, nullable=False, default=0, server_default="0")
+    data_updated_at = Column(DateTime, nullable=False, server_default=func.timezone("utc", func.now()))
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
-from app import crud, models
+from fastapi import APIRouter, Body, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional
+from app.database import get_async_db
+from app import models
+from app.crud import entry_async as crud
 from app.schemas import entry as entry_schema
 from app.auth import get_current_user
+from pagination import DEFAULT_PAGE_SIZE, InvalidCursor
+from bulk_import import MAX_BATCH_ROWS
 
 router = APIRouter()
 
@@ -12,30 +15,47 @@ router = APIRouter()
 async def create_entry(
     entry: entry_schema.EntryCreate,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new cannabis consumption entry"""
-    return crud.create_entry(db=db, entry=entry, user_id=current_user.id)
+    return await crud.create_entry(db=db, entry=entry, user_id=current_user.id)
 
-@router.get("/", response_model=List[entry_schema.Entry])
+@router.post("/batch", response_model=entry_schema.EntryBatchResult, status_code=201)
+async def create_entries_batch(
+    entries: List[Dict[str, Any]] = Body(...),
+    all_or_nothing: bool = False,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Bulk-import entries; invalid rows are reported by index"""
+    if len(entries) > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_ROWS} entries per batch")
+    result = await crud.create_entries_bulk(db=db, rows=entries, user_id=current_user.id, all_or_nothing=all_or_nothing)
+    if not result["inserted"]:
+        raise HTTPException(status_code=400, detail=result["errors"])
+    return result
+
+@router.get("/", response_model=entry_schema.EntryPage)
 async def read_entries(
-    skip: int = 0,
-    limit: int = 100,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all entries for the current user"""
-    entries = crud.get_entries(db=db, user_id=current_user.id, skip=skip, limit=limit)
-    return entries
+    """Get a page of entries for the current user, newest first"""
+    try:
+        return await crud.get_entries(db=db, user_id=current_user.id, cursor=cursor, limit=limit)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/{entry_id}", response_model=entry_schema.Entry)
 async def read_entry(
     entry_id: int,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific entry"""
-    db_entry = crud.get_entry(db=db, entry_id=entry_id, user_id=current_user.id)
+    db_entry = await crud.get_entry(db=db, entry_id=entry_id, user_id=current_user.id)
     if db_entry is None:
         raise HTTPException(status_code=404, detail="Entry not found")
     return db_entry
@@ -45,10 +65,10 @@ async def update_entry(
     entry_id: int,
     entry_update: entry_schema.EntryUpdate,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update an entry"""
-    db_entry = crud.update_entry(db=db, entry_id=entry_id, entry_update=entry_update, user_id=current_user.id)
+    db_entry = await crud.update_entry(db=db, entry_id=entry_id, entry_update=entry_update, user_id=current_user.id)
     if db_entry is None:
         raise HTTPException(status_code=404, detail="Entry not found")
     return db_entry
@@ -57,10 +77,10 @@ async def update_entry(
 async def delete_entry(
     entry_id: int,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete an entry"""
-    success = crud.delete_entry(db=db, entry_id=entry_id, user_id=current_user.id)
+    success = await crud.delete_entry(db=db, entry_id=entry_id, user_id=current_user.id)
     if not success:
         raise HTTPException(status_code=404, detail="Entry not found")
     return {"message": "Entry deleted successfully"}
@@ -68,7 +88,7 @@ async def delete_entry(
 @router.get("/stats/", response_model=entry_schema.EntryStats)
 async def get_entry_stats(
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get statistics for user's entries"""
-    return crud.get_entry_stats(db=db, user_id=current_user.id)
+    return await crud.get_entry_stats(db=db, user_id=current_user.id)
@@ -1,28 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
-from app.database import get_db
-from app import crud, models
+from app.database import get_async_db
+from app import models
+from app.crud import user_async as crud
 from app.schemas import user as user_schema
-from app.auth import authenticate_user, create_access_token, get_current_user
+from app.auth import authenticate_user_async, create_access_token, get_current_user
 
 router = APIRouter()
 
 @router.post("/register", response_model=user_schema.User)
-async def register_user(user: user_schema.UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: user_schema.UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user"""
     # Check if user already exists
-    db_user = crud.get_user_by_username(db, username=user.username)
+    db_user = await crud.get_user_by_username(db, username=user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
 
-    db_user = crud.get_user_by_email(db, email=user.email)
+    db_user = await crud.get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
     # Create new user
-    db_user = crud.create_user(db=db, user=user)
+    db_user = await crud.create_user(db=db, user=user)
     if not db_user:
         raise HTTPException(status_code=400, detail="Failed to create user")
 
@@ -31,10 +32,10 @@ async def register_user(user: user_schema.UserCreate, db: Session = Depends(get_
 @router.post("/token", response_model=user_schema.Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Login and get access token"""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -56,10 +57,10 @@ async def read_users_me(current_user: models.User = Depends(get_current_user)):
 async def update_user_me(
     user_update: user_schema.UserBase,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update current user information"""
-    updated_user = crud.update_user(db=db, user_id=current_user.id, user_update=user_update)
+    updated_user = await crud.update_user(db=db, user_id=current_user.id, user_update=user_update)
     if not updated_user:
         raise HTTPException(status_code=400, detail="Failed to update user")
     return updated_user
@@ -32,6 +32,20 @@ class Entry(EntryBase):
     class Config:
         from_attributes = True
 
+class EntryPage(BaseModel):
+    entries: List[Entry]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    limit: int
+
+class EntryBatchError(BaseModel):
+    row: int
+    errors: List[str]
+
+class EntryBatchResult(BaseModel):
+    inserted: int
+    errors: List[EntryBatchError]
+
 class EntryUpdate(BaseModel):
     date: Optional[str] = None
     time: Optional[str] = None
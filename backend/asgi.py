@@ -0,0 +1,92 @@
+"""ASGI entry point serving the FastAPI routers in app/
+
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \
+        gunicorn -c gunicorn.conf.py asgi:app
+"""
+from contextlib import asynccontextmanager
+import hmac
+import os
+
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+
+import querytrace
+from app.database import async_engine, engine, query_tracer
+from app.routers import entries, users
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await async_engine.dispose()
+    engine.dispose()
+
+
+app = FastAPI(title="Cannabis Tracker API", lifespan=lifespan)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=[
+        "http://localhost:3000",
+        "http://localhost:5173",
+        "http://127.0.0.1:3000",
+        "https://cannabis-tracker-app.vercel.app",
+        "https://cannabis-tracker-frontend.onrender.com",
+        os.getenv("FRONTEND_URL", "https://cannabis-tracker-frontend.onrender.com"),
+    ],
+    allow_origin_regex=r"https://.*\.(netlify\.app|netlify\.com|vercel\.app)",
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+@app.middleware("http")
+async def trace_route(request: Request, call_next):
+    # Charge queries to the matched route template; routing fills in
+    # scope["route"] after this runs, so resolve it lazily
+    scope = request.scope
+    token = querytrace.current_route.set(
+        lambda: getattr(scope.get("route"), "path", None) or "<unmatched>"
+    )
+    try:
+        return await call_next(request)
+    finally:
+        querytrace.current_route.reset(token)
+
+
+def _require_admin(request: Request):
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+
+app.include_router(users.router, prefix="/api/v1/users", tags=["users"])
+app.include_router(entries.router, prefix="/api/v1/entries", tags=["entries"])
+
+
+@app.get("/health")
+async def health():
+    return {"status": "healthy"}
+
+
+@app.get("/admin/queries")
+async def query_stats(request: Request, sort: str = "total", limit: int = 20):
+    """Top SQL statements of this worker by total time (requires ADMIN_TOKEN)"""
+    _require_admin(request)
+    if sort not in querytrace.SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(querytrace.SORTS)}")
+    return {
+        "pid": os.getpid(),
+        **query_tracer.stats.summary(),
+        "queries": query_tracer.top(max(1, min(limit, 200)), sort),
+    }
+
+
+@app.delete("/admin/queries", status_code=204)
+async def reset_query_stats(request: Request):
+    """Clear this worker's statement totals (requires ADMIN_TOKEN)"""
+    _require_admin(request)
+    query_tracer.stats.reset()
+    return Response(status_code=204)
@@ -0,0 +1,109 @@
+"""Compare request concurrency on the sync and async SQLAlchemy paths
+
+Runs the same entry-page read --requests times with --concurrency in
+flight, three ways:
+
+  sync-in-loop  async handlers calling the sync Session, as the routers did
+                before; every query blocks the event loop
+  sync-threads  the sync Session on a thread pool of --concurrency threads
+  async         AsyncSession on the asyncpg engine
+
+Pool sizes matter: the async engine allows ASYNC_DB_POOL_SIZE +
+ASYNC_DB_MAX_OVERFLOW connections, the sync engine SQLAlchemy's default 15.
+
+Needs a migrated database with entries for --user-id (DATABASE_URL):
+
+    cd backend && python benchmarks/async_vs_sync.py --user-id 1
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.crud import entry as sync_crud, entry_async as async_crud  # noqa: E402
+from app.database import AsyncSessionLocal, SessionLocal, async_engine, engine  # noqa: E402
+
+
+def _sync_request(user_id, limit):
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        sync_crud.get_entries(db, user_id, limit=limit)
+    finally:
+        db.close()
+    return time.perf_counter() - started
+
+
+async def _async_request(user_id, limit):
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        await async_crud.get_entries(db, user_id, limit=limit)
+    return time.perf_counter() - started
+
+
+async def _gather_limited(make_call, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            return await make_call()
+
+    return await asyncio.gather(*(one() for _ in range(requests)))
+
+
+async def run_sync_in_loop(args):
+    async def call():
+        return _sync_request(args.user_id, args.limit)
+    return await _gather_limited(call, args.requests, args.concurrency)
+
+
+async def run_sync_threads(args):
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        def call():
+            return loop.run_in_executor(pool, _sync_request, args.user_id, args.limit)
+        return await _gather_limited(call, args.requests, args.concurrency)
+
+
+async def run_async(args):
+    def call():
+        return _async_request(args.user_id, args.limit)
+    return await _gather_limited(call, args.requests, args.concurrency)
+
+
+def _report(name, latencies, elapsed):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{name:<14} {len(ordered) / elapsed:>9.1f} req/s   "
+          f"p50 {statistics.median(ordered) * 1000:>7.1f} ms   "
+          f"p95 {p95 * 1000:>7.1f} ms   max {ordered[-1] * 1000:>7.1f} ms")
+
+
+async def main(args):
+    modes = [('sync-in-loop', run_sync_in_loop), ('sync-threads', run_sync_threads), ('async', run_async)]
+    # Warm both pools so connection setup isn't measured
+    await run_sync_threads(argparse.Namespace(**{**vars(args), 'requests': args.concurrency}))
+    await run_async(argparse.Namespace(**{**vars(args), 'requests': args.concurrency}))
+
+    print(f"{args.requests} requests, {args.concurrency} in flight, page size {args.limit}")
+    for name, runner in modes:
+        started = time.perf_counter()
+        latencies = await runner(args)
+        _report(name, latencies, time.perf_counter() - started)
+
+    await async_engine.dispose()
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--user-id', type=int, required=True)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--limit', type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,111 @@
+"""Rows/second for turning entry rows into a JSON response body
+
+Times the entries-page serialisation path on synthetic rows shaped like
+pg8000's (Decimal, datetime, date, time), no database needed:
+
+  legacy          per-row hand-written dict builder + Flask's stdlib provider
+  mapper+stdlib   compiled mapper converting every field + stdlib provider
+  mapper+orjson   compiled mapper leaving temporal values to orjson +
+                  json_provider.OrjsonProvider (what get_entries uses when
+                  orjson is installed)
+
+    cd backend && python benchmarks/entry_serialization.py --rows 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+import json_provider  # noqa: E402
+from main import ENTRY_FIELDS, app  # noqa: E402
+from rowmap import TEMPORAL_KINDS, compile_mapper  # noqa: E402
+
+
+def legacy_entry_to_dict(row):
+    """The per-row converter main.py used before ENTRY_FIELDS mappers"""
+    return {
+        'id': row[0],
+        'user_id': row[1],
+        'thc_mg': float(row[2]),
+        'timestamp': row[3].isoformat() if row[3] else None,
+        'date': str(row[4]),
+        'time': str(row[5]),
+        'method': row[6],
+        'amount': row[7],
+        'puffs': row[8],
+        'thc_percent': float(row[9]) if row[9] else None,
+        'strain': row[10],
+        'mood': int(row[11]),
+        'energy': int(row[12]),
+        'focus': int(row[13]),
+        'creativity': int(row[14]),
+        'anxiety': int(row[15]),
+        'activities': row[16] if row[16] else [],
+        'notes': row[17],
+        'created_at': row[18].isoformat() if row[18] else None,
+        'updated_at': row[19].isoformat() if row[19] else None
+    }
+
+
+def synthetic_rows(count, seed=1):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, 8, 0)
+    rows = []
+    for i in range(count):
+        ts = start + timedelta(minutes=97 * i)
+        puffs = rng.randint(1, 6)
+        rows.append([
+            i + 1, 1, Decimal(f"{puffs * 1.88:.2f}"), ts, ts.date(), ts.time(),
+            rng.choice(('vape', 'smoke', 'edible')), None, str(puffs),
+            Decimal('75.00'), rng.choice(('Blue Dream', 'OG Kush', None)),
+            rng.randint(1, 10), rng.randint(1, 10), rng.randint(1, 10), rng.randint(1, 10), rng.randint(0, 10),
+            rng.sample(['gaming', 'reading', 'music', 'hiking', 'cooking'], rng.randint(0, 3)),
+            rng.choice((None, 'Felt relaxed, slept well afterwards.')),
+            ts, ts + timedelta(microseconds=rng.randint(0, 999999)),
+        ])
+    return rows
+
+
+def run(name, rows, to_dicts, provider, repeat):
+    best = None
+    with app.app_context():
+        for _ in range(repeat):
+            started = time.perf_counter()
+            body = provider.response({'entries': to_dicts(rows), 'next_cursor': None}).get_data()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:14s} {len(rows) / best:12,.0f} rows/s   {best * 1000:8.2f} ms   {len(body):,} bytes")
+    return body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.rows)
+    stdlib = DefaultJSONProvider(app)
+
+    legacy = run('legacy', rows, lambda rs: [legacy_entry_to_dict(r) for r in rs], stdlib, args.repeat)
+    mapped = run('mapper+stdlib', rows, compile_mapper(ENTRY_FIELDS).many, stdlib, args.repeat)
+    if legacy != mapped:
+        raise SystemExit('Compiled mapper output differs from the legacy converter')
+    if json_provider.orjson is None:
+        print('mapper+orjson  skipped: orjson not installed')
+        return
+    native = compile_mapper(ENTRY_FIELDS, native=TEMPORAL_KINDS)
+    fast = run('mapper+orjson', rows, native.many, json_provider.OrjsonProvider(app), args.repeat)
+    if stdlib.loads(fast) != stdlib.loads(legacy):
+        raise SystemExit('orjson output differs from the stdlib encoder')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,385 @@
+"""Drive the API at fixed concurrency and record throughput and tail latency
+
+Runs each endpoint in turn, at every --concurrency level, against a running
+server, with --concurrency client threads each holding a keep-alive
+connection:
+
+  register      POST a new, unique user (bcrypt-bound)
+  login         log in as seeded users (bcrypt-bound)
+  create_entry  POST a synthetic entry for a seeded user
+  get_entries   first page of a seeded user's history
+  get_stats     a seeded user's stats (served from the stats cache when warm)
+  delete_entry  delete the entries create_entry made
+
+--api selects the route layout: flask (main.py) or fastapi (asgi.py).
+Requests rotate over the users in the seed manifest written by
+seed_history.py. Results (requests/s and p50/p95/p99 per endpoint and
+level, plus the commit they were measured on) are printed and written as
+JSON to --output; pass an earlier file as --baseline to print the change.
+
+The client threads share one interpreter, so at very high request rates
+the driver itself can become the bottleneck; run it on a different machine
+from the server for those.
+
+    cd backend
+    python benchmarks/seed_history.py --users 200 --entries 200000
+    gunicorn -c gunicorn.conf.py main:app &
+    python benchmarks/load_test.py --concurrency 1,8,32 --output before.json
+"""
+import argparse
+import http.client
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import urllib.parse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import entry_payload  # noqa: E402
+
+ENDPOINTS = ('register', 'login', 'create_entry', 'get_entries', 'get_stats', 'delete_entry')
+
+# Endpoints whose cost is dominated by bcrypt get --auth-requests requests
+AUTH_ENDPOINTS = ('register', 'login')
+
+ROUTES = {
+    'flask': {
+        'register': '/api/v1/register',
+        'login': '/api/v1/login',
+        'entries': '/api/v1/entries',
+        'stats': '/api/v1/entries/stats',
+        'entry': '/api/v1/entries/{id}',
+    },
+    'fastapi': {
+        'register': '/api/v1/users/register',
+        'login': '/api/v1/users/token',
+        'entries': '/api/v1/entries/',
+        'stats': '/api/v1/entries/stats/',
+        'entry': '/api/v1/entries/{id}',
+    },
+}
+
+PAGE_SIZE = 50
+
+PERCENTILES = (('p50', 0.50), ('p95', 0.95), ('p99', 0.99))
+
+
+class Client:
+    """One keep-alive HTTP connection; reconnects after errors"""
+
+    def __init__(self, base_url, timeout):
+        url = urllib.parse.urlsplit(base_url)
+        self._factory = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        self._host = url.netloc
+        self._timeout = timeout
+        self._conn = None
+
+    def request(self, method, path, body=None, token=None, form=False):
+        """Send one request; returns (status, body bytes, seconds), status 0 on I/O errors"""
+        headers = {}
+        if token:
+            headers['Authorization'] = f"Bearer {token}"
+        if body is not None:
+            # As bytes, http.client sends headers and body in one write, which
+            # avoids Nagle/delayed-ACK stalls on small POSTs
+            if form:
+                body = urllib.parse.urlencode(body).encode('ascii')
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            else:
+                body = json.dumps(body).encode('utf-8')
+                headers['Content-Type'] = 'application/json'
+
+        started = time.perf_counter()
+        try:
+            if self._conn is None:
+                self._conn = self._factory(self._host, timeout=self._timeout)
+            self._conn.request(method, path, body=body, headers=headers)
+            response = self._conn.getresponse()
+            data = response.read()
+            status = response.status
+            if response.will_close:
+                self.close()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            status, data = 0, b''
+        return status, data, time.perf_counter() - started
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class Api:
+    """Request shapes for one --api route layout"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.routes = ROUTES[kind]
+
+    def register(self, client, username, password):
+        return client.request('POST', self.routes['register'], {
+            'username': username, 'email': f"{username}@example.com", 'password': password
+        })
+
+    def login(self, client, username, password):
+        credentials = {'username': username, 'password': password}
+        return client.request('POST', self.routes['login'], credentials, form=self.kind == 'fastapi')
+
+    def create_entry(self, client, token, payload):
+        return client.request('POST', self.routes['entries'], payload, token)
+
+    def get_entries(self, client, token):
+        return client.request('GET', f"{self.routes['entries']}?limit={PAGE_SIZE}", token=token)
+
+    def get_stats(self, client, token):
+        return client.request('GET', self.routes['stats'], token=token)
+
+    def delete_entry(self, client, token, entry_id):
+        return client.request('DELETE', self.routes['entry'].format(id=entry_id), token=token)
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def run_phase(base_url, timeout, make_call, total, concurrency):
+    """Run make_call(client, n) for n in range(total) on concurrency threads
+
+    Returns (samples, wall seconds) with samples as [(status, seconds)].
+    """
+    # next() on a shared count is atomic under the GIL
+    counter = itertools.count()
+
+    def worker():
+        client = Client(base_url, timeout)
+        samples = []
+        try:
+            while True:
+                n = next(counter)
+                if n >= total:
+                    break
+                status, _, elapsed = make_call(client, n)
+                samples.append((status, elapsed))
+        finally:
+            client.close()
+        return samples
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(worker) for _ in range(concurrency)]
+        samples = [sample for future in futures for sample in future.result()]
+    return samples, time.perf_counter() - started
+
+
+def summarize(endpoint, concurrency, samples, wall):
+    ordered = sorted(elapsed for _, elapsed in samples)
+    statuses = Counter(status for status, _ in samples)
+    errors = sum(count for status, count in statuses.items() if not 200 <= status < 300)
+    result = {
+        'endpoint': endpoint,
+        'concurrency': concurrency,
+        'requests': len(samples),
+        'errors': errors,
+        'status_counts': {str(status): count for status, count in sorted(statuses.items())},
+        'duration_s': round(wall, 3),
+        'throughput_rps': round(len(samples) / wall, 1) if wall else None,
+        'latency_ms': None,
+    }
+    if ordered:
+        result['latency_ms'] = {
+            'mean': round(statistics.fmean(ordered) * 1000, 2),
+            **{name: round(percentile(ordered, q) * 1000, 2) for name, q in PERCENTILES},
+            'max': round(ordered[-1] * 1000, 2),
+        }
+    return result
+
+
+def login_users(args, api, users):
+    """Tokens for the seeded users, logged in concurrently (not measured)"""
+    tokens = [None] * len(users)
+
+    def call(client, n):
+        status, data, elapsed = api.login(client, users[n]['username'], args.password)
+        if status == 200:
+            tokens[n] = json.loads(data)['access_token']
+        return status, data, elapsed
+
+    run_phase(args.base_url, args.timeout, call, len(users), min(len(users), 16))
+    missing = [users[n]['username'] for n, token in enumerate(tokens) if token is None]
+    if missing:
+        raise SystemExit(f"Could not log in {len(missing)} seeded users, e.g. {missing[0]!r}")
+    return tokens
+
+
+def run_level(args, api, users, tokens, concurrency, endpoints, run_id):
+    """All selected endpoints at one concurrency level"""
+    created = []
+
+    def register(client, n):
+        return api.register(client, f"load-{run_id}-{concurrency}-{n}", args.password)
+
+    def login(client, n):
+        return api.login(client, users[n % len(users)]['username'], args.password)
+
+    def create_entry(client, n):
+        token = tokens[n % len(tokens)]
+        payload = entry_payload(random.Random(n), datetime.now().replace(second=0, microsecond=0))
+        status, data, elapsed = api.create_entry(client, token, payload)
+        if 200 <= status < 300:
+            created.append((token, json.loads(data)['id']))
+        return status, data, elapsed
+
+    def get_entries(client, n):
+        return api.get_entries(client, tokens[n % len(tokens)])
+
+    def get_stats(client, n):
+        return api.get_stats(client, tokens[n % len(tokens)])
+
+    def delete_entry(client, n):
+        token, entry_id = created[n]
+        return api.delete_entry(client, token, entry_id)
+
+    calls = {
+        'register': register,
+        'login': login,
+        'create_entry': create_entry,
+        'get_entries': get_entries,
+        'get_stats': get_stats,
+        'delete_entry': delete_entry,
+    }
+
+    # Warm connections, caches and the server's pools before measuring
+    if args.warmup:
+        run_phase(args.base_url, args.timeout, get_entries, args.warmup, concurrency)
+
+    results = []
+    for endpoint in endpoints:
+        if endpoint == 'delete_entry':
+            total = len(created)
+            if not total:
+                print(f"  {endpoint:<13} skipped: no entries were created at this level")
+                continue
+        else:
+            total = args.auth_requests if endpoint in AUTH_ENDPOINTS else args.requests
+        samples, wall = run_phase(args.base_url, args.timeout, calls[endpoint], total, concurrency)
+        result = summarize(endpoint, concurrency, samples, wall)
+        print_result(result)
+        results.append(result)
+    return results
+
+
+def print_result(result, baseline=None):
+    latency = result['latency_ms'] or {}
+    line = (f"  {result['endpoint']:<13} c={result['concurrency']:<4} "
+            f"{result['throughput_rps'] or 0:>9.1f} req/s  "
+            f"p50 {latency.get('p50', 0):>8.1f}  p95 {latency.get('p95', 0):>8.1f}  "
+            f"p99 {latency.get('p99', 0):>8.1f} ms  errors {result['errors']}")
+    if baseline and baseline.get('throughput_rps') and baseline.get('latency_ms'):
+        def change(new, old):
+            return f"{(new - old) / old * 100:+.0f}%" if old else 'n/a'
+        line += (f"  | vs baseline: req/s {change(result['throughput_rps'], baseline['throughput_rps'])}"
+                 f", p95 {change(latency.get('p95', 0), baseline['latency_ms']['p95'])}"
+                 f", p99 {change(latency.get('p99', 0), baseline['latency_ms']['p99'])}")
+    print(line)
+
+
+def git_revision():
+    """(commit, dirty) of the working tree, or (None, None) outside git"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=here, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=here, capture_output=True, text=True, check=True
+        ).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def main(args):
+    with open(args.manifest, encoding='utf-8') as f:
+        manifest = json.load(f)
+    users = manifest['users'][:args.max_users] if args.max_users else manifest['users']
+    args.password = args.password or manifest['password']
+    endpoints = [e.strip() for e in args.endpoints.split(',') if e.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        raise SystemExit(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    api = Api(args.api)
+    tokens = login_users(args, api, users)
+    run_id = datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')
+    commit, dirty = git_revision()
+    print(f"{args.api} at {args.base_url}, {len(users)} users, commit {commit[:10] if commit else 'unknown'}"
+          f"{' (dirty)' if dirty else ''}")
+
+    results = []
+    for concurrency in levels:
+        print(f"concurrency {concurrency}")
+        results.extend(run_level(args, api, users, tokens, concurrency, endpoints, run_id))
+
+    report = {
+        'meta': {
+            'commit': commit,
+            'dirty': dirty,
+            'started_at': run_id,
+            'api': args.api,
+            'base_url': args.base_url,
+            'concurrency': levels,
+            'requests': args.requests,
+            'auth_requests': args.auth_requests,
+            'users': len(users),
+            'seed': manifest.get('seed'),
+            'seeded_entries': sum(user.get('entries', 0) for user in users),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            before = json.load(f)
+        previous = {(r['endpoint'], r['concurrency']): r for r in before['results']}
+        print(f"compared with {before['meta'].get('commit') or args.baseline}")
+        for result in results:
+            print_result(result, previous.get((result['endpoint'], result['concurrency'])))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--api', choices=sorted(ROUTES), default='flask')
+    parser.add_argument('--manifest', default='seed-manifest.json', help='Written by seed_history.py')
+    parser.add_argument('--password', default=None, help="Seeded users' password (default: from the manifest)")
+    parser.add_argument('--max-users', type=int, default=200, help='Use at most this many seeded users (0: all)')
+    parser.add_argument('--concurrency', default='1,8,32', help='Comma-separated concurrency levels')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='Comma-separated subset to run')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint and level')
+    parser.add_argument('--auth-requests', type=int, default=100, help='Requests for register and login')
+    parser.add_argument('--warmup', type=int, default=50, help='Unmeasured get_entries requests per level')
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--output', help='Write results as JSON here')
+    parser.add_argument('--baseline', help='Earlier --output file to compare against')
+    main(parser.parse_args())
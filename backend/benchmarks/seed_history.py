@@ -0,0 +1,152 @@
+"""Seed Postgres with synthetic users and multi-year entry histories
+
+Creates --users users named <prefix>-<n>, all with the same password, and
+--entries entries spread over them (see synthetic.py for the
+distributions). Each user's history goes in with one COPY via bulk_import
+and the same strain, activity and rollup bookkeeping as the batch import
+route, committed per user. Writes a manifest of the seeded users for
+load_test.py.
+
+Needs a migrated database (flask db-upgrade) configured like the app
+(DATABASE_URL or DB_*):
+
+    cd backend && python benchmarks/seed_history.py --users 200 --entries 200000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import activities  # noqa: E402
+import bulk_import  # noqa: E402
+import rollups  # noqa: E402
+import strains  # noqa: E402
+from app.schemas.entry import EntryCreate  # noqa: E402
+from main import bump_data_version, get_db_connection, password_hasher  # noqa: E402
+from synthetic import entries_per_user, user_history  # noqa: E402
+
+DEFAULT_PASSWORD = 'benchmark-password'
+
+
+def prepare(history):
+    """(EntryCreate, timestamp, thc_mg) rows, as bulk_import.prepare_rows makes them"""
+    prepared = []
+    for payload in history:
+        # Payloads are generated valid, so skip per-row validation
+        entry = EntryCreate.model_construct(**{**bulk_import.ENTRY_DEFAULTS, **payload})
+        timestamp = datetime.fromisoformat(f"{entry.date} {entry.time}")
+        prepared.append((entry, timestamp, round(bulk_import.calculate_thc_mg(entry), 2)))
+    return prepared
+
+
+def load_user(cur, user_id, prepared):
+    """COPY one user's entries and update strain, activity and daily rollups"""
+    strain_catalog = strains.resolve_many(cur, [entry.strain for entry, _, _ in prepared])
+    strain_ids = [strain_catalog.get(strains.normalize(entry.strain)) for entry, _, _ in prepared]
+    activity_catalog = activities.resolve_many(
+        cur, [name for entry, _, _ in prepared for name in entry.activities]
+    )
+    activity_ids = [activities.encode(activity_catalog, entry.activities) for entry, _, _ in prepared]
+
+    bulk_import.copy_entries(cur, user_id, prepared, strain_ids, activity_ids)
+    rollups.apply_batch(cur, user_id, [
+        (timestamp.date(), entry.method, thc_mg,
+         entry.mood, entry.energy, entry.focus, entry.creativity, entry.anxiety)
+        for entry, timestamp, thc_mg in prepared
+    ])
+    strains.apply_batch(cur, user_id, [
+        (strain_id, thc_mg, entry.mood, entry.energy, entry.focus, entry.creativity, entry.anxiety)
+        for strain_id, (entry, _, thc_mg) in zip(strain_ids, prepared)
+    ])
+    activities.apply_batch(cur, user_id, [
+        (ids, thc_mg, entry.mood, entry.energy, entry.focus, entry.creativity, entry.anxiety)
+        for ids, (entry, _, thc_mg) in zip(activity_ids, prepared)
+    ])
+    bump_data_version(cur, user_id)
+
+
+def create_users(cur, prefix, count, password_hash, chunk=1000):
+    """Insert the users with multi-row INSERTs; returns [(id, username)] in order"""
+    users = []
+    for start in range(0, count, chunk):
+        names = [f"{prefix}-{n}" for n in range(start, min(count, start + chunk))]
+        values_sql = ', '.join(['(%s, %s, %s)'] * len(names))
+        params = [value for name in names for value in (name, f"{name}@example.com", password_hash)]
+        cur.execute(f"""
+            INSERT INTO users (username, email, password_hash) VALUES {values_sql}
+            RETURNING id, username
+        """, tuple(params))
+        ids = dict((username, user_id) for user_id, username in cur.fetchall())
+        users.extend((ids[name], name) for name in names)
+    return users
+
+
+def main(args):
+    conn = get_db_connection()
+    if not conn:
+        raise SystemExit('Database connection failed')
+    cur = conn.cursor()
+    try:
+        if args.reset:
+            cur.execute("DELETE FROM users WHERE username LIKE %s", (f"{args.prefix}-%",))
+            print(f"Removed {cur.rowcount} previously seeded users")
+            conn.commit()
+
+        started = time.perf_counter()
+        # One hash for everyone: hashing is deliberately slow and not what's measured here
+        users = create_users(cur, args.prefix, args.users, password_hasher.hash(args.password))
+        conn.commit()
+
+        rng = random.Random(args.seed)
+        counts = entries_per_user(rng, args.users, args.entries)
+        loaded = 0
+        for (user_id, username), count in zip(users, counts):
+            if count:
+                history = user_history(rng.getrandbits(64), count, args.years)
+                load_user(cur, user_id, prepare(history))
+                conn.commit()
+            loaded += count
+            print(f"\r{loaded:,}/{args.entries:,} entries", end='', flush=True)
+        print()
+
+        cur.execute("ANALYZE entries")
+        conn.commit()
+        elapsed = time.perf_counter() - started
+        print(f"Seeded {args.users} users and {args.entries:,} entries in {elapsed:.1f}s "
+              f"({args.entries / elapsed:,.0f} entries/s)")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    with open(args.manifest, 'w', encoding='utf-8') as f:
+        json.dump({
+            'prefix': args.prefix,
+            'password': args.password,
+            'seed': args.seed,
+            'users': [
+                {'id': user_id, 'username': username, 'entries': count}
+                for (user_id, username), count in zip(users, counts)
+            ],
+        }, f, indent=2)
+    print(f"Wrote {args.manifest}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--entries', type=int, default=100000, help='Total entries over all users')
+    parser.add_argument('--years', type=float, default=3.0, help='History length')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--prefix', default='bench', help='Username prefix of seeded users')
+    parser.add_argument('--password', default=DEFAULT_PASSWORD)
+    parser.add_argument('--reset', action='store_true', help='Delete users seeded earlier with --prefix first')
+    parser.add_argument('--manifest', default='seed-manifest.json')
+    main(parser.parse_args())
@@ -0,0 +1,142 @@
+"""Synthetic consumption histories for seeding and load-testing
+
+Everything is drawn from a seeded random.Random, so the same seed gives the
+same dataset. Distributions are rough but shaped like real use: vaping and
+smoking dominate, strains follow a long-tailed popularity curve, sessions
+cluster in the evening and on weekends, and effects drift with dose
+(more THC, a little more mood and a lot more anxiety).
+"""
+import math
+import random
+from datetime import datetime, timedelta
+
+METHODS = (('vape', 45), ('smoke', 25), ('edible', 20), ('tincture', 10))
+
+STRAINS = (
+    'Blue Dream', 'OG Kush', 'Sour Diesel', 'Girl Scout Cookies', 'Gorilla Glue #4',
+    'Granddaddy Purple', 'Jack Herer', 'Pineapple Express', 'Northern Lights', 'White Widow',
+    'Gelato', 'Wedding Cake', 'Durban Poison', 'Green Crack', 'Purple Haze',
+    'AK-47', 'Strawberry Cough', 'Bubba Kush', 'Zkittlez', 'Runtz',
+    'Trainwreck', 'Super Lemon Haze', 'Blueberry', 'Maui Wowie', 'Chemdawg',
+    'Headband', 'Skywalker OG', 'Tangie', 'Do-Si-Dos', 'Mimosa',
+    'Ice Cream Cake', 'Cherry Pie', 'Lemon Skunk', 'Harlequin', 'ACDC',
+    'Cannatonic', 'Forbidden Fruit', 'Animal Mints', 'MAC', 'Biscotti',
+)
+
+# Zipf-like: the first strains get most of the sessions
+STRAIN_WEIGHTS = tuple(1 / (rank + 1) ** 1.1 for rank in range(len(STRAINS)))
+
+ACTIVITIES = (
+    ('relaxing', 30), ('music', 18), ('gaming', 15), ('movies', 14), ('socializing', 12),
+    ('cooking', 8), ('reading', 7), ('hiking', 5), ('creative work', 6), ('sleep', 10),
+    ('yoga', 4), ('cleaning', 4), ('working', 3), ('exercise', 3), ('meditation', 4),
+)
+
+# Relative likelihood of a session starting in each hour of the day
+HOUR_WEIGHTS = (
+    2, 1, 1, 0, 0, 0, 0, 1, 1, 1, 2, 2,
+    3, 3, 3, 4, 5, 7, 9, 11, 12, 11, 8, 4,
+)
+
+EDIBLE_DOSES = (2.5, 5, 5, 10, 10, 10, 15, 20, 25, 50)
+
+NOTES = (
+    'Felt relaxed and slept well afterwards.',
+    'Great for creativity, wrote for two hours.',
+    'A bit anxious at first, settled after 20 minutes.',
+    'Helped with back pain after the gym.',
+    'Too strong, next time half the dose.',
+    'Mellow evening, watched a movie with friends.',
+    'Focused and productive, cleaned the whole apartment.',
+    'Munchies hit hard, cooked pasta at midnight.',
+    'Headache in the morning, drink more water.',
+    'Perfect dose for a hike, colours looked amazing.',
+)
+
+_METHOD_NAMES, _METHOD_WEIGHTS = zip(*METHODS)
+_ACTIVITY_NAMES, _ACTIVITY_WEIGHTS = zip(*ACTIVITIES)
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, int(round(value))))
+
+
+def entry_payload(rng, when):
+    """One entry as the create-entry JSON body, at datetime `when`"""
+    method = rng.choices(_METHOD_NAMES, _METHOD_WEIGHTS)[0]
+    payload = {
+        'date': when.strftime('%Y-%m-%d'),
+        'time': when.strftime('%H:%M'),
+        'method': method,
+    }
+    if method in ('vape', 'smoke'):
+        puffs = min(12, 1 + int(rng.expovariate(0.45)))
+        thc_percent = round(rng.uniform(65, 90) if method == 'vape' else rng.uniform(15, 28), 1)
+        payload.update(puffs=str(puffs), thc_percent=thc_percent)
+        thc_mg = puffs * thc_percent / 100 * 2.5
+    elif method == 'edible':
+        thc_mg = rng.choice(EDIBLE_DOSES)
+        payload['amount'] = f"{thc_mg:g}"
+    else:
+        thc_mg = round(rng.uniform(1, 20), 1)
+        payload['amount'] = f"{thc_mg:g}"
+
+    if method != 'edible' or rng.random() < 0.3:
+        payload['strain'] = rng.choices(STRAINS, STRAIN_WEIGHTS)[0]
+
+    dose = math.log1p(thc_mg)
+    payload.update(
+        mood=_clamp(rng.gauss(5.5 + 0.4 * dose, 1.5), 1, 10),
+        energy=_clamp(rng.gauss(6.0 - 0.3 * dose, 1.8), 1, 10),
+        focus=_clamp(rng.gauss(6.0 - 0.4 * dose, 1.8), 1, 10),
+        creativity=_clamp(rng.gauss(5.0 + 0.3 * dose, 1.8), 1, 10),
+        anxiety=_clamp(rng.gauss(0.5 * dose ** 1.5, 1.2), 0, 10),
+    )
+
+    count = rng.choices((0, 1, 2, 3), (25, 40, 25, 10))[0]
+    chosen = set()
+    while len(chosen) < count:
+        chosen.add(rng.choices(_ACTIVITY_NAMES, _ACTIVITY_WEIGHTS)[0])
+    payload['activities'] = sorted(chosen)
+
+    if rng.random() < 0.4:
+        payload['notes'] = rng.choice(NOTES)
+    return payload
+
+
+def session_times(rng, count, years=3.0, end=None):
+    """count session datetimes spread over the last `years`, oldest first
+
+    Days are drawn uniformly with extra weight on Fridays and Saturdays;
+    hours follow HOUR_WEIGHTS.
+    """
+    end = end or datetime.now().replace(second=0, microsecond=0)
+    span_days = max(1, int(years * 365))
+    times = []
+    while len(times) < count:
+        day = rng.randrange(span_days)
+        when = end - timedelta(days=day)
+        if when.weekday() not in (4, 5) and rng.random() < 0.25:
+            continue
+        hour = rng.choices(range(24), HOUR_WEIGHTS)[0]
+        when = when.replace(hour=hour, minute=rng.randrange(60))
+        if when <= end:
+            times.append(when)
+    times.sort()
+    return times
+
+
+def user_history(seed, count, years=3.0, end=None):
+    """count entry payloads for one user, oldest first"""
+    rng = random.Random(seed)
+    return [entry_payload(rng, when) for when in session_times(rng, count, years, end)]
+
+
+def entries_per_user(rng, users, total):
+    """Split total entries over users with a heavy tail (some log a lot)"""
+    weights = [rng.paretovariate(1.5) for _ in range(users)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for i in range(total - sum(counts)):
+        counts[i % users] += 1
+    return counts
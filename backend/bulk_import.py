@@ -0,0 +1,156 @@
+"""Parsing, validation and COPY-based loading for bulk entry imports"""
+import csv
+import io
+import math
+from datetime import datetime
+
+from pydantic import ValidationError
+
+from app.schemas.entry import EntryCreate
+
+MAX_BATCH_ROWS = 50000
+
+# Same defaults POST /api/v1/entries applies to missing fields
+ENTRY_DEFAULTS = {
+    'method': 'vape',
+    'mood': 5,
+    'energy': 5,
+    'focus': 5,
+    'creativity': 5,
+    'anxiety': 0,
+    'activities': [],
+}
+
+# Column widths from the entries table; COPY aborts the whole batch on
+# overflow, so oversized values are reported per row instead.
+VARCHAR_LIMITS = {'method': 20, 'amount': 50, 'puffs': 50, 'strain': 100}
+# Exclusive bounds on the absolute value of DECIMAL(p,2) columns, after
+# rounding to 2 places: thc_percent is DECIMAL(5,2), thc_mg DECIMAL(10,2)
+DECIMAL_LIMITS = {'thc_percent': 1000, 'thc_mg': 10 ** 8}
+INTEGER_FIELDS = ('mood', 'energy', 'focus', 'creativity', 'anxiety')
+INTEGER_RANGE = (-2 ** 31, 2 ** 31 - 1)
+
+COPY_COLUMNS = (
+    'user_id', 'thc_mg', 'timestamp', 'date', 'time', 'method', 'amount', 'puffs',
+    'thc_percent', 'strain', 'mood', 'energy', 'focus', 'creativity', 'anxiety',
+    'activities', 'notes', 'strain_id', 'activity_ids'
+)
+
+
+def calculate_thc_mg(entry):
+    """Calculate THC mg based on method (mirrors the single-entry route)"""
+    if entry.method in ('vape', 'smoke'):
+        thc_percent = 75 if entry.thc_percent is None else entry.thc_percent
+        return float(entry.puffs or 0) * thc_percent / 100 * 2.5
+    if entry.method in ('edible', 'tincture'):
+        return float(entry.amount or 0)
+    return 0.0
+
+
+def parse_csv(text):
+    """Parse CSV text with a header row into row dicts
+
+    Empty cells are dropped so defaults apply, and the activities column is
+    split on ';' or '|'.
+    """
+    rows = []
+    for record in csv.DictReader(io.StringIO(text)):
+        row = {key.strip(): value.strip() for key, value in record.items()
+               if key and value is not None and value.strip() != ''}
+        if 'activities' in row:
+            separator = '|' if '|' in row['activities'] else ';'
+            row['activities'] = [a.strip() for a in row['activities'].split(separator) if a.strip()]
+        rows.append(row)
+    return rows
+
+
+def _fits_decimal(value, limit):
+    return math.isfinite(value) and abs(round(value, 2)) < limit
+
+
+def prepare_rows(rows):
+    """Validate raw rows against EntryCreate and derive timestamp and thc_mg
+
+    Returns (prepared, errors) where prepared is a list of
+    (EntryCreate, timestamp, thc_mg) and errors is a list of
+    {'row': index, 'errors': [...]} for rows that were rejected.
+    """
+    prepared = []
+    errors = []
+    for index, raw in enumerate(rows):
+        if not isinstance(raw, dict):
+            errors.append({'row': index, 'errors': ['Row must be an object']})
+            continue
+        data = {**ENTRY_DEFAULTS, **raw}
+        # The single-entry route accepts numeric amount/puffs; the schema wants strings
+        for field in ('amount', 'puffs'):
+            if isinstance(data.get(field), (int, float)) and not isinstance(data[field], bool):
+                data[field] = str(data[field])
+        try:
+            entry = EntryCreate.model_validate(data)
+        except ValidationError as e:
+            errors.append({'row': index, 'errors': [
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+            ]})
+            continue
+
+        row_errors = [
+            f"{field}: must be at most {limit} characters"
+            for field, limit in VARCHAR_LIMITS.items()
+            if getattr(entry, field) is not None and len(getattr(entry, field)) > limit
+        ]
+        row_errors.extend(
+            f"{field}: must be between {INTEGER_RANGE[0]} and {INTEGER_RANGE[1]}"
+            for field in INTEGER_FIELDS
+            if not INTEGER_RANGE[0] <= getattr(entry, field) <= INTEGER_RANGE[1]
+        )
+        if entry.thc_percent is not None and not _fits_decimal(entry.thc_percent, DECIMAL_LIMITS['thc_percent']):
+            row_errors.append(f"thc_percent: must be below {DECIMAL_LIMITS['thc_percent']}")
+        try:
+            timestamp = datetime.fromisoformat(f"{entry.date} {entry.time}")
+        except ValueError:
+            row_errors.append(f"date/time: invalid value {entry.date!r} {entry.time!r}")
+        try:
+            thc_mg = round(calculate_thc_mg(entry), 2)
+        except ValueError:
+            row_errors.append("amount/puffs: must be numeric")
+        else:
+            if not _fits_decimal(thc_mg, DECIMAL_LIMITS['thc_mg']):
+                row_errors.append(f"thc_mg: computed dose must be below {DECIMAL_LIMITS['thc_mg']:,} mg")
+
+        if row_errors:
+            errors.append({'row': index, 'errors': row_errors})
+        else:
+            prepared.append((entry, timestamp, thc_mg))
+    return prepared, errors
+
+
+def _array_literal(values):
+    escaped = ('"' + v.replace('\\', '\\\\').replace('"', '\\"') + '"' for v in values)
+    return '{' + ','.join(escaped) + '}'
+
+
+def copy_entries(cur, user_id, prepared, strain_ids=None, activity_ids=None):
+    """Load prepared rows into entries with a single COPY ... FROM STDIN
+
+    strain_ids, if given, holds each row's catalog strain id (or None), and
+    activity_ids each row's list of catalog activity ids.
+    Runs in the caller's transaction; returns the number of rows copied.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for index, (entry, timestamp, thc_mg) in enumerate(prepared):
+        writer.writerow((
+            user_id, thc_mg, timestamp.isoformat(), entry.date, entry.time,
+            entry.method, entry.amount, entry.puffs, entry.thc_percent, entry.strain,
+            entry.mood, entry.energy, entry.focus, entry.creativity, entry.anxiety,
+            _array_literal(entry.activities), entry.notes,
+            strain_ids[index] if strain_ids else None,
+            '{' + ','.join(map(str, activity_ids[index])) + '}' if activity_ids else '{}'
+        ))
+    buffer.seek(0)
+    cur.execute(
+        f"COPY entries ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+        stream=buffer
+    )
+    return len(prepared)
@@ -0,0 +1,251 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the wait timeout"""
+
+
+class _PoolRecord:
+    """Bookkeeping for a single physical connection"""
+
+    __slots__ = ('conn', 'created_at', 'last_used')
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class PooledConnection:
+    """Proxy handed out by the pool; close() returns it instead of disconnecting"""
+
+    def __init__(self, pool, record):
+        self._pool = pool
+        self._record = record
+
+    def __getattr__(self, name):
+        record = self.__dict__.get('_record')
+        if record is None:
+            raise AttributeError(f"Connection already returned to pool (accessing {name!r})")
+        return getattr(record.conn, name)
+
+    def cursor(self):
+        """A cursor on the connection, wrapped by the pool's cursor_wrapper if set"""
+        record = self._record
+        if record is None:
+            raise AttributeError("Connection already returned to pool (accessing 'cursor')")
+        cursor = record.conn.cursor()
+        wrapper = self._pool.cursor_wrapper
+        return wrapper(cursor, record.conn) if wrapper is not None else cursor
+
+    def close(self):
+        """Return the connection to the pool"""
+        record, self._record = self._record, None
+        if record is not None:
+            self._pool._release(record)
+
+    def invalidate(self):
+        """Discard the underlying connection instead of reusing it"""
+        record, self._record = self._record, None
+        if record is not None:
+            self._pool._release(record, discard=True)
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of DB-API connections"""
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=5.0,
+                 max_lifetime=1800.0, max_idle=300.0, check_on_checkout=True,
+                 cursor_wrapper=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_on_checkout = check_on_checkout
+        # Optional cursor_wrapper(cursor, conn) applied to every cursor handed
+        # out (instrumentation); conn is the underlying connection
+        self.cursor_wrapper = cursor_wrapper
+
+        self._cond = threading.Condition(threading.Lock())
+        self._reset_state()
+
+    def _reset_state(self):
+        self._pid = os.getpid()
+        self._idle = deque()
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+        self._counters = {
+            'connections_created': 0,
+            'connections_closed': 0,
+            'connect_errors': 0,
+            'checkouts': 0,
+            'failed_checks': 0,
+            'wait_timeouts': 0,
+            'total_wait_ms': 0.0,
+        }
+
+    def _check_fork(self):
+        # Connections inherited across fork() share a socket with the parent;
+        # drop them without closing so the parent's sessions are untouched.
+        if self._pid != os.getpid():
+            self._cond = threading.Condition(threading.Lock())
+            self._reset_state()
+
+    def _expired(self, record, now):
+        if self.max_lifetime and now - record.created_at > self.max_lifetime:
+            return True
+        if self.max_idle and self._size > self.min_size and now - record.last_used > self.max_idle:
+            return True
+        return False
+
+    def _is_alive(self, conn):
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT 1")
+                cur.fetchone()
+            finally:
+                cur.close()
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Discarding dead pooled connection: {e}")
+            return False
+
+    def _close_record(self, record):
+        try:
+            record.conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._counters['connections_closed'] += 1
+            self._cond.notify()
+
+    def _open_record(self):
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._counters['connect_errors'] += 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._counters['connections_created'] += 1
+        return _PoolRecord(conn)
+
+    def getconn(self, timeout=None):
+        """Check out a live connection, waiting up to timeout seconds"""
+        self._check_fork()
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            record = None
+            create = False
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['wait_timeouts'] += 1
+                        raise PoolTimeout(
+                            f"No database connection available within {timeout:.1f}s "
+                            f"(pool size {self._size}/{self.max_size})"
+                        )
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                if self._idle:
+                    record = self._idle.pop()
+                else:
+                    self._size += 1
+                    create = True
+
+            if create:
+                record = self._open_record()
+            else:
+                now = time.monotonic()
+                if self._expired(record, now):
+                    self._close_record(record)
+                    continue
+                if self.check_on_checkout and not self._is_alive(record.conn):
+                    with self._cond:
+                        self._counters['failed_checks'] += 1
+                    self._close_record(record)
+                    continue
+
+            with self._cond:
+                self._counters['checkouts'] += 1
+                self._counters['total_wait_ms'] += (time.monotonic() - started) * 1000
+            return PooledConnection(self, record)
+
+    def _release(self, record, discard=False):
+        if self._pid != os.getpid():
+            return
+        if not discard:
+            try:
+                record.conn.rollback()
+            except Exception:
+                discard = True
+        if discard or self._closed or self._expired(record, time.monotonic()):
+            self._close_record(record)
+            return
+        record.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(record)
+            self._cond.notify()
+
+    def prefill(self):
+        """Open connections until min_size are pooled"""
+        self._check_fork()
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            record = self._open_record()
+            with self._cond:
+                self._idle.append(record)
+                self._cond.notify()
+
+    def close(self):
+        """Close all idle connections and refuse further checkouts"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+        for record in idle:
+            self._close_record(record)
+
+    def stats(self):
+        """Snapshot of pool occupancy and lifetime counters"""
+        with self._cond:
+            idle = len(self._idle)
+            stats = {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': idle,
+                'in_use': self._size - idle,
+                'waiting': self._waiting,
+            }
+            stats.update(self._counters)
+        stats['total_wait_ms'] = round(stats['total_wait_ms'], 3)
+        return stats
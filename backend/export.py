@@ -0,0 +1,145 @@
+"""Chunked, constant-memory export of a user's entries as CSV or NDJSON
+
+An export holds its connection and server-side cursor for as long as the
+client keeps reading, so it doesn't borrow from the shared pool:
+ExportLimiter opens a dedicated connection per export, allows only a few
+at a time, and has Postgres end the session if the client stalls.
+"""
+import csv
+import io
+import json
+import threading
+import uuid
+
+from pagination import encode_cursor
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+EXPORT_CHUNK_ROWS = 1000
+
+CSV_FIELDS = (
+    'id', 'date', 'time', 'timestamp', 'method', 'thc_mg', 'amount', 'puffs',
+    'thc_percent', 'strain', 'mood', 'energy', 'focus', 'creativity', 'anxiety',
+    'activities', 'notes', 'created_at', 'updated_at', 'cursor'
+)
+
+
+class ExportsBusy(Exception):
+    """Raised when the concurrent export limit is reached"""
+
+
+class ExportConnection:
+    """Dedicated connection for one export; close() disconnects and frees its slot"""
+
+    def __init__(self, limiter, conn):
+        self._limiter = limiter
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self):
+        cursor = self._conn.cursor()
+        wrapper = self._limiter.cursor_wrapper
+        return wrapper(cursor, self._conn) if wrapper is not None else cursor
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            conn.close()
+        except Exception:
+            pass
+        finally:
+            self._limiter._slots.release()
+
+
+class ExportLimiter:
+    """Hands out at most max_concurrent export connections, opened outside the pool
+
+    idle_timeout (seconds) becomes the session's
+    idle_in_transaction_session_timeout, so a client that stops reading
+    mid-download can't keep the cursor's snapshot open indefinitely.
+    """
+
+    def __init__(self, connect, max_concurrent=2, idle_timeout=60.0, cursor_wrapper=None):
+        self.connect_fn = connect
+        self.max_concurrent = max_concurrent
+        self.idle_timeout = idle_timeout
+        self.cursor_wrapper = cursor_wrapper
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+
+    def connect(self):
+        """Open an ExportConnection, or raise ExportsBusy if none is free"""
+        if not self._slots.acquire(blocking=False):
+            raise ExportsBusy(f"{self.max_concurrent} exports already in progress")
+        conn = None
+        try:
+            conn = self.connect_fn()
+            if self.idle_timeout:
+                cur = conn.cursor()
+                try:
+                    cur.execute(f"SET idle_in_transaction_session_timeout = {int(self.idle_timeout * 1000)}")
+                finally:
+                    cur.close()
+        except BaseException:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._slots.release()
+            raise
+        return ExportConnection(self, conn)
+
+
+def iter_export(conn, select_sql, params, serialize, fmt):
+    """Yield encoded chunks for every row of select_sql
+
+    Rows are pulled through a server-side cursor EXPORT_CHUNK_ROWS at a
+    time, so memory use does not depend on history size. select_sql must
+    return rows in (timestamp, id) order with timestamp and id at positions
+    3 and 0; each exported row carries a cursor that resumes after it.
+    The caller owns conn and must close it once the generator finishes.
+    """
+    name = f"export_{uuid.uuid4().hex}"
+    cur = conn.cursor()
+    try:
+        cur.execute(f"DECLARE {name} NO SCROLL CURSOR FOR {select_sql}", params)
+
+        if fmt == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(CSV_FIELDS)
+            yield buffer.getvalue()
+
+        while True:
+            cur.execute(f"FETCH FORWARD {EXPORT_CHUNK_ROWS} FROM {name}")
+            rows = cur.fetchall()
+            if not rows:
+                break
+
+            if fmt == 'csv':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for row in rows:
+                    entry = serialize(row)
+                    entry['activities'] = ';'.join(entry['activities'])
+                    entry['cursor'] = encode_cursor(row[3], row[0])
+                    writer.writerow([entry.get(field) for field in CSV_FIELDS])
+                yield buffer.getvalue()
+            else:
+                lines = []
+                for row in rows:
+                    entry = serialize(row)
+                    entry['cursor'] = encode_cursor(row[3], row[0])
+                    lines.append(json.dumps(entry, separators=(',', ':')))
+                yield '\n'.join(lines) + '\n'
+
+        cur.execute(f"CLOSE {name}")
+    finally:
+        cur.close()
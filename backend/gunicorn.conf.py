@@ -0,0 +1,144 @@
+"""Production gunicorn settings for the Flask API (main:app) and the ASGI app
+
+    gunicorn -c backend/gunicorn.conf.py main:app
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \
+        gunicorn -c backend/gunicorn.conf.py asgi:app
+
+Every value can be overridden from the environment. Worker count defaults
+to the CPUs this process may actually use (affinity mask and cgroup quota,
+not the host's core count) and is capped so every worker's connections
+fit in the database: workers * (DB_POOL_MAX_SIZE + EXPORT_MAX_CONCURRENT),
+or ASYNC_DB_POOL_SIZE + ASYNC_DB_MAX_OVERFLOW per ASGI worker, stays
+within DB_MAX_CONNECTIONS (Postgres' max_connections, default 100) less
+DB_RESERVED_CONNECTIONS.
+"""
+import math
+import os
+import shutil
+import sys
+import tempfile
+
+# Run from backend/ whatever the launch directory, so flat modules import
+chdir = os.path.dirname(os.path.abspath(__file__))
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '8000')}")
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+_async_workers = 'uvicorn' in worker_class.lower()
+
+
+def _available_cpus():
+    """CPUs usable by this process: the affinity mask, lowered by a cgroup CPU quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = period = None
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+    except (OSError, ValueError):
+        try:
+            # cgroup v1: quota is -1 when unlimited
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+                quota = f.read().strip()
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+                period = f.read().strip()
+        except OSError:
+            pass
+    try:
+        if quota not in (None, 'max', '-1') and int(period) > 0:
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except ValueError:
+        pass
+    return cpus
+
+
+_cores = _available_cpus()
+
+# Connections one worker may open at most, and how many the database allows us
+if _async_workers:
+    _worker_connections = int(os.getenv('ASYNC_DB_POOL_SIZE', '20')) + int(os.getenv('ASYNC_DB_MAX_OVERFLOW', '20'))
+else:
+    _worker_connections = int(os.getenv('DB_POOL_MAX_SIZE', '10')) + int(os.getenv('EXPORT_MAX_CONCURRENT', '2'))
+_connection_budget = int(os.getenv('DB_MAX_CONNECTIONS', '100')) - int(os.getenv('DB_RESERVED_CONNECTIONS', '10'))
+
+# Threaded workers spend most of their time waiting on Postgres, so run
+# 2n+1 of them; event-loop workers need only one per core. Either way no
+# more than the database has connections for.
+workers = int(os.getenv('WEB_CONCURRENCY') or max(1, min(
+    _cores if _async_workers else _cores * 2 + 1,
+    int(os.getenv('GUNICORN_MAX_WORKERS', '12')),
+    _connection_budget // max(1, _worker_connections),
+)))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+
+# Import the app once in the master so config, JWT and pool setup are done
+# before fork and shared copy-on-write; post_fork resets per-process state.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() != 'false'
+
+# Recycle workers gradually to bound slow leaks without a thundering restart
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# Heartbeat files on tmpfs; a disk-backed /tmp can stall workers in containers
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+# Workers exchange metrics snapshots here so /metrics covers all of them;
+# a directory we create is removed again when the master exits
+_own_metrics_dir = not os.getenv('METRICS_DIR')
+if _own_metrics_dir:
+    os.environ['METRICS_DIR'] = tempfile.mkdtemp(
+        prefix='api-metrics-', dir='/dev/shm' if os.path.isdir('/dev/shm') else None
+    )
+
+# The Flask app already logs each request as structured JSON (with request
+# id and latency), so gunicorn's own access log is off unless asked for
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    # The master's log listener thread doesn't survive fork; start our own
+    if 'logqueue' in sys.modules:
+        sys.modules['logqueue'].after_fork()
+
+    # Connections opened in the master must not be shared with children
+    if 'app.database' in sys.modules:
+        database = sys.modules['app.database']
+        database.engine.dispose(close=False)
+        database.async_engine.sync_engine.dispose(close=False)
+
+    if 'main' in sys.modules:
+        # Start from zero rather than with whatever the master recorded
+        sys.modules['main'].metrics_registry.reset()
+        try:
+            sys.modules['main'].db_pool.prefill()
+        except Exception as e:
+            worker.log.warning(f"Could not prefill database pool: {e}")
+
+
+def worker_exit(server, worker):
+    if 'main' in sys.modules:
+        sys.modules['main'].db_pool.close()
+        # Final snapshot, so this worker's counts outlive it
+        try:
+            sys.modules['main'].metrics_registry.flush()
+        except OSError as e:
+            worker.log.warning(f"Could not write final metrics snapshot: {e}")
+
+    if 'logqueue' in sys.modules:
+        # Write out whatever is still queued before the process goes
+        sys.modules['logqueue'].shutdown()
+
+
+def on_exit(server):
+    if _own_metrics_dir:
+        shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
@@ -0,0 +1,145 @@
+"""Vectorized dose-effect analytics over a user's full entry history
+
+All of a user's entries are loaded with one query into column arrays, and
+every statistic is computed with NumPy reductions (bincount, matrix
+products) rather than Python loops, so a 100k-entry history takes a few
+milliseconds once fetched.
+"""
+import numpy as np
+
+EFFECTS = ('mood', 'energy', 'focus', 'creativity', 'anxiety')
+
+# Upper bounds (mg) of the dose buckets; the last bucket is open-ended
+DOSE_BUCKET_EDGES = (2.5, 5.0, 10.0, 20.0, 50.0)
+
+# Correlations from fewer points than this are too noisy to report
+MIN_CORRELATION_SAMPLES = 3
+
+# Columnar fetch: each column comes back as one bytea of packed big-endian
+# values (float8send/int4send), so decoding 100k rows is a few frombuffer
+# calls instead of building a Python object per value. All aggregates in
+# the query see rows in the same order, which keeps the columns aligned.
+LOAD_SQL = """
+    WITH e AS (
+        SELECT thc_mg, method, time, mood, energy, focus, creativity, anxiety
+        FROM entries
+        WHERE user_id = %s
+    ), m AS (
+        SELECT array_agg(DISTINCT method ORDER BY method) AS methods FROM e
+    )
+    SELECT m.methods,
+           string_agg(float8send(e.thc_mg::float8), ''::bytea),
+           string_agg(int4send(array_position(m.methods, e.method) - 1), ''::bytea),
+           string_agg(int4send(EXTRACT(HOUR FROM e.time)::int), ''::bytea),
+           string_agg(int4send(e.mood), ''::bytea),
+           string_agg(int4send(e.energy), ''::bytea),
+           string_agg(int4send(e.focus), ''::bytea),
+           string_agg(int4send(e.creativity), ''::bytea),
+           string_agg(int4send(e.anxiety), ''::bytea)
+    FROM e CROSS JOIN m
+    GROUP BY m.methods
+"""
+
+
+def _ints(packed):
+    return np.frombuffer(packed, dtype='>i4').astype(np.intp)
+
+
+def load_arrays(cur, user_id):
+    """Fetch a user's entries as (dose, methods, method_index, hour, effects)
+
+    effects is a (len(EFFECTS), n) float array, one contiguous row per
+    effect; method_index maps each entry into methods.
+    """
+    cur.execute(LOAD_SQL, (user_id,))
+    row = cur.fetchone()
+    if row is None:
+        return np.empty(0), [], np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty((len(EFFECTS), 0))
+
+    methods = list(row[0])
+    dose = np.frombuffer(row[1], dtype='>f8').astype(np.float64)
+    method_index = _ints(row[2])
+    hour = _ints(row[3])
+    effects = np.vstack([np.frombuffer(packed, dtype='>i4') for packed in row[4:]]).astype(np.float64)
+    return dose, methods, method_index, hour, effects
+
+
+def _round(values, digits=2):
+    return [None if np.isnan(v) else round(float(v), digits) for v in values]
+
+
+def _group_means(groups, n_groups, dose, effects):
+    """Session counts, mean dose and mean effects per group id"""
+    counts = np.bincount(groups, minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_dose = np.bincount(groups, weights=dose, minlength=n_groups) / counts
+        mean_effects = np.stack([
+            np.bincount(groups, weights=effect, minlength=n_groups) / counts
+            for effect in effects
+        ], axis=1)
+    return counts, mean_dose, mean_effects
+
+
+def _correlations(dose, effects):
+    """Pearson r between dose and each effect, and between effects"""
+    if len(dose) < MIN_CORRELATION_SAMPLES:
+        return None, None
+    data = np.vstack([dose, effects])
+    centered = data - data.mean(axis=1, keepdims=True)
+    spread = np.sqrt((centered ** 2).sum(axis=1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Constant series (e.g. every mood is 5) have no defined correlation
+        matrix = (centered @ centered.T) / np.outer(spread, spread)
+    dose_r = dict(zip(EFFECTS, _round(matrix[0, 1:], 3)))
+    effect_r = {
+        effect: dict(zip(EFFECTS, _round(matrix[i + 1, 1:], 3)))
+        for i, effect in enumerate(EFFECTS)
+    }
+    return dose_r, effect_r
+
+
+def _bucket_label(index):
+    edges = (0.0,) + DOSE_BUCKET_EDGES
+    if index < len(DOSE_BUCKET_EDGES):
+        return f"{edges[index]:g}-{edges[index + 1]:g}"
+    return f"{DOSE_BUCKET_EDGES[-1]:g}+"
+
+
+def compute(dose, methods, method_index, hour, effects):
+    """Correlations, dose-bucketed, per-method and per-hour effect means"""
+    dose_r, effect_r = _correlations(dose, effects)
+
+    n_buckets = len(DOSE_BUCKET_EDGES) + 1
+    buckets = np.searchsorted(np.asarray(DOSE_BUCKET_EDGES), dose, side='left')
+    bucket_counts, bucket_dose, bucket_effects = _group_means(buckets, n_buckets, dose, effects)
+
+    method_counts, method_dose, method_effects = _group_means(method_index, len(methods), dose, effects)
+    hour_counts, hour_dose, hour_effects = _group_means(hour, 24, dose, effects)
+
+    def rows(labels, counts, mean_dose, mean_effects, key):
+        return [
+            {
+                key: label,
+                'sessions': int(counts[i]),
+                'avg_thc_mg': _round(mean_dose[i:i + 1])[0],
+                **{f'avg_{effect}': value for effect, value in zip(EFFECTS, _round(mean_effects[i]))}
+            }
+            for i, label in enumerate(labels)
+            if counts[i]
+        ]
+
+    return {
+        'sessions': int(len(dose)),
+        'total_thc_mg': round(float(dose.sum()), 2),
+        'dose_correlations': dose_r,
+        'effect_correlations': effect_r,
+        'dose_buckets': rows([_bucket_label(i) for i in range(n_buckets)],
+                             bucket_counts, bucket_dose, bucket_effects, 'dose_mg'),
+        'methods': rows(methods, method_counts, method_dose, method_effects, 'method'),
+        'hours': rows(list(range(24)), hour_counts, hour_dose, hour_effects, 'hour'),
+    }
+
+
+def user_insights(cur, user_id):
+    """Load a user's entries and compute their insights"""
+    return compute(*load_arrays(cur, user_id))
@@ -0,0 +1,303 @@
+"""Queued, structured logging that keeps disk I/O off request threads
+
+configure() points the root logger at a single QueueHandler. Request
+threads only stamp the record with the current request context, check the
+rate limit and put it on an in-memory queue; a QueueListener thread owns
+the real handlers (stderr and a size-rotated file) and does the
+formatting and writing. If the queue is full the record is dropped and
+counted rather than blocking the caller.
+
+Records are written one JSON object per line (LOG_FORMAT=text for the old
+human-readable layout), with request_id, method and route taken from
+request_context plus any `extra` fields the caller passed (duration_ms,
+query_id, ...).
+
+Repeated warnings and errors are rate limited per logger, level and
+message shape (digits ignored): `burst` per `window` seconds go through,
+after that one in `sample`, and the next record let through carries the
+number suppressed in between. A database outage then produces a handful
+of lines a minute instead of one per request.
+
+The rotating file handler may be shared by several gunicorn workers:
+rotation happens under a file lock and the other processes reopen the
+new file when they notice the old one was moved.
+"""
+import atexit
+import contextvars
+import copy
+import fcntl
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+# {'request_id': ..., 'method': ..., 'route': ...} for the request being
+# handled on this thread, None outside requests
+request_context = contextvars.ContextVar('log_request_context', default=None)
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_FORMATS = ('json', 'text')
+
+# LogRecord attributes that are not caller-supplied `extra` fields
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_DIGITS = re.compile(r'\d+')
+_REQUEST_ID = re.compile(r'[A-Za-z0-9._:-]{1,64}')
+
+
+def request_id(supplied=None):
+    """The caller's X-Request-ID if it looks like an id, else a fresh one"""
+    if supplied and _REQUEST_ID.fullmatch(supplied):
+        return supplied
+    return uuid.uuid4().hex
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, context, extras"""
+
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        if record.stack_info:
+            data['stack'] = record.stack_info
+        return json.dumps(data, default=str, separators=(',', ':'))
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamps records with request_context; runs on the calling thread"""
+
+    def filter(self, record):
+        context = request_context.get()
+        if context:
+            for key, value in context.items():
+                if not hasattr(record, key):
+                    setattr(record, key, value)
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets through `burst` similar WARNING+ records per `window`, then one in `sample`"""
+
+    def __init__(self, burst=10, window=60.0, sample=100, max_keys=1024):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.sample = sample
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        # key -> [window start, records seen in window, suppressed since last emitted]
+        self._state = {}
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING or self.burst <= 0:
+            return True
+        key = (record.name, record.levelno, _DIGITS.sub('#', record.getMessage()))
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.get(key)
+            if state is None:
+                if len(self._state) >= self.max_keys:
+                    self._prune(now)
+                state = self._state[key] = [now, 0, 0]
+            elif now - state[0] >= self.window:
+                state[0], state[1] = now, 0
+            state[1] += 1
+            allowed = state[1] <= self.burst or (
+                self.sample > 0 and (state[1] - self.burst) % self.sample == 0
+            )
+            if not allowed:
+                state[2] += 1
+                return False
+            suppressed, state[2] = state[2], 0
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+    def _prune(self, now):
+        expired = [key for key, state in self._state.items() if now - state[0] >= self.window and not state[2]]
+        for key in expired:
+            del self._state[key]
+        if len(self._state) >= self.max_keys:
+            self._state.clear()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks: records are dropped and counted when the queue is full
+
+    Messages are rendered and exceptions turned into text before
+    enqueueing, so records hold no references to frames or arguments.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if self.dropped:
+            record.dropped, self.dropped = self.dropped, 0
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SharedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler safe to share between processes appending to one file
+
+    Rollover takes an flock on <file>.lock and skips rotating if another
+    process already did; the others see the path's inode change and reopen.
+    """
+
+    def _moved(self):
+        if self.stream is None:
+            return False
+        try:
+            current = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            return True
+        opened = os.fstat(self.stream.fileno())
+        return (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino)
+
+    def _reopen(self):
+        if self.stream is not None:
+            self.stream.close()
+        self.stream = self._open()
+
+    def shouldRollover(self, record):
+        if self._moved():
+            self._reopen()
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        with open(f"{self.baseFilename}.lock", 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # Another worker may have rotated while we waited for the lock
+            if self._moved():
+                self._reopen()
+                return
+            super().doRollover()
+
+
+class LogPipeline:
+    """The queue, its handler on the root logger and the listener writing records out"""
+
+    def __init__(self, handlers, queue_size=10000, burst=10, window=60.0, sample=100):
+        self.handlers = handlers
+        self.queue_size = queue_size
+        self.queue_handler = DroppingQueueHandler(queue.Queue(queue_size))
+        self.queue_handler.addFilter(RateLimitFilter(burst, window, sample))
+        self.queue_handler.addFilter(RequestContextFilter())
+        self.listener = None
+
+    def start(self):
+        self.listener = logging.handlers.QueueListener(
+            self.queue_handler.queue, *self.handlers, respect_handler_level=True
+        )
+        self.listener.start()
+
+    def stop(self):
+        """Write out everything queued and stop the listener thread"""
+        if self.listener is not None:
+            listener, self.listener = self.listener, None
+            listener.stop()
+
+    def after_fork(self):
+        """Restart in a forked child: the parent's listener thread did not survive fork"""
+        self.listener = None
+        self.queue_handler.queue = queue.Queue(self.queue_size)
+        self.queue_handler.dropped = 0
+        self.start()
+
+
+_pipeline = None
+
+
+def configure(level=logging.INFO, log_file=None, log_format='json', max_bytes=10 * 1024 * 1024,
+              backup_count=5, queue_size=10000, burst=10, window=60.0, sample=100):
+    """Route the root logger through a LogPipeline writing to stderr and log_file"""
+    global _pipeline
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f"log_format must be one of {', '.join(LOG_FORMATS)}")
+    formatter = JsonFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT)
+
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+            handlers.append(SharedRotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count))
+        except OSError as e:
+            print(f"Warning: Could not set up file logging: {e}")
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    if _pipeline is not None:
+        shutdown()
+    _pipeline = LogPipeline(handlers, queue_size, burst, window, sample)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_pipeline.queue_handler)
+    root.setLevel(level)
+    _pipeline.start()
+    return _pipeline
+
+
+def configure_from_env(default_log_file=None):
+    """configure() from LOG_LEVEL, LOG_FILE, LOG_FORMAT, LOG_MAX_BYTES, LOG_BACKUP_COUNT,
+    LOG_QUEUE_SIZE and LOG_RATE_BURST / LOG_RATE_WINDOW / LOG_RATE_SAMPLE"""
+    return configure(
+        level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+        log_file=os.getenv('LOG_FILE', default_log_file or ''),
+        log_format=os.getenv('LOG_FORMAT', 'json').lower(),
+        max_bytes=int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024))),
+        backup_count=int(os.getenv('LOG_BACKUP_COUNT', '5')),
+        queue_size=int(os.getenv('LOG_QUEUE_SIZE', '10000')),
+        burst=int(os.getenv('LOG_RATE_BURST', '10')),
+        window=float(os.getenv('LOG_RATE_WINDOW', '60')),
+        sample=int(os.getenv('LOG_RATE_SAMPLE', '100')),
+    )
+
+
+def after_fork():
+    """Call in each forked worker (gunicorn post_fork)"""
+    if _pipeline is not None:
+        _pipeline.after_fork()
+
+
+def shutdown():
+    """Flush and stop the listener; the root logger keeps its queue handler"""
+    if _pipeline is not None:
+        _pipeline.stop()
+        for handler in _pipeline.handlers:
+            handler.close()
+
+
+atexit.register(shutdown)
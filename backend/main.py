@@ -1,35 +1,51 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity
 import logging
 import os
 import pg8000
 from datetime import datetime, timedelta
-import bcrypt
 import uuid
+import hashlib
+import hmac
+import time
 from decouple import config
-
-# Configure logging
-log_handlers = [logging.StreamHandler()]
-
-# Only add file handler if we can create the logs directory
-try:
-    log_dir = os.path.join(os.path.dirname(__file__), '../logs')
-    os.makedirs(log_dir, exist_ok=True)
-    log_handlers.append(logging.FileHandler(os.path.join(log_dir, 'backend.log')))
-except Exception as e:
-    print(f"Warning: Could not set up file logging: {e}")
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=log_handlers
+from db_pool import ConnectionPool, PoolTimeout
+from password_hashing import HasherBusy, hasher_from_env
+from ttl_cache import TTLCache
+import activities
+import bulk_import
+import click
+import export
+import insights
+import metrics
+import json_provider
+import logqueue
+import migrations
+import querytrace
+import rollups
+import search
+import strains
+from rowmap import TEMPORAL_KINDS, compile_mapper
+from pagination import DEFAULT_PAGE_SIZE, NEXT, InvalidCursor, clamp_page_size, decode_cursor, page_cursors
+
+# Configure logging: request threads only enqueue records; a background
+# listener writes JSON lines to stderr and the rotating logs/backend.log
+logqueue.configure_from_env(
+    default_log_file=os.path.join(os.path.dirname(__file__), '../logs/backend.log')
 )
 
 logger = logging.getLogger(__name__)
+# One line per request with its status and latency (LOG_REQUESTS=false to disable);
+# gunicorn's access log is off by default so requests aren't logged twice
+access_logger = logging.getLogger('access')
+LOG_REQUESTS = os.getenv('LOG_REQUESTS', 'true').lower() not in ('0', 'false', 'no')
 
 app = Flask(__name__)
 
+# orjson when installed; JSON_BACKEND=stdlib forces Flask's default encoder
+json_provider.install(app, os.getenv('JSON_BACKEND', 'auto'))
+
 # Configure CORS - Allow production and development origins
 CORS(app, origins=[
     "http://localhost:3000", 
@@ -71,82 +87,251 @@ else:
         'port': int(os.getenv('DB_PORT', '5432'))
     }
 
+# Request, database and hashing metrics served at /metrics. Set METRICS_DIR
+# to a directory shared by all workers (gunicorn.conf.py does) so a scrape
+# sees every process, not just the one that answered it.
+metrics_registry = metrics.Registry()
+if os.getenv('METRICS_DIR'):
+    metrics_registry.share(os.getenv('METRICS_DIR'), float(os.getenv('METRICS_FLUSH_INTERVAL', '5')))
+
+HTTP_REQUESTS = metrics_registry.counter(
+    'http_requests_total', 'HTTP requests by method, route and status', ('method', 'route', 'status'))
+HTTP_REQUEST_SECONDS = metrics_registry.histogram(
+    'http_request_duration_seconds', 'Time to produce a response (streamed bodies excluded)',
+    ('method', 'route'))
+HTTP_IN_FLIGHT = metrics_registry.gauge(
+    'http_requests_in_flight', 'Requests being handled', ('route',))
+DB_CONNECT_SECONDS = metrics_registry.histogram(
+    'db_connect_seconds', 'Time to open a new database connection')
+DB_POOL_WAIT_SECONDS = metrics_registry.histogram(
+    'db_pool_wait_seconds', 'Time to check a connection out of the pool')
+DB_QUERY_SECONDS = metrics_registry.histogram(
+    'db_query_duration_seconds', 'Time spent in cursor.execute by statement type', ('operation',))
+BCRYPT_SECONDS = metrics_registry.histogram(
+    'bcrypt_duration_seconds', 'Time spent hashing or verifying one password', ('operation',),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0))
+DB_POOL_CONNECTIONS = metrics_registry.gauge(
+    'db_pool_connections', 'Pooled database connections by state', ('state',))
+
+# Per-statement timings and slow-query log (QUERY_SLOW_MS, QUERY_EXPLAIN);
+# top statements are served at /admin/queries
+query_tracer = querytrace.tracer_from_env()
+
+def connect_db():
+    """Open a new database connection, timing the connect"""
+    with DB_CONNECT_SECONDS.time():
+        return pg8000.connect(**DB_CONFIG)
+
+# Connection pool shared by all routes; connections are opened lazily
+db_pool = ConnectionPool(
+    connect_db,
+    min_size=int(os.getenv('DB_POOL_MIN_SIZE', '1')),
+    max_size=int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+    timeout=float(os.getenv('DB_POOL_TIMEOUT', '5')),
+    max_lifetime=float(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+    max_idle=float(os.getenv('DB_POOL_MAX_IDLE', '300')),
+    cursor_wrapper=lambda cursor, conn: metrics.TimedCursor(query_tracer.cursor(cursor, conn), DB_QUERY_SECONDS),
+)
+
+# Exports stream for as long as the client reads, so each gets its own
+# connection outside db_pool, a few per worker at a time
+export_limiter = export.ExportLimiter(
+    connect_db,
+    max_concurrent=int(os.getenv('EXPORT_MAX_CONCURRENT', '2')),
+    idle_timeout=float(os.getenv('EXPORT_IDLE_TIMEOUT', '60')),
+    cursor_wrapper=db_pool.cursor_wrapper,
+)
+
+@metrics_registry.on_collect
+def collect_pool_metrics():
+    stats = db_pool.stats()
+    for state in ('idle', 'in_use', 'waiting'):
+        DB_POOL_CONNECTIONS.set((state,), stats[state])
+
+# Per-process cache of computed stats, keyed by the user's data version so
+# other workers' writes are seen; this process's writes also invalidate it
+stats_cache = TTLCache(
+    max_size=int(os.getenv('STATS_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('STATS_CACHE_TTL', '30'))
+)
+
+# Dose-effect insights keyed by the user's data version, so entries stay
+# valid until the data changes; the TTL only bounds memory for idle users
+insights_cache = TTLCache(
+    max_size=int(os.getenv('INSIGHTS_CACHE_SIZE', '256')),
+    ttl=float(os.getenv('INSIGHTS_CACHE_TTL', '3600'))
+)
+
 def get_db_connection():
-    """Get database connection"""
+    """Check out a pooled database connection; close() returns it to the pool"""
     try:
-        conn = pg8000.connect(**DB_CONFIG)
-        return conn
+        with DB_POOL_WAIT_SECONDS.time():
+            return db_pool.getconn()
+    except PoolTimeout:
+        raise
     except Exception as e:
         logger.error(f"Database connection error: {e}")
         return None
 
-def init_db():
-    """Initialize database tables"""
-    conn = get_db_connection()
-    if not conn:
-        logger.error("Failed to connect to database")
-        return
+def retry_later_response(message, retry_after=1):
+    """503 response with Retry-After for shed load"""
+    response = jsonify({'error': message})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 503
 
-    try:
-        cur = conn.cursor()
+def pool_unavailable_response():
+    """503 response for when the connection pool is exhausted"""
+    return retry_later_response('Database is busy, please retry')
 
-        # Create users table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                username VARCHAR(50) UNIQUE NOT NULL,
-                email VARCHAR(100) UNIQUE NOT NULL,
-                password_hash VARCHAR(255) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+# bcrypt runs on a bounded worker pool so login bursts can't starve other routes
+password_hasher = hasher_from_env(
+    observer=lambda operation, seconds: BCRYPT_SECONDS.observe((operation,), seconds)
+)
 
-        # Create entries table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS entries (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                thc_mg DECIMAL(10,2) NOT NULL,
-                timestamp TIMESTAMP NOT NULL,
-                date DATE NOT NULL,
-                time TIME NOT NULL,
-                method VARCHAR(20) NOT NULL,
-                amount VARCHAR(50),
-                puffs VARCHAR(50),
-                thc_percent DECIMAL(5,2),
-                strain VARCHAR(100),
-                mood INTEGER NOT NULL DEFAULT 5,
-                energy INTEGER NOT NULL DEFAULT 5,
-                focus INTEGER NOT NULL DEFAULT 5,
-                creativity INTEGER NOT NULL DEFAULT 5,
-                anxiety INTEGER NOT NULL DEFAULT 0,
-                activities TEXT[],
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+def metrics_route():
+    """Route template for metric labels; unmatched paths share one label"""
+    return request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+
+@app.before_request
+def start_request():
+    """Start request metrics and set the route/request id seen by query tracing and logs"""
+    g.metrics_route = metrics_route()
+    g.metrics_started = time.perf_counter()
+    g.request_id = logqueue.request_id(request.headers.get('X-Request-ID'))
+    g.query_route_token = querytrace.current_route.set(g.metrics_route)
+    g.log_context_token = logqueue.request_context.set(
+        {'request_id': g.request_id, 'method': request.method, 'route': g.metrics_route}
+    )
+    HTTP_IN_FLIGHT.inc((g.metrics_route,))
+
+@app.after_request
+def record_request(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        route = g.metrics_route
+        elapsed = time.perf_counter() - started
+        HTTP_REQUEST_SECONDS.observe((request.method, route), elapsed)
+        HTTP_REQUESTS.inc((request.method, route, response.status_code))
+        if LOG_REQUESTS:
+            access_logger.info(
+                f"{request.method} {request.path} {response.status_code} {elapsed * 1000:.1f} ms",
+                extra={'status': response.status_code, 'duration_ms': round(elapsed * 1000, 3)}
             )
-        """)
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    metrics_registry.maybe_flush()
+    return response
+
+@app.teardown_request
+def finish_request(exc):
+    route = g.pop('metrics_route', None)
+    if route is not None:
+        HTTP_IN_FLIGHT.dec((route,))
+    for context, name in ((querytrace.current_route, 'query_route_token'),
+                          (logqueue.request_context, 'log_context_token')):
+        token = g.pop(name, None)
+        if token is not None:
+            context.reset(token)
+
+def bump_data_version(cur, user_id):
+    """Mark the user's entries as changed; call in the writing transaction"""
+    cur.execute("""
+        UPDATE users
+        SET data_version = data_version + 1, data_updated_at = now() AT TIME ZONE 'utc'
+        WHERE id = %s
+    """, (user_id,))
+
+def bump_data_versions(cur, user_id=None):
+    """bump_data_version for one user, or for every user with entries when user_id is None
+
+    For maintenance commands that rewrite derived tables, so ETags and
+    version-keyed caches stop serving the numbers from before the rebuild.
+    """
+    if user_id is not None:
+        bump_data_version(cur, user_id)
+        return
+    cur.execute("""
+        UPDATE users
+        SET data_version = data_version + 1, data_updated_at = now() AT TIME ZONE 'utc'
+        WHERE id IN (SELECT DISTINCT user_id FROM entries)
+    """)
+
+def data_validators(cur, user_id, variant=''):
+    """Compute (etag, last_modified) for a user's data
+
+    The ETag covers the user's data version plus variant, which must capture
+    anything else the response depends on (query args, the current date for
+    rolling windows).
+    """
+    cur.execute("SELECT data_version, data_updated_at FROM users WHERE id = %s", (user_id,))
+    row = cur.fetchone()
+    version, last_modified = (row[0], row[1]) if row else (0, None)
+    digest = hashlib.sha1(variant.encode('utf-8')).hexdigest()[:12]
+    return f"u{user_id}-v{version}-{digest}", last_modified
+
+def is_not_modified(etag, last_modified):
+    """Whether the request's If-None-Match / If-Modified-Since are still current"""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified:
+        since = request.if_modified_since.replace(tzinfo=None)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+def conditional_response(body, etag, last_modified, not_modified):
+    """Attach validators to a JSON body, or answer 304 when the client is current"""
+    response = Response(status=304) if not_modified else jsonify(body)
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# Column list shared by every query that returns full entries
+ENTRY_COLUMNS = """id, user_id, thc_mg, timestamp, date, time, method, amount, puffs,
+                   thc_percent, strain, mood, energy, focus, creativity, anxiety,
+                   activities, notes, created_at, updated_at"""
+
+# JSON shape of a row in ENTRY_COLUMNS order. Integer columns come back from
+# pg8000 as int already; DECIMAL as Decimal and temporal types as objects.
+ENTRY_FIELDS = (
+    ('id', None),
+    ('user_id', None),
+    ('thc_mg', 'float'),
+    ('timestamp', 'datetime'),
+    ('date', 'date'),
+    ('time', 'time'),
+    ('method', None),
+    ('amount', None),
+    ('puffs', None),
+    ('thc_percent', 'float_or_none'),
+    ('strain', None),
+    ('mood', None),
+    ('energy', None),
+    ('focus', None),
+    ('creativity', None),
+    ('anxiety', None),
+    ('activities', 'list'),
+    ('notes', None),
+    ('created_at', 'datetime'),
+    ('updated_at', 'datetime'),
+)
 
-        conn.commit()
-        logger.info("Database tables initialized successfully")
+# Plain-JSON dicts (export, CSV); extra trailing columns are ignored
+ENTRY_MAPPER = compile_mapper(ENTRY_FIELDS, name='entry')
+entry_to_dict = ENTRY_MAPPER.one
 
-    except Exception as e:
-        logger.error(f"Database initialization error: {e}")
-        conn.rollback()
-    finally:
-        if 'cur' in locals():
-            cur.close()
-        if conn:
-            conn.close()
-
-# Initialize database on startup
-init_db()
+# Dicts for JSON responses; temporal values are left to orjson when it's in use
+ENTRY_RESPONSE_MAPPER = compile_mapper(
+    ENTRY_FIELDS, name='entry_response',
+    native=TEMPORAL_KINDS if json_provider.encodes_temporal(app) else ()
+)
 
 # Authentication routes
 @app.route('/api/v1/register', methods=['POST'])
 def register():
     """Register a new user"""
+    conn = None
     try:
         data = request.get_json()
 
@@ -158,7 +343,7 @@ def register():
         email = data['email']
 
         # Hash password
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        password_hash = password_hasher.hash(password)
 
         conn = get_db_connection()
         if not conn:
@@ -185,6 +370,12 @@ def register():
             'user_id': user_id
         }), 201
 
+    except PoolTimeout as e:
+        logger.warning(f"Registration error: {e}")
+        return pool_unavailable_response()
+    except HasherBusy as e:
+        logger.warning(f"Registration error: {e}")
+        return retry_later_response('Server is busy, please retry')
     except Exception as e:
         logger.error(f"Registration error: {e}")
         return jsonify({'error': 'Registration failed'}), 500
@@ -197,6 +388,7 @@ def register():
 @app.route('/api/v1/login', methods=['POST'])
 def login():
     """Login user"""
+    conn = None
     try:
         data = request.get_json()
 
@@ -226,9 +418,21 @@ def login():
             'password_hash': user_row[3]
         }
 
-        if not bcrypt.checkpw(password.encode('utf-8'), user['password_hash'].encode('utf-8')):
+        if not password_hasher.verify(password, user['password_hash']):
             return jsonify({'error': 'Invalid credentials'}), 401
 
+        # Upgrade hashes made with a different cost factor while we have the
+        # password; best effort, a busy hasher just defers it to the next login
+        if password_hasher.needs_rehash(user['password_hash']):
+            try:
+                cur.execute(
+                    "UPDATE users SET password_hash = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+                    (password_hasher.hash(password), user['id'])
+                )
+                conn.commit()
+            except HasherBusy:
+                logger.info(f"Deferred password rehash for user {user['id']}")
+
         # Create access token
         from flask_jwt_extended import create_access_token
         access_token = create_access_token(identity=str(user['id']))
@@ -242,6 +446,12 @@ def login():
             }
         }), 200
 
+    except PoolTimeout as e:
+        logger.warning(f"Login error: {e}")
+        return pool_unavailable_response()
+    except HasherBusy as e:
+        logger.warning(f"Login error: {e}")
+        return retry_later_response('Server is busy, please retry')
     except Exception as e:
         logger.error(f"Login error: {e}")
         return jsonify({'error': 'Login failed'}), 500
@@ -256,6 +466,7 @@ def login():
 @jwt_required()
 def create_entry():
     """Create a new entry"""
+    conn = None
     try:
         user_id = get_jwt_identity()
         data = request.get_json()
@@ -286,49 +497,47 @@ def create_entry():
 
         cur = conn.cursor()
 
-        cur.execute("""
+        strain_id = strains.resolve(cur, data.get('strain'))
+        activity_ids = activities.resolve(cur, data.get('activities', []))
+        cur.execute(f"""
             INSERT INTO entries (
                 user_id, thc_mg, timestamp, date, time, method, amount, puffs,
                 thc_percent, strain, mood, energy, focus, creativity, anxiety,
-                activities, notes
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id, user_id, thc_mg, timestamp, date, time, method, amount, puffs, thc_percent, strain, mood, energy, focus, creativity, anxiety, activities, notes, created_at, updated_at
+                activities, notes, strain_id, activity_ids
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING {ENTRY_COLUMNS}
         """, (
             user_id, thc_mg, timestamp, date_str, time_str,
             method, data.get('amount'), data.get('puffs'), data.get('thc_percent'),
             data.get('strain'), data.get('mood', 5), data.get('energy', 5),
             data.get('focus', 5), data.get('creativity', 5), data.get('anxiety', 0),
-            data.get('activities', []), data.get('notes')
+            data.get('activities', []), data.get('notes'), strain_id, activity_ids
         ))
 
         entry_row = cur.fetchone()
+        rollups.apply_entry(
+            cur, entry_row[1], entry_row[4], entry_row[6], entry_row[2],
+            entry_row[11], entry_row[12], entry_row[13], entry_row[14], entry_row[15]
+        )
+        strains.apply_entry(
+            cur, entry_row[1], strain_id, entry_row[2],
+            entry_row[11], entry_row[12], entry_row[13], entry_row[14], entry_row[15]
+        )
+        activities.apply_entry(
+            cur, entry_row[1], activity_ids, entry_row[2],
+            entry_row[11], entry_row[12], entry_row[13], entry_row[14], entry_row[15]
+        )
+        bump_data_version(cur, user_id)
         conn.commit()
+        stats_cache.invalidate_user(user_id)
 
-        entry = {
-            'id': entry_row[0],
-            'user_id': entry_row[1],
-            'thc_mg': float(entry_row[2]),
-            'timestamp': entry_row[3].isoformat() if entry_row[3] else None,
-            'date': str(entry_row[4]),
-            'time': str(entry_row[5]),
-            'method': entry_row[6],
-            'amount': entry_row[7],
-            'puffs': entry_row[8],
-            'thc_percent': float(entry_row[9]) if entry_row[9] else None,
-            'strain': entry_row[10],
-            'mood': int(entry_row[11]),
-            'energy': int(entry_row[12]),
-            'focus': int(entry_row[13]),
-            'creativity': int(entry_row[14]),
-            'anxiety': int(entry_row[15]),
-            'activities': entry_row[16] if entry_row[16] else [],
-            'notes': entry_row[17],
-            'created_at': entry_row[18].isoformat() if entry_row[18] else None,
-            'updated_at': entry_row[19].isoformat() if entry_row[19] else None
-        }
+        entry = ENTRY_RESPONSE_MAPPER.one(entry_row)
 
         return jsonify(entry), 201
 
+    except PoolTimeout as e:
+        logger.warning(f"Create entry error: {e}")
+        return pool_unavailable_response()
     except Exception as e:
         logger.error(f"Create entry error: {e}")
         return jsonify({'error': 'Failed to create entry'}), 500
@@ -338,57 +547,173 @@ def create_entry():
         if conn:
             conn.close()
 
+@app.route('/api/v1/entries/batch', methods=['POST'])
+@jwt_required()
+def create_entries_batch():
+    """Bulk-import entries from a JSON array or CSV
+
+    Accepts a JSON array (or {"entries": [...]}), a text/csv body, or a
+    multipart upload in the "file" field. Valid rows are loaded with one COPY
+    in a single transaction; invalid rows are reported by index. Pass
+    ?all_or_nothing=true to reject the whole batch if any row is invalid.
+    """
+    conn = None
+    try:
+        user_id = get_jwt_identity()
+
+        if 'file' in request.files:
+            try:
+                text = request.files['file'].read().decode('utf-8-sig')
+            except UnicodeDecodeError:
+                return jsonify({'error': 'file must be UTF-8 encoded CSV'}), 400
+            rows = bulk_import.parse_csv(text)
+        elif request.mimetype == 'text/csv':
+            rows = bulk_import.parse_csv(request.get_data(as_text=True))
+        else:
+            data = request.get_json(silent=True)
+            rows = data.get('entries') if isinstance(data, dict) else data
+
+        if not isinstance(rows, list) or not rows:
+            return jsonify({'error': 'No entries provided'}), 400
+        if len(rows) > bulk_import.MAX_BATCH_ROWS:
+            return jsonify({'error': f'At most {bulk_import.MAX_BATCH_ROWS} entries per batch'}), 413
+
+        prepared, errors = bulk_import.prepare_rows(rows)
+        all_or_nothing = request.args.get('all_or_nothing', '').lower() in ('1', 'true', 'yes')
+        if not prepared or (errors and all_or_nothing):
+            return jsonify({'inserted': 0, 'errors': errors}), 400
+
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'error': 'Database connection failed'}), 500
+
+        cur = conn.cursor()
+        catalog = strains.resolve_many(cur, [entry.strain for entry, _, _ in prepared])
+        strain_ids = [catalog.get(strains.normalize(entry.strain)) for entry, _, _ in prepared]
+        activity_catalog = activities.resolve_many(
+            cur, [name for entry, _, _ in prepared for name in entry.activities]
+        )
+        activity_ids = [activities.encode(activity_catalog, entry.activities) for entry, _, _ in prepared]
+        inserted = bulk_import.copy_entries(cur, user_id, prepared, strain_ids, activity_ids)
+        rollups.apply_batch(cur, user_id, [
+            (timestamp.date(), entry.method, thc_mg,
+             entry.mood, entry.energy, entry.focus, entry.creativity, entry.anxiety)
+            for entry, timestamp, thc_mg in prepared
+        ])
+        strains.apply_batch(cur, user_id, [
+            (strain_id, thc_mg, entry.mood, entry.energy, entry.focus, entry.creativity, entry.anxiety)
+            for strain_id, (entry, _, thc_mg) in zip(strain_ids, prepared)
+        ])
+        activities.apply_batch(cur, user_id, [
+            (ids, thc_mg, entry.mood, entry.energy, entry.focus, entry.creativity, entry.anxiety)
+            for ids, (entry, _, thc_mg) in zip(activity_ids, prepared)
+        ])
+        bump_data_version(cur, user_id)
+        conn.commit()
+        stats_cache.invalidate_user(user_id)
+
+        return jsonify({'inserted': inserted, 'errors': errors}), 201
+
+    except PoolTimeout as e:
+        logger.warning(f"Batch create entries error: {e}")
+        return pool_unavailable_response()
+    except Exception as e:
+        logger.error(f"Batch create entries error: {e}")
+        return jsonify({'error': 'Failed to import entries'}), 500
+    finally:
+        if 'cur' in locals():
+            cur.close()
+        if conn:
+            conn.close()
+
 @app.route('/api/v1/entries', methods=['GET'])
 @jwt_required()
 def get_entries():
-    """Get user's entries"""
+    """Get a page of the user's entries, newest first
+
+    Pagination is keyset-based on (timestamp, id): pass the next_cursor or
+    prev_cursor from a previous response as ?cursor= to move through history.
+    ?activity= (repeatable or comma-separated) keeps entries with all of the
+    named activities, or any of them with ?activity_match=any.
+    """
+    conn = None
     try:
         user_id = get_jwt_identity()
 
+        try:
+            limit = clamp_page_size(request.args.get('limit'))
+            cursor = request.args.get('cursor')
+            position = decode_cursor(cursor) if cursor else None
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+
+        activity_names = [
+            name.strip() for value in request.args.getlist('activity')
+            for name in value.split(',') if name.strip()
+        ]
+        activity_match = request.args.get('activity_match', 'all')
+        if activity_match not in activities.MATCH_MODES:
+            return jsonify({'error': f"activity_match must be one of: {', '.join(activities.MATCH_MODES)}"}), 400
+        if len(activity_names) > activities.MAX_FILTER_ACTIVITIES:
+            return jsonify({'error': f'At most {activities.MAX_FILTER_ACTIVITIES} activities per filter'}), 400
+
         conn = get_db_connection()
         if not conn:
             return jsonify({'error': 'Database connection failed'}), 500
 
         cur = conn.cursor()
 
-        cur.execute("""
-            SELECT id, user_id, thc_mg, timestamp, date, time, method, amount, puffs,
-                   thc_percent, strain, mood, energy, focus, creativity, anxiety,
-                   activities, notes, created_at, updated_at
+        etag, last_modified = data_validators(cur, user_id, request.query_string.decode('utf-8'))
+        if is_not_modified(etag, last_modified):
+            return conditional_response(None, etag, last_modified, True)
+
+        activity_clause, activity_params = '', ()
+        if activity_names:
+            activity_filter = activities.entry_filter(cur, activity_names, activity_match)
+            if activity_filter is None:
+                return conditional_response({
+                    'entries': [],
+                    'next_cursor': None,
+                    'prev_cursor': None,
+                    'limit': limit
+                }, etag, last_modified, False)
+            activity_clause, activity_params = activity_filter
+
+        if position is None:
+            direction = NEXT
+            keyset_clause, keyset_params, order = '', (), 'DESC'
+        else:
+            cursor_ts, cursor_id, direction = position
+            if direction == NEXT:
+                keyset_clause, order = 'AND (timestamp, id) < (%s, %s)', 'DESC'
+            else:
+                keyset_clause, order = 'AND (timestamp, id) > (%s, %s)', 'ASC'
+            keyset_params = (cursor_ts, cursor_id)
+
+        cur.execute(f"""
+            SELECT {ENTRY_COLUMNS}
             FROM entries
-            WHERE user_id = %s
-            ORDER BY timestamp DESC
-        """, (user_id,))
-
-        entries_rows = cur.fetchall()
-        entries = []
-
-        for row in entries_rows:
-            entries.append({
-                'id': row[0],
-                'user_id': row[1],
-                'thc_mg': float(row[2]),
-                'timestamp': row[3].isoformat() if row[3] else None,
-                'date': str(row[4]),
-                'time': str(row[5]),
-                'method': row[6],
-                'amount': row[7],
-                'puffs': row[8],
-                'thc_percent': float(row[9]) if row[9] else None,
-                'strain': row[10],
-                'mood': int(row[11]),
-                'energy': int(row[12]),
-                'focus': int(row[13]),
-                'creativity': int(row[14]),
-                'anxiety': int(row[15]),
-                'activities': row[16] if row[16] else [],
-                'notes': row[17],
-                'created_at': row[18].isoformat() if row[18] else None,
-                'updated_at': row[19].isoformat() if row[19] else None
-            })
-
-        return jsonify(entries), 200
-
+            WHERE user_id = %s {activity_clause} {keyset_clause}
+            ORDER BY timestamp {order}, id {order}
+            LIMIT %s
+        """, (user_id,) + activity_params + keyset_params + (limit + 1,))
+
+        entries_rows, next_cursor, prev_cursor = page_cursors(
+            cur.fetchall(), limit, direction, position is not None,
+            key=lambda row: (row[3], row[0])
+        )
+        entries = ENTRY_RESPONSE_MAPPER.many(entries_rows)
+
+        return conditional_response({
+            'entries': entries,
+            'next_cursor': next_cursor,
+            'prev_cursor': prev_cursor,
+            'limit': limit
+        }, etag, last_modified, False)
+
+    except PoolTimeout as e:
+        logger.warning(f"Get entries error: {e}")
+        return pool_unavailable_response()
     except Exception as e:
         logger.error(f"Get entries error: {e}")
         return jsonify({'error': 'Failed to get entries'}), 500
@@ -398,40 +723,225 @@ def get_entries():
         if conn:
             conn.close()
 
+@app.route('/api/v1/entries/export', methods=['GET'])
+@jwt_required()
+def export_entries():
+    """Stream the user's full history as CSV or NDJSON, oldest first
+
+    Query args: format (csv|ndjson, default csv), start/end (YYYY-MM-DD,
+    inclusive), cursor (the cursor column of the last row received, to
+    resume an interrupted download after that row).
+    """
+    conn = None
+    try:
+        user_id = get_jwt_identity()
+
+        fmt = request.args.get('format', 'csv')
+        if fmt not in export.EXPORT_FORMATS:
+            return jsonify({'error': f"format must be one of {', '.join(export.EXPORT_FORMATS)}"}), 400
+
+        conditions = ['user_id = %s']
+        params = [user_id]
+        try:
+            if request.args.get('start'):
+                conditions.append('timestamp >= %s')
+                params.append(datetime.strptime(request.args['start'], '%Y-%m-%d'))
+            if request.args.get('end'):
+                conditions.append('timestamp < %s')
+                params.append(datetime.strptime(request.args['end'], '%Y-%m-%d') + timedelta(days=1))
+            if request.args.get('cursor'):
+                cursor_ts, cursor_id, _ = decode_cursor(request.args['cursor'])
+                conditions.append('(timestamp, id) > (%s, %s)')
+                params.extend((cursor_ts, cursor_id))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        try:
+            conn = export_limiter.connect()
+        except export.ExportsBusy:
+            return retry_later_response('Too many exports in progress, please retry', retry_after=5)
+
+        select_sql = f"""
+            SELECT {ENTRY_COLUMNS}
+            FROM entries
+            WHERE {' AND '.join(conditions)}
+            ORDER BY timestamp, id
+        """
+
+        # The generator owns the export connection from here on
+        stream_conn, conn = conn, None
+
+        def generate():
+            try:
+                yield from export.iter_export(stream_conn, select_sql, tuple(params), entry_to_dict, fmt)
+            except Exception as e:
+                logger.error(f"Export entries error: {e}")
+                raise
+            finally:
+                stream_conn.close()
+
+        filename = f"cannabis-tracker-export.{fmt}"
+        response = Response(
+            stream_with_context(generate()),
+            mimetype=export.EXPORT_FORMATS[fmt],
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+        # Frees the export slot even if the client goes before the body starts
+        response.call_on_close(stream_conn.close)
+        return response
+
+    except Exception as e:
+        logger.error(f"Export entries error: {e}")
+        return jsonify({'error': 'Failed to export entries'}), 500
+    finally:
+        if conn:
+            conn.close()
+
+DEFAULT_STATS_WINDOWS = ('1d', '7d', '30d', '90d', 'all')
+MAX_STATS_WINDOWS = 8
+STATS_MEASURES = ('thc_mg_total', 'sessions', 'mood_sum', 'energy_sum', 'focus_sum', 'creativity_sum', 'anxiety_sum')
+
+def parse_stats_windows(value):
+    """Parse a comma-separated window list like '7d,30d,all' into unique names
+
+    Nd windows cover the last N calendar days including today.
+    """
+    if not value:
+        return DEFAULT_STATS_WINDOWS
+    windows = []
+    for name in (part.strip().lower() for part in value.split(',')):
+        if not name or name in windows:
+            continue
+        if name != 'all':
+            if not (name.endswith('d') and name[:-1].isdigit() and 1 <= int(name[:-1]) <= MAX_SERIES_DAYS):
+                raise ValueError(f"Invalid window {name!r}; use Nd (1-{MAX_SERIES_DAYS}) or all")
+        windows.append(name)
+    if not windows or len(windows) > MAX_STATS_WINDOWS:
+        raise ValueError(f"Request between 1 and {MAX_STATS_WINDOWS} windows")
+    return tuple(windows)
+
+def window_start(name, today):
+    """First day covered by a window, or None for all-time"""
+    if name == 'all':
+        return None
+    return today - timedelta(days=int(name[:-1]) - 1)
+
+def stats_windows_query(user_id, windows, today):
+    """One pass over entry_rollups with a FILTERed aggregate per window and measure"""
+    columns = ['MIN(day)']
+    params = []
+    for name in windows:
+        start = window_start(name, today)
+        for measure in STATS_MEASURES:
+            if start is None:
+                columns.append(f"COALESCE(SUM({measure}), 0)")
+            else:
+                columns.append(f"COALESCE(SUM({measure}) FILTER (WHERE day >= %s), 0)")
+                params.append(start)
+
+    # Without an all-time window only the widest window's rows are needed
+    starts = [window_start(name, today) for name in windows]
+    where = "user_id = %s"
+    params.append(user_id)
+    if None not in starts:
+        where += " AND day >= %s"
+        params.append(min(starts))
+    return f"SELECT {', '.join(columns)} FROM entry_rollups WHERE {where}", tuple(params)
+
+def window_stats(name, sums, first_day, today):
+    """Totals, per-day and per-session averages and effect means for one window"""
+    total_mg, sessions = float(sums[0]), int(sums[1])
+    start = window_start(name, today)
+    if start is None:
+        start = first_day or today
+    days = (today - start).days + 1
+
+    def mean(value):
+        return round(float(value) / sessions, 2) if sessions else None
+
+    return {
+        'start': start.isoformat(),
+        'days': days,
+        'total_thc_mg': round(total_mg, 2),
+        'sessions': sessions,
+        'per_day_thc_mg': round(total_mg / days, 2),
+        'per_session_thc_mg': mean(total_mg),
+        'avg_mood': mean(sums[2]),
+        'avg_energy': mean(sums[3]),
+        'avg_focus': mean(sums[4]),
+        'avg_creativity': mean(sums[5]),
+        'avg_anxiety': mean(sums[6])
+    }
+
 @app.route('/api/v1/entries/stats', methods=['GET'])
 @jwt_required()
 def get_stats():
-    """Get user's statistics"""
+    """Get user's statistics
+
+    Query arg windows: comma-separated Nd/all windows (default
+    1d,7d,30d,90d,all), all computed in one query. The top-level
+    weekly_total/daily_avg/avg_mood/total_sessions fields describe the
+    last 7 days and keep their original meaning (daily_avg is per session).
+    """
+    conn = None
     try:
         user_id = get_jwt_identity()
 
+        try:
+            windows = parse_stats_windows(request.args.get('windows'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        # The legacy fields are read from the 7d window
+        query_windows = windows if '7d' in windows else windows + ('7d',)
+
+        # Windows roll over at midnight, so the date is part of the ETag
+        today = datetime.now().date()
+        variant = f"{today.isoformat()}:{','.join(windows)}"
+
         conn = get_db_connection()
         if not conn:
             return jsonify({'error': 'Database connection failed'}), 500
 
         cur = conn.cursor()
 
-        # Get last 7 days stats
-        cur.execute("""
-            SELECT
-                COALESCE(SUM(thc_mg), 0) as weekly_total,
-                COALESCE(AVG(thc_mg), 0) as daily_avg,
-                COALESCE(AVG(mood), 0) as avg_mood,
-                COUNT(*) as total_sessions
-            FROM entries
-            WHERE user_id = %s AND timestamp >= CURRENT_DATE - INTERVAL '7 days'
-        """, (user_id,))
+        # The ETag embeds the data version, so keying the cache on it stays
+        # correct when another worker handled the write; only the version
+        # lookup hits the DB on a cache hit
+        etag, last_modified = data_validators(cur, user_id, variant)
+        if is_not_modified(etag, last_modified):
+            return conditional_response(None, etag, last_modified, True)
+
+        cache_key = (user_id, 'stats', etag)
+        cached = stats_cache.get(cache_key)
+        if cached is not None:
+            return conditional_response(cached, etag, last_modified, False)
+        generation = stats_cache.generation(user_id)
+
+        sql, params = stats_windows_query(user_id, query_windows, today)
+        cur.execute(sql, params)
+        row = cur.fetchone()
+        first_day = row[0]
+        width = len(STATS_MEASURES)
+        results = {
+            name: window_stats(name, row[1 + i * width:1 + (i + 1) * width], first_day, today)
+            for i, name in enumerate(query_windows)
+        }
 
-        stats_row = cur.fetchone()
+        week = results['7d']
         stats = {
-            'weekly_total': float(stats_row[0]),
-            'daily_avg': float(stats_row[1]),
-            'avg_mood': float(stats_row[2]),
-            'total_sessions': stats_row[3]
+            'weekly_total': week['total_thc_mg'],
+            'daily_avg': week['per_session_thc_mg'] or 0.0,
+            'avg_mood': week['avg_mood'] or 0.0,
+            'total_sessions': week['sessions'],
+            'windows': {name: results[name] for name in windows}
         }
+        stats_cache.set(cache_key, stats, generation)
 
-        return jsonify(stats), 200
+        return conditional_response(stats, etag, last_modified, False)
 
+    except PoolTimeout as e:
+        logger.warning(f"Get stats error: {e}")
+        return pool_unavailable_response()
     except Exception as e:
         logger.error(f"Get stats error: {e}")
         return jsonify({'error': 'Failed to get statistics'}), 500
@@ -441,10 +951,237 @@ def get_stats():
         if conn:
             conn.close()
 
+SERIES_BUCKETS = ('day', 'week', 'month')
+MAX_SERIES_DAYS = 3660
+
+def bucket_start(day, bucket):
+    """First calendar day of the bucket containing day (weeks start Monday)"""
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+def next_bucket(start, bucket):
+    """First calendar day of the bucket following the one starting at start"""
+    if bucket == 'week':
+        return start + timedelta(days=7)
+    if bucket == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+def parse_series_range(args):
+    """Parse bucket/start/end/days query args into (bucket, start_date, end_date)"""
+    bucket = args.get('bucket', 'day')
+    if bucket not in SERIES_BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(SERIES_BUCKETS)}")
+
+    end = datetime.strptime(args['end'], '%Y-%m-%d').date() if args.get('end') else datetime.now().date()
+    if args.get('start'):
+        start = datetime.strptime(args['start'], '%Y-%m-%d').date()
+    else:
+        start = end - timedelta(days=int(args.get('days', 30)) - 1)
+
+    if start > end:
+        raise ValueError("start must not be after end")
+    if (end - start).days >= MAX_SERIES_DAYS:
+        raise ValueError(f"Date range is limited to {MAX_SERIES_DAYS} days")
+    return bucket, start, end
+
+@app.route('/api/v1/entries/stats/series', methods=['GET'])
+@jwt_required()
+def get_stats_series():
+    """Get per-day/week/month aggregates over a date range
+
+    Query args: bucket (day|week|month, default day), start/end (YYYY-MM-DD,
+    inclusive; end defaults to today) or days (default 30). Empty buckets are
+    included so the result can be charted directly.
+    """
+    conn = None
+    try:
+        user_id = get_jwt_identity()
+
+        try:
+            bucket, start, end = parse_series_range(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'error': 'Database connection failed'}), 500
+
+        cur = conn.cursor()
+
+        # Aggregate the daily rollups per (bucket, method) first, then fold
+        # methods into one row per bucket so everything comes from one query.
+        cur.execute("""
+            SELECT bucket,
+                   SUM(total_mg), SUM(sessions),
+                   SUM(mood_sum), SUM(energy_sum), SUM(focus_sum),
+                   SUM(creativity_sum), SUM(anxiety_sum),
+                   json_object_agg(method, sessions)
+            FROM (
+                SELECT date_trunc(%s, day::timestamp)::date AS bucket, method,
+                       SUM(thc_mg_total) AS total_mg, SUM(sessions) AS sessions,
+                       SUM(mood_sum) AS mood_sum, SUM(energy_sum) AS energy_sum,
+                       SUM(focus_sum) AS focus_sum, SUM(creativity_sum) AS creativity_sum,
+                       SUM(anxiety_sum) AS anxiety_sum
+                FROM entry_rollups
+                WHERE user_id = %s AND day >= %s AND day <= %s
+                GROUP BY 1, 2
+            ) per_method
+            GROUP BY bucket
+            ORDER BY bucket
+        """, (bucket, user_id, start, end))
+
+        rows = {row[0]: row for row in cur.fetchall()}
+        series = []
+        current = bucket_start(start, bucket)
+        while current <= end:
+            row = rows.get(current)
+            sessions = int(row[2]) if row else 0
+            series.append({
+                'date': current.isoformat(),
+                'total_thc_mg': round(float(row[1]), 2) if row else 0.0,
+                'sessions': sessions,
+                'avg_mood': round(float(row[3]) / sessions, 2) if sessions else None,
+                'avg_energy': round(float(row[4]) / sessions, 2) if sessions else None,
+                'avg_focus': round(float(row[5]) / sessions, 2) if sessions else None,
+                'avg_creativity': round(float(row[6]) / sessions, 2) if sessions else None,
+                'avg_anxiety': round(float(row[7]) / sessions, 2) if sessions else None,
+                'methods': row[8] if row else {}
+            })
+            current = next_bucket(current, bucket)
+
+        return jsonify({
+            'bucket': bucket,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'series': series
+        }), 200
+
+    except PoolTimeout as e:
+        logger.warning(f"Get stats series error: {e}")
+        return pool_unavailable_response()
+    except Exception as e:
+        logger.error(f"Get stats series error: {e}")
+        return jsonify({'error': 'Failed to get statistics'}), 500
+    finally:
+        if 'cur' in locals():
+            cur.close()
+        if conn:
+            conn.close()
+
+@app.route('/api/v1/entries/search', methods=['GET'])
+@jwt_required()
+def search_entries():
+    """Full-text search over the user's entry notes, best matches first
+
+    Query args: q (websearch syntax: words, "phrases", or, -exclusions),
+    start/end (YYYY-MM-DD, inclusive), method (comma-separated), limit and
+    offset. Each result is an entry plus its rank and an HTML-escaped
+    snippet with matches wrapped in <mark>.
+    """
+    conn = None
+    try:
+        user_id = get_jwt_identity()
+
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'q is required'}), 400
+        if len(query) > search.MAX_QUERY_LENGTH:
+            return jsonify({'error': f'q must be at most {search.MAX_QUERY_LENGTH} characters'}), 400
+        try:
+            start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else None
+            end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else None
+            limit = int(request.args.get('limit', search.DEFAULT_SEARCH_LIMIT))
+            offset = int(request.args.get('offset', 0))
+        except ValueError:
+            return jsonify({'error': 'Invalid start, end, limit or offset'}), 400
+        if not 1 <= limit <= search.MAX_SEARCH_LIMIT or offset < 0:
+            return jsonify({'error': f'limit must be 1-{search.MAX_SEARCH_LIMIT} and offset non-negative'}), 400
+        methods = [m.strip() for m in request.args.get('method', '').split(',') if m.strip()]
+
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'error': 'Database connection failed'}), 500
+
+        cur = conn.cursor()
+
+        rows = search.search_entries(cur, user_id, query, ENTRY_COLUMNS, start, end, methods, limit, offset)
+        results = []
+        for row in rows[:limit]:
+            entry = ENTRY_RESPONSE_MAPPER.one(row)
+            entry['rank'] = round(float(row[-2]), 4)
+            entry['snippet'] = search.snippet_html(row[-1])
+            results.append(entry)
+
+        return jsonify({
+            'query': query,
+            'results': results,
+            'limit': limit,
+            'offset': offset,
+            'has_more': len(rows) > limit
+        }), 200
+
+    except PoolTimeout as e:
+        logger.warning(f"Search entries error: {e}")
+        return pool_unavailable_response()
+    except Exception as e:
+        logger.error(f"Search entries error: {e}")
+        return jsonify({'error': 'Failed to search entries'}), 500
+    finally:
+        if 'cur' in locals():
+            cur.close()
+        if conn:
+            conn.close()
+
+@app.route('/api/v1/entries/insights', methods=['GET'])
+@jwt_required()
+def get_insights():
+    """Get dose-effect correlations and dose/method/hour breakdowns"""
+    conn = None
+    try:
+        user_id = get_jwt_identity()
+
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'error': 'Database connection failed'}), 500
+
+        cur = conn.cursor()
+
+        # The ETag embeds the data version, so it doubles as a cache key that
+        # is correct across workers; only the version lookup hits the DB
+        etag, last_modified = data_validators(cur, user_id, 'insights')
+        if is_not_modified(etag, last_modified):
+            return conditional_response(None, etag, last_modified, True)
+
+        cache_key = (user_id, etag)
+        result = insights_cache.get(cache_key)
+        if result is None:
+            generation = insights_cache.generation(user_id)
+            result = insights.user_insights(cur, user_id)
+            insights_cache.set(cache_key, result, generation)
+
+        return conditional_response(result, etag, last_modified, False)
+
+    except PoolTimeout as e:
+        logger.warning(f"Get insights error: {e}")
+        return pool_unavailable_response()
+    except Exception as e:
+        logger.error(f"Get insights error: {e}")
+        return jsonify({'error': 'Failed to get insights'}), 500
+    finally:
+        if 'cur' in locals():
+            cur.close()
+        if conn:
+            conn.close()
+
 @app.route('/api/v1/entries/<int:entry_id>', methods=['DELETE'])
 @jwt_required()
 def delete_entry(entry_id):
     """Delete an entry"""
+    conn = None
     try:
         user_id = get_jwt_identity()
 
@@ -457,16 +1194,25 @@ def delete_entry(entry_id):
         cur.execute("""
             DELETE FROM entries
             WHERE id = %s AND user_id = %s
-            RETURNING id
+            RETURNING id, user_id, date, method, thc_mg, mood, energy, focus, creativity, anxiety,
+                      strain_id, activity_ids
         """, (entry_id, user_id))
 
         result = cur.fetchone()
         if result:
+            rollups.apply_entry(cur, *result[1:10], sign=-1)
+            strains.apply_entry(cur, result[1], result[10], *result[4:10], sign=-1)
+            activities.apply_entry(cur, result[1], result[11], *result[4:10], sign=-1)
+            bump_data_version(cur, user_id)
             conn.commit()
+            stats_cache.invalidate_user(user_id)
             return jsonify({'message': 'Entry deleted successfully'}), 200
         else:
             return jsonify({'error': 'Entry not found'}), 404
 
+    except PoolTimeout as e:
+        logger.warning(f"Delete entry error: {e}")
+        return pool_unavailable_response()
     except Exception as e:
         logger.error(f"Delete entry error: {e}")
         return jsonify({'error': 'Failed to delete entry'}), 500
@@ -476,6 +1222,141 @@ def delete_entry(entry_id):
         if conn:
             conn.close()
 
+@app.route('/api/v1/strains/autocomplete', methods=['GET'])
+@jwt_required()
+def autocomplete_strains():
+    """Suggest catalog strains for a typed prefix (?q=, ?limit=)"""
+    conn = None
+    try:
+        query = request.args.get('q', '')
+        try:
+            limit = int(request.args.get('limit', strains.AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        limit = max(1, min(limit, strains.MAX_AUTOCOMPLETE_LIMIT))
+        if not strains.normalize(query):
+            return jsonify({'strains': []}), 200
+
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'error': 'Database connection failed'}), 500
+
+        cur = conn.cursor()
+        return jsonify({'strains': strains.autocomplete(cur, query, limit)}), 200
+
+    except PoolTimeout as e:
+        logger.warning(f"Autocomplete strains error: {e}")
+        return pool_unavailable_response()
+    except Exception as e:
+        logger.error(f"Autocomplete strains error: {e}")
+        return jsonify({'error': 'Failed to search strains'}), 500
+    finally:
+        if 'cur' in locals():
+            cur.close()
+        if conn:
+            conn.close()
+
+@app.route('/api/v1/strains/stats', methods=['GET'])
+@jwt_required()
+def get_strain_stats():
+    """Get the user's per-strain aggregates
+
+    Query args: sort (sessions, thc_mg, mood, energy, focus, creativity or
+    anxiety; effect sorts rank by mean, lowest anxiety first) and limit.
+    """
+    conn = None
+    try:
+        user_id = get_jwt_identity()
+
+        sort = request.args.get('sort', 'sessions')
+        if sort not in strains.STRAIN_SORTS:
+            return jsonify({'error': f"sort must be one of: {', '.join(strains.STRAIN_SORTS)}"}), 400
+        try:
+            limit = int(request.args['limit']) if request.args.get('limit') else None
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        if limit is not None:
+            if limit < 1:
+                return jsonify({'error': 'limit must be at least 1'}), 400
+            limit = min(limit, strains.MAX_STATS_LIMIT)
+
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'error': 'Database connection failed'}), 500
+
+        cur = conn.cursor()
+
+        variant = f"strains:{sort}:{limit}"
+        etag, last_modified = data_validators(cur, user_id, variant)
+        if is_not_modified(etag, last_modified):
+            return conditional_response(None, etag, last_modified, True)
+
+        body = {'strains': strains.user_strain_stats(cur, user_id, sort, limit)}
+        return conditional_response(body, etag, last_modified, False)
+
+    except PoolTimeout as e:
+        logger.warning(f"Get strain stats error: {e}")
+        return pool_unavailable_response()
+    except Exception as e:
+        logger.error(f"Get strain stats error: {e}")
+        return jsonify({'error': 'Failed to get strain statistics'}), 500
+    finally:
+        if 'cur' in locals():
+            cur.close()
+        if conn:
+            conn.close()
+
+@app.route('/api/v1/activities/stats', methods=['GET'])
+@jwt_required()
+def get_activity_stats():
+    """Get the user's per-activity breakdown
+
+    Each activity has its session count, THC and mean effects, and the
+    activities it most often shares a session with. Query args: sort
+    (sessions, thc_mg, mood, energy, focus, creativity or anxiety) and limit.
+    """
+    conn = None
+    try:
+        user_id = get_jwt_identity()
+
+        sort = request.args.get('sort', 'sessions')
+        if sort not in activities.ACTIVITY_SORTS:
+            return jsonify({'error': f"sort must be one of: {', '.join(activities.ACTIVITY_SORTS)}"}), 400
+        try:
+            limit = int(request.args['limit']) if request.args.get('limit') else None
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        if limit is not None:
+            if limit < 1:
+                return jsonify({'error': 'limit must be at least 1'}), 400
+            limit = min(limit, activities.MAX_STATS_LIMIT)
+
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'error': 'Database connection failed'}), 500
+
+        cur = conn.cursor()
+
+        variant = f"activities:{sort}:{limit}"
+        etag, last_modified = data_validators(cur, user_id, variant)
+        if is_not_modified(etag, last_modified):
+            return conditional_response(None, etag, last_modified, True)
+
+        body = {'activities': activities.user_activity_stats(cur, user_id, sort, limit)}
+        return conditional_response(body, etag, last_modified, False)
+
+    except PoolTimeout as e:
+        logger.warning(f"Get activity stats error: {e}")
+        return pool_unavailable_response()
+    except Exception as e:
+        logger.error(f"Get activity stats error: {e}")
+        return jsonify({'error': 'Failed to get activity statistics'}), 500
+    finally:
+        if 'cur' in locals():
+            cur.close()
+        if conn:
+            conn.close()
+
 @app.route('/')
 def root():
     """Root endpoint"""
@@ -489,6 +1370,247 @@ def health_check():
     """Health check endpoint"""
     return jsonify({'status': 'healthy'})
 
+@app.route('/health/db')
+def db_pool_stats():
+    """Connection pool statistics for monitoring"""
+    return jsonify(db_pool.stats())
+
+def has_bearer_token(token):
+    """Whether the request's Authorization header carries `Bearer <token>`"""
+    return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics; requires a bearer token when METRICS_TOKEN is set"""
+    token = os.getenv('METRICS_TOKEN')
+    if token and not has_bearer_token(token):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(metrics_registry.render(), mimetype=None, content_type=metrics.CONTENT_TYPE)
+
+@app.route('/admin/queries', methods=['GET', 'DELETE'])
+def query_stats():
+    """Top SQL statements of this worker by total time; DELETE resets them
+
+    Only served when ADMIN_TOKEN is set, and then only with that bearer
+    token. Query args: sort (total, mean, max, calls or rows) and limit.
+    """
+    token = os.getenv('ADMIN_TOKEN')
+    if not token:
+        return jsonify({'error': 'Not found'}), 404
+    if not has_bearer_token(token):
+        return jsonify({'error': 'Unauthorized'}), 401
+    if request.method == 'DELETE':
+        query_tracer.stats.reset()
+        return '', 204
+
+    sort = request.args.get('sort', 'total')
+    if sort not in querytrace.SORTS:
+        return jsonify({'error': f"sort must be one of: {', '.join(querytrace.SORTS)}"}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', '20')), 200))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    return jsonify({
+        'pid': os.getpid(),
+        **query_tracer.stats.summary(),
+        'queries': query_tracer.top(limit, sort),
+    })
+
+@app.route('/health/cache')
+def stats_cache_stats():
+    """Stats cache counters for monitoring"""
+    return jsonify(stats_cache.stats())
+
+# Representative hot-path queries from the routes above, with placeholder
+# parameters filled in by db-explain. Keep in sync when route SQL changes.
+HOT_QUERIES = [
+    ('register: duplicate check',
+     "SELECT id FROM users WHERE username = %s OR email = %s",
+     lambda uid, ts: ('explain-user', 'explain@example.com')),
+    ('login: user lookup',
+     "SELECT id, username, email, password_hash FROM users WHERE username = %s",
+     lambda uid, ts: ('explain-user',)),
+    ('get_entries: first page',
+     """SELECT id, timestamp FROM entries WHERE user_id = %s
+        ORDER BY timestamp DESC, id DESC LIMIT %s""",
+     lambda uid, ts: (uid, DEFAULT_PAGE_SIZE + 1)),
+    ('get_entries: keyset page',
+     """SELECT id, timestamp FROM entries WHERE user_id = %s AND (timestamp, id) < (%s, %s)
+        ORDER BY timestamp DESC, id DESC LIMIT %s""",
+     lambda uid, ts: (uid, ts, 2 ** 31 - 1, DEFAULT_PAGE_SIZE + 1)),
+    ('get_stats: windowed rollups',
+     stats_windows_query(0, ('7d', '90d'), datetime.now().date())[0],
+     lambda uid, ts: stats_windows_query(uid, ('7d', '90d'), ts.date())[1]),
+    ('get_stats_series: rollup range',
+     """SELECT day, method, sessions FROM entry_rollups
+        WHERE user_id = %s AND day >= %s AND day <= %s""",
+     lambda uid, ts: (uid, (ts - timedelta(days=30)).date(), ts.date())),
+    ('get_insights: columnar load',
+     insights.LOAD_SQL,
+     lambda uid, ts: (uid,)),
+    ('get_strain_stats: per-user rollups',
+     """SELECT strain_id, sessions FROM strain_rollups
+        WHERE user_id = %s AND sessions > 0""",
+     lambda uid, ts: (uid,)),
+    ('autocomplete_strains: alias prefix',
+     """SELECT strain_id FROM strain_aliases
+        WHERE alias COLLATE "C" LIKE %s ORDER BY alias COLLATE "C" LIMIT %s""",
+     lambda uid, ts: ('blue%', strains.AUTOCOMPLETE_LIMIT * 3)),
+    ('search_entries: notes match',
+     """SELECT id FROM entries
+        WHERE user_id = %s AND notes_tsv @@ websearch_to_tsquery('english', %s)""",
+     lambda uid, ts: (uid, 'sleep')),
+    ('get_entries: activity filter',
+     """SELECT id, timestamp FROM entries WHERE user_id = %s AND activity_ids @> %s::integer[]
+        ORDER BY timestamp DESC, id DESC LIMIT %s""",
+     lambda uid, ts: (uid, [1], DEFAULT_PAGE_SIZE + 1)),
+    ('get_activity_stats: per-user rollups',
+     """SELECT activity_id, sessions FROM activity_rollups
+        WHERE user_id = %s AND sessions > 0""",
+     lambda uid, ts: (uid,)),
+    ('delete_entry: by id',
+     "DELETE FROM entries WHERE id = %s AND user_id = %s RETURNING id",
+     lambda uid, ts: (0, uid)),
+]
+
+@app.cli.command('db-upgrade')
+@click.option('--target', type=int, default=None, help='Stop after this migration version')
+def db_upgrade_command(target):
+    """Apply pending schema migrations (run once per deploy)"""
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException('Database connection failed')
+    try:
+        applied = migrations.upgrade(conn, target)
+        if applied:
+            click.echo(f"Applied migrations: {', '.join(str(v) for v in applied)}")
+        else:
+            click.echo("Schema is up to date")
+    finally:
+        conn.close()
+
+@app.cli.command('db-status')
+def db_status_command():
+    """Show the current schema version and pending migrations"""
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException('Database connection failed')
+    try:
+        click.echo(f"Current version: {migrations.current_version(conn)}")
+        for version, description, _ in migrations.pending_migrations(conn):
+            click.echo(f"Pending: {version} {description}")
+    finally:
+        conn.close()
+
+@app.cli.command('db-explain')
+@click.option('--user-id', type=int, default=1, help='User id to plug into the queries')
+@click.option('--analyze', is_flag=True, help='Run EXPLAIN ANALYZE (executes the queries; DML is rolled back)')
+@click.option('--force-index', is_flag=True, help='Disable seq scans to check that an index can serve each query')
+@click.option('--strict', is_flag=True, help='Exit non-zero if any hot query plans a seq scan')
+def db_explain_command(user_id, analyze, force_index, strict):
+    """Print EXPLAIN plans for the API's hot queries"""
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException('Database connection failed')
+    seq_scans = []
+    try:
+        now = datetime.now()
+        for name, sql, make_params in HOT_QUERIES:
+            plan = migrations.explain(conn, sql, make_params(user_id, now), analyze, force_index)
+            click.echo(f"== {name}")
+            for line in plan:
+                click.echo(f"   {line}")
+            if any('Seq Scan' in line for line in plan):
+                seq_scans.append(name)
+    finally:
+        conn.close()
+    if seq_scans:
+        click.echo(f"Sequential scans in: {', '.join(seq_scans)}")
+        if strict:
+            raise SystemExit(1)
+
+@app.cli.command('rebuild-rollups')
+@click.option('--user-id', type=int, default=None, help='Only rebuild rollups for this user')
+def rebuild_rollups_command(user_id):
+    """Recompute entry_rollups from the entries table"""
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException('Database connection failed')
+    try:
+        cur = conn.cursor()
+        rows = rollups.rebuild(cur, user_id)
+        bump_data_versions(cur, user_id)
+        conn.commit()
+        click.echo(f"Rebuilt {rows} rollup rows")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+@app.cli.command('rebuild-strains')
+@click.option('--user-id', type=int, default=None, help='Only relink entries of this user')
+def rebuild_strains_command(user_id):
+    """Link entries to the strain catalog and recompute strain_rollups"""
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException('Database connection failed')
+    try:
+        cur = conn.cursor()
+        rows = strains.rebuild(cur, user_id)
+        bump_data_versions(cur, user_id)
+        conn.commit()
+        click.echo(f"Rebuilt {rows} strain rollup rows")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+@app.cli.command('rebuild-activities')
+@click.option('--user-id', type=int, default=None, help='Only re-encode entries of this user')
+def rebuild_activities_command(user_id):
+    """Encode entry activities into catalog ids and recompute activity rollups"""
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException('Database connection failed')
+    try:
+        cur = conn.cursor()
+        rows = activities.rebuild(cur, user_id)
+        bump_data_versions(cur, user_id)
+        conn.commit()
+        click.echo(f"Rebuilt {rows} activity rollup rows")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+@app.cli.command('strain-alias')
+@click.argument('alias')
+@click.argument('canonical')
+def strain_alias_command(alias, canonical):
+    """Make ALIAS a spelling of CANONICAL, merging their entries and rollups"""
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException('Database connection failed')
+    try:
+        cur = conn.cursor()
+        target_id = strains.resolve(cur, canonical)
+        source_id = strains.resolve(cur, alias)
+        if target_id is None or source_id is None:
+            raise click.ClickException('Strain names must not be blank')
+        if source_id != target_id:
+            strains.merge(cur, source_id, target_id)
+        conn.commit()
+        click.echo(f"{alias!r} now resolves to {canonical!r}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+# Development server only; production runs gunicorn -c gunicorn.conf.py main:app
 if __name__ == '__main__':
     logger.info("Starting Cannabis Tracker API...")
     port = int(os.getenv('PORT', 8000))
@@ -0,0 +1,371 @@
+"""In-process metrics with Prometheus text exposition
+
+Counters, gauges and histograms keep their values in plain dicts keyed by
+label-value tuples, each behind its own lock, so recording a sample costs
+a dict lookup and an add. render() writes the Prometheus text format
+(version 0.0.4).
+
+Under gunicorn every worker has its own registry, and a scrape reaches
+just one of them. With a shared directory configured (share()), each
+worker writes a JSON snapshot of its values there every flush_interval
+seconds and when it exits, and render() merges the live registry with the
+other workers' snapshots: counters and histograms are summed, gauges only
+over workers still running. Snapshots of exited workers are folded into
+one archive file so their counts are kept without the directory growing.
+"""
+import fcntl
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Latency buckets (seconds) spanning cache hits to slow report queries
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_ARCHIVE = 'archive.json'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if len(labels) != len(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {labels!r}")
+        return tuple(str(value) for value in labels)
+
+    def snapshot(self):
+        with self._lock:
+            samples = [[list(key), self._copy(value)] for key, value in self._values.items()]
+        return {'type': self.kind, 'help': self.documentation, 'labels': list(self.labels), 'samples': samples}
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down"""
+    kind = 'gauge'
+
+    def inc(self, labels=(), amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+    def set(self, labels=(), value=0):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Distribution of observations over fixed buckets"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, labels, value):
+        """Record one observation; per-bucket counts are cumulated only on render"""
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            current = self._values.get(key)
+            if current is None:
+                current = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            current[0][index] += 1
+            current[1] += value
+
+    def time(self, labels=()):
+        """Context manager observing the duration of its block"""
+        return _Timer(self, labels)
+
+    @staticmethod
+    def _copy(value):
+        return [list(value[0]), value[1]]
+
+    def snapshot(self):
+        data = super().snapshot()
+        data['buckets'] = list(self.buckets)
+        return data
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(self.labels, time.perf_counter() - self.started)
+        return False
+
+
+def _merge(snapshots, include_gauges):
+    """Sum a list of {name: metric snapshot} into one"""
+    merged = {}
+    for snapshot in snapshots:
+        for name, data in snapshot.items():
+            if data['type'] == 'gauge' and not include_gauges:
+                continue
+            target = merged.setdefault(name, {**data, 'samples': {}})
+            for labels, value in data['samples']:
+                key = tuple(labels)
+                current = target['samples'].get(key)
+                if current is None:
+                    target['samples'][key] = Histogram._copy(value) if data['type'] == 'histogram' else value
+                elif data['type'] == 'histogram':
+                    if len(current[0]) == len(value[0]):
+                        current[0] = [a + b for a, b in zip(current[0], value[0])]
+                        current[1] += value[1]
+                else:
+                    target['samples'][key] = current + value
+    return {
+        name: {**data, 'samples': [[list(key), value] for key, value in data['samples'].items()]}
+        for name, data in merged.items()
+    }
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Registry:
+    """A named set of metrics, plus callbacks run before each snapshot"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self.directory = None
+        self.flush_interval = 5.0
+        self._last_flush = 0.0
+
+    def _add(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._add(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self._add(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, documentation, labels, buckets))
+
+    def on_collect(self, callback):
+        """Run callback() before every snapshot, e.g. to set gauges from live state"""
+        self._callbacks.append(callback)
+        return callback
+
+    def snapshot(self):
+        for callback in self._callbacks:
+            callback()
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def reset(self):
+        """Clear all values; workers call this after fork"""
+        for metric in self._metrics.values():
+            metric.reset()
+        self._last_flush = 0.0
+
+    # Sharing between processes
+
+    def share(self, directory, flush_interval=5.0):
+        """Exchange snapshots with other processes through directory"""
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.flush_interval = flush_interval
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f"worker-{pid}.json")
+
+    def flush(self):
+        """Write this process's snapshot to the shared directory"""
+        if self.directory is None:
+            return
+        self._last_flush = time.monotonic()
+        path = self._path(os.getpid())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def maybe_flush(self):
+        """flush() if flush_interval has passed since the last one; cheap otherwise"""
+        if self.directory is not None and time.monotonic() - self._last_flush >= self.flush_interval:
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def _load(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _collect_shared(self):
+        """Other live workers' snapshots, folding exited workers into the archive"""
+        live = []
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive_path = os.path.join(self.directory, _ARCHIVE)
+            archive = self._load(archive_path) or {}
+            exited = []
+            for name in os.listdir(self.directory):
+                if not (name.startswith('worker-') and name.endswith('.json')):
+                    continue
+                pid = int(name[len('worker-'):-len('.json')])
+                if pid == os.getpid():
+                    continue
+                snapshot = self._load(os.path.join(self.directory, name))
+                if snapshot is None:
+                    continue
+                if _pid_alive(pid):
+                    live.append(snapshot)
+                else:
+                    exited.append((name, snapshot))
+            if exited:
+                archive = _merge([archive] + [snapshot for _, snapshot in exited], include_gauges=False)
+                tmp_path = f"{archive_path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(archive, f, separators=(',', ':'))
+                os.replace(tmp_path, archive_path)
+                for name, _ in exited:
+                    os.remove(os.path.join(self.directory, name))
+        return live, archive
+
+    def render(self):
+        """All metrics in Prometheus text format, across workers when shared"""
+        current = self.snapshot()
+        if self.directory is None:
+            merged = current
+        else:
+            live, archive = self._collect_shared()
+            merged = _merge([current] + live, include_gauges=True)
+            counts = _merge([archive], include_gauges=False)
+            merged = _merge([merged, counts], include_gauges=True)
+
+        lines = []
+        for name in sorted(merged):
+            data = merged[name]
+            lines.append(f"# HELP {name} {data['help']}")
+            lines.append(f"# TYPE {name} {data['type']}")
+            labels = data['labels']
+            for values, value in sorted(data['samples'], key=lambda sample: sample[0]):
+                if data['type'] != 'histogram':
+                    lines.append(f"{name}{_format_labels(labels, values)} {_format_value(value)}")
+                    continue
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip(list(data['buckets']) + [float('inf')], counts):
+                    cumulative += count
+                    le = f'le="{_format_value(float(bound))}"'
+                    lines.append(f"{name}_bucket{_format_labels(labels, values, le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels, values)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels, values)} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
+
+class TimedCursor:
+    """DB-API cursor proxy observing execute() time into a histogram
+
+    Statements are labelled by their leading keyword (select, insert, ...)
+    so label cardinality stays fixed.
+    """
+
+    __slots__ = ('_cursor', '_histogram')
+
+    def __init__(self, cursor, histogram):
+        self._cursor = cursor
+        self._histogram = histogram
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @staticmethod
+    def operation(sql):
+        words = sql.lstrip(' \t\r\n(').split(None, 1)
+        word = words[0].lower() if words else ''
+        return word if word in ('select', 'insert', 'update', 'delete', 'copy', 'with') else 'other'
+
+    def execute(self, operation, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, *args, **kwargs)
+        finally:
+            self._histogram.observe((self.operation(operation),), time.perf_counter() - started)
+
+    def executemany(self, operation, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, *args, **kwargs)
+        finally:
+            self._histogram.observe((self.operation(operation),), time.perf_counter() - started)
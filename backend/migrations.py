@@ -0,0 +1,277 @@
+"""Versioned schema migrations for the Flask backend
+
+Migrations are applied in version order and recorded in schema_version.
+Run them once per deploy (flask --app main db-upgrade) rather than from
+every worker at import time.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for pg_advisory_lock so concurrent deploys don't race
+MIGRATION_LOCK_ID = 727_001
+
+# (version, description, statements). Never edit a released migration;
+# append a new one instead.
+MIGRATIONS = [
+    (1, "create users and entries", [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            username VARCHAR(50) UNIQUE NOT NULL,
+            email VARCHAR(100) UNIQUE NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS entries (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            thc_mg DECIMAL(10,2) NOT NULL,
+            timestamp TIMESTAMP NOT NULL,
+            date DATE NOT NULL,
+            time TIME NOT NULL,
+            method VARCHAR(20) NOT NULL,
+            amount VARCHAR(50),
+            puffs VARCHAR(50),
+            thc_percent DECIMAL(5,2),
+            strain VARCHAR(100),
+            mood INTEGER NOT NULL DEFAULT 5,
+            energy INTEGER NOT NULL DEFAULT 5,
+            focus INTEGER NOT NULL DEFAULT 5,
+            creativity INTEGER NOT NULL DEFAULT 5,
+            anxiety INTEGER NOT NULL DEFAULT 0,
+            activities TEXT[],
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+    (2, "create entry_rollups", [
+        """
+        CREATE TABLE IF NOT EXISTS entry_rollups (
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            day DATE NOT NULL,
+            method VARCHAR(20) NOT NULL,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            thc_mg_total DECIMAL(14,2) NOT NULL DEFAULT 0,
+            mood_sum INTEGER NOT NULL DEFAULT 0,
+            energy_sum INTEGER NOT NULL DEFAULT 0,
+            focus_sum INTEGER NOT NULL DEFAULT 0,
+            creativity_sum INTEGER NOT NULL DEFAULT 0,
+            anxiety_sum INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day, method)
+        )
+        """,
+    ]),
+    # users(username) and users(email) are already covered by the indexes
+    # behind their UNIQUE constraints; entries had no index besides its PK.
+    (3, "index entries for per-user timeline reads", [
+        """
+        CREATE INDEX IF NOT EXISTS idx_entries_user_timestamp
+        ON entries (user_id, timestamp DESC, id DESC)
+        """,
+    ]),
+    # Bumped in the same transaction as every entry write; backs ETags and
+    # Last-Modified on read endpoints without touching entries.
+    (4, "add per-user data version", [
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS data_version BIGINT NOT NULL DEFAULT 0",
+        """
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS data_updated_at TIMESTAMP
+            NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+        """,
+    ]),
+    # Catalog rows are filled in on entry writes; run `flask rebuild-strains`
+    # once after this migration to link existing entries.
+    (5, "add strain catalog and per-strain rollups", [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        """
+        CREATE TABLE IF NOT EXISTS strains (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            normalized VARCHAR(100) UNIQUE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS strain_aliases (
+            alias VARCHAR(100) PRIMARY KEY,
+            strain_id INTEGER NOT NULL REFERENCES strains(id) ON DELETE CASCADE
+        )
+        """,
+        # C collation so prefix LIKE and ordered scans can use the index
+        """
+        CREATE INDEX IF NOT EXISTS idx_strain_aliases_prefix
+        ON strain_aliases ((alias COLLATE "C"))
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_strain_aliases_trgm
+        ON strain_aliases USING gin (alias gin_trgm_ops)
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_strain_aliases_strain ON strain_aliases (strain_id)",
+        "ALTER TABLE entries ADD COLUMN IF NOT EXISTS strain_id INTEGER REFERENCES strains(id) ON DELETE SET NULL",
+        "CREATE INDEX IF NOT EXISTS idx_entries_strain ON entries (strain_id) WHERE strain_id IS NOT NULL",
+        """
+        CREATE TABLE IF NOT EXISTS strain_rollups (
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            strain_id INTEGER NOT NULL REFERENCES strains(id) ON DELETE CASCADE,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            thc_mg_total DECIMAL(14,2) NOT NULL DEFAULT 0,
+            mood_sum INTEGER NOT NULL DEFAULT 0,
+            energy_sum INTEGER NOT NULL DEFAULT 0,
+            focus_sum INTEGER NOT NULL DEFAULT 0,
+            creativity_sum INTEGER NOT NULL DEFAULT 0,
+            anxiety_sum INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, strain_id)
+        )
+        """,
+    ]),
+    # Generated, so every writer keeps it in sync; the config must match
+    # search.SEARCH_CONFIG. btree_gin lets one GIN index cover user_id too.
+    (6, "add full-text search over entry notes", [
+        "CREATE EXTENSION IF NOT EXISTS btree_gin",
+        """
+        ALTER TABLE entries ADD COLUMN IF NOT EXISTS notes_tsv tsvector
+            GENERATED ALWAYS AS (to_tsvector('english', coalesce(notes, ''))) STORED
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_entries_notes_search
+        ON entries USING gin (user_id, notes_tsv)
+        """,
+    ]),
+    # entries.activities stays as the display copy; run `flask
+    # rebuild-activities` once after this migration to encode existing rows.
+    (7, "add activity dictionary, activity index and rollups", [
+        """
+        CREATE TABLE IF NOT EXISTS activities (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            normalized VARCHAR(100) UNIQUE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "ALTER TABLE entries ADD COLUMN IF NOT EXISTS activity_ids INTEGER[] NOT NULL DEFAULT '{}'",
+        # btree_gin (migration 6) lets the user_id equality share the index
+        """
+        CREATE INDEX IF NOT EXISTS idx_entries_activities
+        ON entries USING gin (user_id, activity_ids)
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS activity_rollups (
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            activity_id INTEGER NOT NULL REFERENCES activities(id) ON DELETE CASCADE,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            thc_mg_total DECIMAL(14,2) NOT NULL DEFAULT 0,
+            mood_sum INTEGER NOT NULL DEFAULT 0,
+            energy_sum INTEGER NOT NULL DEFAULT 0,
+            focus_sum INTEGER NOT NULL DEFAULT 0,
+            creativity_sum INTEGER NOT NULL DEFAULT 0,
+            anxiety_sum INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, activity_id)
+        )
+        """,
+        # One row per unordered pair, stored with activity_id < other_id
+        """
+        CREATE TABLE IF NOT EXISTS activity_pairs (
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            activity_id INTEGER NOT NULL REFERENCES activities(id) ON DELETE CASCADE,
+            other_id INTEGER NOT NULL REFERENCES activities(id) ON DELETE CASCADE,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, activity_id, other_id),
+            CHECK (activity_id < other_id)
+        )
+        """,
+    ]),
+]
+
+
+def _ensure_version_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description VARCHAR(200) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def current_version(conn):
+    """Highest applied migration version, or 0 for an unmanaged database"""
+    cur = conn.cursor()
+    try:
+        _ensure_version_table(cur)
+        cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        version = cur.fetchone()[0]
+        conn.commit()
+        return version
+    finally:
+        cur.close()
+
+
+def pending_migrations(conn):
+    """Migrations newer than the database's current version"""
+    version = current_version(conn)
+    return [m for m in MIGRATIONS if m[0] > version]
+
+
+def upgrade(conn, target=None):
+    """Apply pending migrations up to target (default: latest)
+
+    Each migration runs in its own transaction together with its
+    schema_version row. Returns the list of versions applied.
+    """
+    applied = []
+    cur = conn.cursor()
+    try:
+        _ensure_version_table(cur)
+        conn.commit()
+        cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        try:
+            cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+            version = cur.fetchone()[0]
+            conn.commit()
+            for number, description, statements in MIGRATIONS:
+                if number <= version or (target is not None and number > target):
+                    continue
+                try:
+                    for statement in statements:
+                        cur.execute(statement)
+                    cur.execute(
+                        "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                        (number, description)
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    logger.error(f"Migration {number} ({description}) failed")
+                    raise
+                logger.info(f"Applied migration {number}: {description}")
+                applied.append(number)
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+            conn.commit()
+    finally:
+        cur.close()
+    return applied
+
+
+def explain(conn, sql, params=(), analyze=False, force_index=False):
+    """Return the EXPLAIN plan lines for a query
+
+    force_index disables sequential scans for this transaction so the plan
+    shows whether an index *can* serve the query even on tiny tables where
+    the planner would rightly prefer a seq scan.
+    """
+    cur = conn.cursor()
+    try:
+        if force_index:
+            cur.execute("SET LOCAL enable_seqscan = off")
+        options = "ANALYZE, BUFFERS" if analyze else "COSTS"
+        cur.execute(f"EXPLAIN ({options}) {sql}", params)
+        return [row[0] for row in cur.fetchall()]
+    finally:
+        conn.rollback()
+        cur.close()
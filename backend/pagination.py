@@ -0,0 +1,74 @@
+import base64
+import json
+from datetime import datetime
+
+# Page size limits for keyset-paginated entry listings
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+NEXT = 'next'
+PREV = 'prev'
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client-supplied cursor cannot be decoded"""
+
+
+def encode_cursor(timestamp, entry_id, direction=NEXT):
+    """Encode a (timestamp, id) position as an opaque URL-safe token"""
+    payload = json.dumps(
+        {'t': timestamp.isoformat(), 'i': int(entry_id), 'd': direction},
+        separators=(',', ':')
+    )
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor token into (timestamp, id, direction)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        timestamp = datetime.fromisoformat(payload['t'])
+        entry_id = int(payload['i'])
+        direction = payload.get('d', NEXT)
+    except (ValueError, KeyError, TypeError, UnicodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
+    if direction not in (NEXT, PREV):
+        raise InvalidCursor(f"Invalid cursor direction: {direction}")
+    return timestamp, entry_id, direction
+
+
+def clamp_page_size(limit):
+    """Coerce a requested page size into [1, MAX_PAGE_SIZE]"""
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise InvalidCursor(f"Invalid page size: {limit!r}")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def page_cursors(rows, limit, direction, has_cursor, key):
+    """Trim an over-fetched page and compute its (rows, next_cursor, prev_cursor)
+
+    rows are fetched with LIMIT limit + 1 in the scan direction; for PREV
+    pages they arrive oldest-first and are flipped back to newest-first here.
+    key(row) returns the row's (timestamp, id).
+    """
+    has_more = len(rows) > limit
+    rows = list(rows[:limit])
+    if direction == PREV:
+        rows.reverse()
+
+    if not rows:
+        return rows, None, None
+
+    if direction == PREV:
+        has_older, has_newer = True, has_more
+    else:
+        has_older, has_newer = has_more, has_cursor
+
+    next_cursor = encode_cursor(*key(rows[-1]), NEXT) if has_older else None
+    prev_cursor = encode_cursor(*key(rows[0]), PREV) if has_newer else None
+    return rows, next_cursor, prev_cursor
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import bcrypt
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing queue is full; callers should answer 503"""
+
+
+class PasswordHasher:
+    """bcrypt hashing on a dedicated, bounded worker pool
+
+    At most `workers` hashes run at once (bcrypt releases the GIL, so they
+    do not stall other request threads), and at most `max_queue` more may
+    wait. Beyond that, calls fail fast with HasherBusy instead of piling up.
+    """
+
+    def __init__(self, rounds=12, workers=2, max_queue=16, timeout=10.0, observer=None):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        # Called as observer(operation, seconds) with the bcrypt time alone
+        self.observer = observer
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Executors don't survive fork(); build one lazily per process
+        pid = os.getpid()
+        if self._executor_pid != pid:
+            with self._lock:
+                if self._executor_pid != pid:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix='bcrypt'
+                    )
+                    self._executor_pid = pid
+        return self._executor
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy("Password hashing queue is full")
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _observe(self, operation, started):
+        if self.observer is not None:
+            self.observer(operation, time.perf_counter() - started)
+
+    def _hash(self, password):
+        started = time.perf_counter()
+        try:
+            return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds)).decode('utf-8')
+        finally:
+            self._observe('hash', started)
+
+    def _verify(self, password, hashed):
+        started = time.perf_counter()
+        try:
+            return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        except ValueError:
+            return False
+        finally:
+            self._observe('verify', started)
+
+    def _run(self, fn, *args):
+        try:
+            return self._submit(fn, *args).result(self.timeout)
+        except FutureTimeout:
+            raise HasherBusy(f"Password hashing did not finish within {self.timeout:.0f}s")
+
+    def hash(self, password):
+        """Hash a password with the configured cost factor"""
+        return self._run(self._hash, password)
+
+    def verify(self, password, hashed):
+        """Check a password against a stored bcrypt hash"""
+        return self._run(self._verify, password, hashed)
+
+    async def _run_async(self, fn, *args):
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(self._submit(fn, *args)), self.timeout)
+        except asyncio.TimeoutError:
+            raise HasherBusy(f"Password hashing did not finish within {self.timeout:.0f}s")
+
+    async def hash_async(self, password):
+        """hash() for event-loop callers; awaits the worker instead of blocking"""
+        return await self._run_async(self._hash, password)
+
+    async def verify_async(self, password, hashed):
+        """verify() for event-loop callers; awaits the worker instead of blocking"""
+        return await self._run_async(self._verify, password, hashed)
+
+    def needs_rehash(self, hashed):
+        """Whether a stored hash was made with a different cost factor"""
+        try:
+            return int(hashed.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+
+def hasher_from_env(observer=None):
+    """Build a PasswordHasher from BCRYPT_ROUNDS / PASSWORD_HASH_* settings"""
+    return PasswordHasher(
+        rounds=int(os.getenv('BCRYPT_ROUNDS', '12')),
+        workers=int(os.getenv('PASSWORD_HASH_WORKERS', '2')),
+        max_queue=int(os.getenv('PASSWORD_HASH_QUEUE', '16')),
+        timeout=float(os.getenv('PASSWORD_HASH_TIMEOUT', '10')),
+        observer=observer,
+    )
@@ -0,0 +1,340 @@
+"""Per-statement query tracing and slow-query log
+
+Every statement run through a traced pg8000 cursor (Tracer.cursor, used
+as the pool's cursor wrapper) or a traced SQLAlchemy engine
+(Tracer.instrument_engine) is reduced to a fingerprint: literals and bind
+placeholders become ?, IN lists and multi-row VALUES collapse, whitespace
+is squeezed. Calls, time and rows are aggregated per fingerprint for
+Tracer.top(), along with the routes issuing them (set through
+current_route by the web layer).
+
+Statements slower than slow_threshold are logged with their parameters
+redacted to types and lengths. With explain on, a slow SELECT is re-run
+once under EXPLAIN (ANALYZE, BUFFERS) inside a savepoint and its plan
+logged too; each fingerprint is explained at most once per
+explain_interval since that doubles the cost of an already slow query.
+
+Aggregates are per process; under gunicorn each worker reports its own.
+"""
+import contextvars
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Route (or a zero-argument callable returning it) charged for queries run
+# in the current request; None outside requests
+current_route = contextvars.ContextVar('query_route', default=None)
+
+# Route recorded for queries run outside a request (CLI commands, startup)
+NO_ROUTE = '<none>'
+
+SORTS = ('total', 'mean', 'max', 'calls', 'rows')
+
+# Statements beyond max_statements are pooled under this fingerprint
+OTHER = '<other statements>'
+# Distinct routes remembered per statement
+MAX_ROUTES = 10
+# Redacted parameters shown per slow-query log line
+MAX_LOGGED_PARAMS = 20
+
+_COMMENT = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_STRING = re.compile(r"(?:\b[eEbBxX])?'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s|\$\d+')
+_NUMBER = re.compile(r'(?<![\w$.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?(?![\w.])')
+_SPACE = re.compile(r'\s+')
+_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_REPEATED = re.compile(r'(\((?:\?|\?, \.\.\.)\))(?:\s*,\s*\1)+')
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """(query_id, normalized text) for a statement; query_id is a short stable hash"""
+    text = _COMMENT.sub(' ', sql)
+    text = _STRING.sub('?', text)
+    text = _PLACEHOLDER.sub('?', text)
+    text = _NUMBER.sub('?', text)
+    text = _SPACE.sub(' ', text).strip().rstrip(';').strip()
+    text = _LIST.sub('(?, ...)', text)
+    text = _REPEATED.sub(r'\1, ...', text)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:12], text
+
+
+def operation(sql):
+    """Leading keyword of a statement, lowercased"""
+    words = sql.lstrip(' \t\r\n(').split(None, 1)
+    return words[0].lower() if words else ''
+
+
+def _redact_value(value):
+    if value is None or isinstance(value, bool):
+        return repr(value)
+    if isinstance(value, (str, bytes, bytearray, memoryview)):
+        return f"<{type(value).__name__}:{len(value)}>"
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return f"<{type(value).__name__}:{len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def redact(params):
+    """Parameters with every value replaced by its type (and length for strings and arrays)"""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: _redact_value(value) for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        redacted = [_redact_value(value) for value in params[:MAX_LOGGED_PARAMS]]
+        if len(params) > MAX_LOGGED_PARAMS:
+            redacted.append(f"... {len(params) - MAX_LOGGED_PARAMS} more")
+        return redacted
+    return _redact_value(params)
+
+
+def explain_analyze(cursor, sql, args=(), kwargs=None):
+    """EXPLAIN (ANALYZE, BUFFERS) plan lines for sql, run in a savepoint on cursor
+
+    The savepoint keeps a failing EXPLAIN from aborting the caller's
+    transaction. Returns None when the plan can't be taken.
+    """
+    try:
+        cursor.execute('SAVEPOINT query_trace_explain')
+        try:
+            cursor.execute('EXPLAIN (ANALYZE, BUFFERS) ' + sql, *args, **(kwargs or {}))
+            plan = [row[0] for row in cursor.fetchall()]
+        except Exception:
+            cursor.execute('ROLLBACK TO SAVEPOINT query_trace_explain')
+            raise
+        cursor.execute('RELEASE SAVEPOINT query_trace_explain')
+        return plan
+    except Exception as e:
+        logger.debug(f"EXPLAIN failed: {e}")
+        return None
+
+
+class _Statement:
+    __slots__ = ('fingerprint', 'calls', 'total', 'max', 'rows', 'routes')
+
+    def __init__(self, text):
+        self.fingerprint = text
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.routes = {}
+
+
+class QueryStats:
+    """Thread-safe per-fingerprint totals, bounded to max_statements entries"""
+
+    def __init__(self, max_statements=500):
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self._statements = {}
+        self.since = time.time()
+
+    def add(self, query_id, text, seconds, rows, route):
+        with self._lock:
+            statement = self._statements.get(query_id)
+            if statement is None:
+                if len(self._statements) >= self.max_statements:
+                    query_id, text = 'other', OTHER
+                    statement = self._statements.get(query_id)
+                if statement is None:
+                    statement = self._statements[query_id] = _Statement(text)
+            statement.calls += 1
+            statement.total += seconds
+            if seconds > statement.max:
+                statement.max = seconds
+            if rows is not None and rows > 0:
+                statement.rows += rows
+            routes = statement.routes
+            if route in routes or len(routes) < MAX_ROUTES:
+                routes[route] = routes.get(route, 0) + 1
+
+    def top(self, limit=20, sort='total'):
+        """The `limit` statements with the highest `sort` (one of SORTS)"""
+        if sort not in SORTS:
+            raise ValueError(f"sort must be one of {', '.join(SORTS)}")
+        with self._lock:
+            rows = [
+                {
+                    'query_id': query_id,
+                    'fingerprint': s.fingerprint,
+                    'calls': s.calls,
+                    'total_ms': round(s.total * 1000, 3),
+                    'mean_ms': round(s.total / s.calls * 1000, 3),
+                    'max_ms': round(s.max * 1000, 3),
+                    'rows': s.rows,
+                    'routes': dict(sorted(s.routes.items(), key=lambda item: -item[1])),
+                }
+                for query_id, s in self._statements.items()
+            ]
+        key = {'total': 'total_ms', 'mean': 'mean_ms', 'max': 'max_ms'}.get(sort, sort)
+        rows.sort(key=lambda row: row[key], reverse=True)
+        return rows[:limit]
+
+    def summary(self):
+        with self._lock:
+            return {
+                'statements': len(self._statements),
+                'calls': sum(s.calls for s in self._statements.values()),
+                'total_ms': round(sum(s.total for s in self._statements.values()) * 1000, 3),
+                'since': self.since,
+            }
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self.since = time.time()
+
+
+class Tracer:
+    """Records statement timings and logs the slow ones
+
+    slow_threshold is in seconds; None disables the slow-query log.
+    """
+
+    def __init__(self, slow_threshold=0.2, explain=False, explain_interval=300.0, max_statements=500):
+        self.slow_threshold = slow_threshold
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self.stats = QueryStats(max_statements)
+        self._explained = {}
+        self._explain_lock = threading.Lock()
+
+    @staticmethod
+    def route():
+        route = current_route.get()
+        if callable(route):
+            route = route()
+        return route if route is not None else NO_ROUTE
+
+    def _should_explain(self, sql, query_id):
+        if not self.explain or operation(sql) != 'select':
+            return False
+        now = time.monotonic()
+        with self._explain_lock:
+            last = self._explained.get(query_id)
+            if last is not None and now - last < self.explain_interval:
+                return False
+            self._explained[query_id] = now
+            return True
+
+    def record(self, sql, params, seconds, rows, explain=None):
+        """Account one execution; explain() -> plan lines is called only for slow SELECTs"""
+        query_id, text = fingerprint(sql)
+        route = self.route()
+        self.stats.add(query_id, text, seconds, rows, route)
+        if self.slow_threshold is None or seconds < self.slow_threshold:
+            return
+        plan = explain() if explain is not None and self._should_explain(sql, query_id) else None
+        message = (f"Slow query {seconds * 1000:.1f} ms rows={rows} route={route} "
+                   f"[{query_id}] {text} params={redact(params)}")
+        if plan:
+            message += '\n' + '\n'.join(plan)
+        logger.warning(message, extra={
+            'query_id': query_id,
+            'duration_ms': round(seconds * 1000, 3),
+            'rows': rows,
+            'route': route,
+        })
+
+    def top(self, limit=20, sort='total'):
+        return self.stats.top(limit, sort)
+
+    def cursor(self, cursor, conn=None):
+        """Wrap a DB-API cursor; conn, when given, supplies the EXPLAIN cursor"""
+        return TracingCursor(cursor, self, conn)
+
+    def instrument_engine(self, engine):
+        """Trace every statement an SQLAlchemy engine (or AsyncEngine) runs"""
+        from sqlalchemy import event
+
+        engine = getattr(engine, 'sync_engine', engine)
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('query_trace_started', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info['query_trace_started'].pop()
+            seconds = time.perf_counter() - started
+            explain = None
+            if not executemany:
+                def explain():
+                    raw = conn.connection.dbapi_connection.cursor()
+                    try:
+                        return explain_analyze(raw, statement, (parameters,))
+                    finally:
+                        raw.close()
+            rows = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+            self.record(statement, parameters, seconds, rows, explain)
+
+        @event.listens_for(engine, 'handle_error')
+        def handle_error(context):
+            started = context.connection.info.get('query_trace_started') if context.connection else None
+            if started:
+                started.pop()
+
+
+class TracingCursor:
+    """DB-API cursor proxy feeding every execute() to a Tracer"""
+
+    __slots__ = ('_cursor', '_tracer', '_conn')
+
+    def __init__(self, cursor, tracer, conn=None):
+        self._cursor = cursor
+        self._tracer = tracer
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def _explainer(self, operation, args, kwargs):
+        if self._conn is None or kwargs.get('stream') is not None:
+            return None
+
+        def explain():
+            cursor = self._conn.cursor()
+            try:
+                return explain_analyze(cursor, operation, args, kwargs)
+            finally:
+                cursor.close()
+        return explain
+
+    def _rows(self):
+        rowcount = getattr(self._cursor, 'rowcount', -1)
+        return rowcount if rowcount is not None and rowcount >= 0 else None
+
+    def execute(self, operation, *args, **kwargs):
+        started = time.perf_counter()
+        result = self._cursor.execute(operation, *args, **kwargs)
+        self._tracer.record(operation, args[0] if args else None, time.perf_counter() - started,
+                            self._rows(), self._explainer(operation, args, kwargs))
+        return result
+
+    def executemany(self, operation, *args, **kwargs):
+        started = time.perf_counter()
+        result = self._cursor.executemany(operation, *args, **kwargs)
+        self._tracer.record(operation, None, time.perf_counter() - started, self._rows())
+        return result
+
+
+def tracer_from_env():
+    """Build a Tracer from QUERY_SLOW_MS / QUERY_EXPLAIN* / QUERY_STATS_SIZE settings"""
+    slow_ms = float(os.getenv('QUERY_SLOW_MS', '200'))
+    return Tracer(
+        slow_threshold=slow_ms / 1000 if slow_ms >= 0 else None,
+        explain=os.getenv('QUERY_EXPLAIN', '0').lower() in ('1', 'true', 'yes'),
+        explain_interval=float(os.getenv('QUERY_EXPLAIN_INTERVAL', '300')),
+        max_statements=int(os.getenv('QUERY_STATS_SIZE', '500')),
+    )
@@ -0,0 +1,107 @@
+"""Per-user, per-day, per-method rollups of entries
+
+Each row of entry_rollups holds the session count, THC total and effect-score
+sums for one (user_id, day, method). Rows are adjusted in the same
+transaction as the entry write that changes them, so window statistics can
+be read from a few rollup rows instead of scanning entries. The table itself
+is created by migration 2 in migrations.py.
+"""
+
+_UPSERT_SQL = """
+    INSERT INTO entry_rollups (
+        user_id, day, method, sessions, thc_mg_total,
+        mood_sum, energy_sum, focus_sum, creativity_sum, anxiety_sum
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (user_id, day, method) DO UPDATE SET
+        sessions = entry_rollups.sessions + EXCLUDED.sessions,
+        thc_mg_total = entry_rollups.thc_mg_total + EXCLUDED.thc_mg_total,
+        mood_sum = entry_rollups.mood_sum + EXCLUDED.mood_sum,
+        energy_sum = entry_rollups.energy_sum + EXCLUDED.energy_sum,
+        focus_sum = entry_rollups.focus_sum + EXCLUDED.focus_sum,
+        creativity_sum = entry_rollups.creativity_sum + EXCLUDED.creativity_sum,
+        anxiety_sum = entry_rollups.anxiety_sum + EXCLUDED.anxiety_sum
+"""
+
+_BATCH_CHUNK = 1000
+
+_PRUNE_SQL = """
+    DELETE FROM entry_rollups
+    WHERE user_id = %s AND day = %s AND method = %s AND sessions <= 0
+"""
+
+_REBUILD_SELECT = """
+    SELECT user_id, date, method, COUNT(*), COALESCE(SUM(thc_mg), 0),
+           SUM(mood), SUM(energy), SUM(focus), SUM(creativity), SUM(anxiety)
+    FROM entries
+"""
+
+
+def apply_entry(cur, user_id, day, method, thc_mg, mood, energy, focus, creativity, anxiety, sign=1):
+    """Add (sign=1) or remove (sign=-1) one entry's contribution to its rollup row
+
+    Must run on the same connection and transaction as the entry write.
+    """
+    cur.execute(_UPSERT_SQL, (
+        user_id, day, method, sign, sign * thc_mg,
+        sign * mood, sign * energy, sign * focus, sign * creativity, sign * anxiety
+    ))
+    if sign < 0:
+        cur.execute(_PRUNE_SQL, (user_id, day, method))
+
+
+def apply_batch(cur, user_id, rows):
+    """Add many new entries to their rollup rows with one multi-row upsert
+
+    rows are (day, method, thc_mg, mood, energy, focus, creativity, anxiety)
+    tuples; they are summed per (day, method) first since one upsert cannot
+    touch the same rollup row twice.
+    """
+    totals = {}
+    for day, method, *measures in rows:
+        current = totals.setdefault((day, method), [0, 0, 0, 0, 0, 0, 0])
+        current[0] += 1
+        for i, value in enumerate(measures, start=1):
+            current[i] += value
+
+    # Chunked to stay well under the protocol's 32767 bind-parameter limit
+    items = list(totals.items())
+    for start in range(0, len(items), _BATCH_CHUNK):
+        chunk = items[start:start + _BATCH_CHUNK]
+        values_sql = ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'] * len(chunk))
+        params = []
+        for (day, method), sums in chunk:
+            params.extend((user_id, day, method, *sums))
+        upsert_sql = _UPSERT_SQL.replace(
+            'VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)', f'VALUES {values_sql}'
+        )
+        cur.execute(upsert_sql, tuple(params))
+
+
+def rebuild(cur, user_id=None):
+    """Recompute rollups from entries for one user, or for everyone
+
+    Returns the number of rollup rows written. The caller commits.
+    """
+    if user_id is None:
+        cur.execute("DELETE FROM entry_rollups")
+        cur.execute(f"""
+            INSERT INTO entry_rollups (
+                user_id, day, method, sessions, thc_mg_total,
+                mood_sum, energy_sum, focus_sum, creativity_sum, anxiety_sum
+            )
+            {_REBUILD_SELECT}
+            WHERE user_id IS NOT NULL
+            GROUP BY user_id, date, method
+        """)
+    else:
+        cur.execute("DELETE FROM entry_rollups WHERE user_id = %s", (user_id,))
+        cur.execute(f"""
+            INSERT INTO entry_rollups (
+                user_id, day, method, sessions, thc_mg_total,
+                mood_sum, energy_sum, focus_sum, creativity_sum, anxiety_sum
+            )
+            {_REBUILD_SELECT}
+            WHERE user_id = %s
+            GROUP BY user_id, date, method
+        """, (user_id,))
+    return cur.rowcount
@@ -0,0 +1,66 @@
+"""Ranked full-text search over entry notes
+
+entries.notes_tsv is a stored generated tsvector of notes (migration 6),
+so Postgres keeps it current on every insert and update from any writer.
+The (user_id, notes_tsv) GIN index answers the per-user match; date and
+method filters then apply to that small candidate set. Highlight snippets
+are only built for the returned page, since ts_headline re-parses the
+original text.
+"""
+import html
+
+SEARCH_CONFIG = 'english'
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_QUERY_LENGTH = 200
+
+# Highlight boundaries in the ts_headline output; html.escape leaves control
+# characters alone, so any already in the notes are stripped from the text
+# passed to ts_headline and only the markers it inserts become <mark> tags
+_START, _STOP = '\x01', '\x02'
+HEADLINE_OPTIONS = f"StartSel={_START}, StopSel={_STOP}, MaxFragments=2, MaxWords=20, MinWords=6, FragmentDelimiter=\" … \""
+
+
+def snippet_html(headline):
+    """Escape a ts_headline result and turn its markers into <mark> tags"""
+    if headline is None:
+        return None
+    return html.escape(headline).replace(_START, '<mark>').replace(_STOP, '</mark>')
+
+
+def search_entries(cur, user_id, query, columns, start=None, end=None, methods=None, limit=DEFAULT_SEARCH_LIMIT, offset=0):
+    """Rows of `columns` plus (rank, headline) for the user's matching entries
+
+    query uses websearch syntax ("quoted phrases", or, -exclusions). Fetches
+    limit + 1 rows so callers can tell whether another page exists.
+    """
+    filters = []
+    params = [query, user_id]
+    if start is not None:
+        filters.append("AND e.date >= %s")
+        params.append(start)
+    if end is not None:
+        filters.append("AND e.date <= %s")
+        params.append(end)
+    if methods:
+        filters.append("AND e.method = ANY(%s)")
+        params.append(list(methods))
+    params.extend([limit + 1, offset])
+
+    qualified = ', '.join(f"e.{column.strip()}" for column in columns.split(','))
+    cur.execute(f"""
+        WITH q AS (SELECT websearch_to_tsquery('{SEARCH_CONFIG}', %s) AS query),
+        hits AS (
+            SELECT e.id, ts_rank_cd(e.notes_tsv, q.query) AS rank
+            FROM entries e, q
+            WHERE e.user_id = %s AND e.notes_tsv @@ q.query
+            {' '.join(filters)}
+            ORDER BY rank DESC, e.timestamp DESC, e.id DESC
+            LIMIT %s OFFSET %s
+        )
+        SELECT {qualified}, hits.rank,
+               ts_headline('{SEARCH_CONFIG}', translate(coalesce(e.notes, ''), %s, ''), q.query, %s)
+        FROM hits JOIN entries e ON e.id = hits.id, q
+        ORDER BY hits.rank DESC, e.timestamp DESC, e.id DESC
+    """, tuple(params) + (_START + _STOP, HEADLINE_OPTIONS))
+    return cur.fetchall()
@@ -0,0 +1,283 @@
+"""Normalised strain catalog and per-user, per-strain rollups
+
+Entries keep the strain text the user typed, plus a strain_id into the
+catalog. A strain is identified by its normalised name (case, spacing and
+punctuation folded); strain_aliases maps every known normalised spelling,
+including the strain's own, to its id, so merging two strains is an alias
+update. strain_rollups holds sessions, THC total and effect-score sums per
+(user_id, strain_id), adjusted in the same transaction as each entry write.
+The tables are created by migration 5 in migrations.py.
+"""
+import re
+
+AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 50
+MAX_STATS_LIMIT = 500
+
+# Below this pg_trgm similarity, fuzzy matches are mostly noise
+FUZZY_THRESHOLD = 0.3
+
+STRAIN_SORTS = {
+    'sessions': 'r.sessions DESC',
+    'thc_mg': 'r.thc_mg_total DESC',
+    'mood': 'r.mood_sum::numeric / r.sessions DESC',
+    'energy': 'r.energy_sum::numeric / r.sessions DESC',
+    'focus': 'r.focus_sum::numeric / r.sessions DESC',
+    'creativity': 'r.creativity_sum::numeric / r.sessions DESC',
+    'anxiety': 'r.anxiety_sum::numeric / r.sessions ASC',
+}
+
+_SEPARATORS = re.compile(r"[\s\-_/]+")
+_NOISE = re.compile(r"[^\w#+ ]")
+
+_ROLLUP_COLUMNS = """
+    INSERT INTO strain_rollups (
+        user_id, strain_id, sessions, thc_mg_total,
+        mood_sum, energy_sum, focus_sum, creativity_sum, anxiety_sum
+    )
+"""
+
+_ADD_ON_CONFLICT = """
+    ON CONFLICT (user_id, strain_id) DO UPDATE SET
+        sessions = strain_rollups.sessions + EXCLUDED.sessions,
+        thc_mg_total = strain_rollups.thc_mg_total + EXCLUDED.thc_mg_total,
+        mood_sum = strain_rollups.mood_sum + EXCLUDED.mood_sum,
+        energy_sum = strain_rollups.energy_sum + EXCLUDED.energy_sum,
+        focus_sum = strain_rollups.focus_sum + EXCLUDED.focus_sum,
+        creativity_sum = strain_rollups.creativity_sum + EXCLUDED.creativity_sum,
+        anxiety_sum = strain_rollups.anxiety_sum + EXCLUDED.anxiety_sum
+"""
+
+_UPSERT_SQL = _ROLLUP_COLUMNS + "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)" + _ADD_ON_CONFLICT
+
+_BATCH_CHUNK = 1000
+
+_PRUNE_SQL = """
+    DELETE FROM strain_rollups
+    WHERE user_id = %s AND strain_id = %s AND sessions <= 0
+"""
+
+
+def normalize(name):
+    """Catalog key for a strain name: 'Blue-Dream ' and 'blue  dream' match
+
+    Case is folded, dashes, underscores and slashes become spaces, and other
+    punctuation is dropped ('O.G. Kush' -> 'og kush').
+    """
+    if not name:
+        return None
+    key = _SEPARATORS.sub(' ', name.casefold())
+    key = _NOISE.sub('', key).strip()
+    return ' '.join(key.split())[:100] or None
+
+
+def display_name(name):
+    """Tidied spelling stored the first time a strain is seen"""
+    return ' '.join(name.split())[:100]
+
+
+def resolve(cur, name):
+    """Catalog id for a strain name, adding it on first sight; None if blank"""
+    key = normalize(name)
+    if key is None:
+        return None
+    return resolve_many(cur, [name])[key]
+
+
+def resolve_many(cur, names):
+    """Resolve many strain names at once; returns {normalized: strain_id}"""
+    spellings = {}
+    for name in names:
+        key = normalize(name)
+        if key is not None:
+            spellings.setdefault(key, display_name(name))
+    if not spellings:
+        return {}
+
+    keys = list(spellings)
+    cur.execute(
+        "SELECT alias, strain_id FROM strain_aliases WHERE alias = ANY(%s)", (keys,)
+    )
+    ids = dict(cur.fetchall())
+    missing = [key for key in keys if key not in ids]
+    if missing:
+        # A no-op DO UPDATE makes RETURNING yield ids for rows that already exist
+        values_sql = ', '.join(['(%s, %s)'] * len(missing))
+        params = [value for key in missing for value in (spellings[key], key)]
+        cur.execute(f"""
+            INSERT INTO strains (name, normalized) VALUES {values_sql}
+            ON CONFLICT (normalized) DO UPDATE SET normalized = EXCLUDED.normalized
+            RETURNING normalized, id
+        """, tuple(params))
+        created = dict(cur.fetchall())
+        values_sql = ', '.join(['(%s, %s)'] * len(missing))
+        cur.execute(f"""
+            INSERT INTO strain_aliases (alias, strain_id) VALUES {values_sql}
+            ON CONFLICT (alias) DO NOTHING
+        """, tuple(value for key in missing for value in (key, created[key])))
+        ids.update(created)
+    return ids
+
+
+def apply_entry(cur, user_id, strain_id, thc_mg, mood, energy, focus, creativity, anxiety, sign=1):
+    """Add (sign=1) or remove (sign=-1) one entry's contribution to its strain rollup"""
+    if strain_id is None:
+        return
+    cur.execute(_UPSERT_SQL, (
+        user_id, strain_id, sign, sign * thc_mg,
+        sign * mood, sign * energy, sign * focus, sign * creativity, sign * anxiety
+    ))
+    if sign < 0:
+        cur.execute(_PRUNE_SQL, (user_id, strain_id))
+
+
+def apply_batch(cur, user_id, rows):
+    """Add many new entries to their strain rollups with one multi-row upsert
+
+    rows are (strain_id, thc_mg, mood, energy, focus, creativity, anxiety);
+    rows without a strain are skipped.
+    """
+    totals = {}
+    for strain_id, *measures in rows:
+        if strain_id is None:
+            continue
+        current = totals.setdefault(strain_id, [0, 0, 0, 0, 0, 0, 0])
+        current[0] += 1
+        for i, value in enumerate(measures, start=1):
+            current[i] += value
+
+    items = list(totals.items())
+    for start in range(0, len(items), _BATCH_CHUNK):
+        chunk = items[start:start + _BATCH_CHUNK]
+        values_sql = ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s, %s)'] * len(chunk))
+        params = []
+        for strain_id, sums in chunk:
+            params.extend((user_id, strain_id, *sums))
+        cur.execute(f"{_ROLLUP_COLUMNS} VALUES {values_sql} {_ADD_ON_CONFLICT}", tuple(params))
+
+
+def autocomplete(cur, prefix, limit=AUTOCOMPLETE_LIMIT):
+    """Catalog strains matching prefix, then fuzzy (trigram) matches
+
+    Returns [{'id', 'name'}]. Prefix matches walk the C-collated index on
+    strain_aliases.alias in order; the fuzzy fallback uses its trigram index.
+    """
+    key = normalize(prefix)
+    if key is None:
+        return []
+    pattern = key.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    # Several aliases can share a strain, so over-fetch and de-duplicate
+    cur.execute("""
+        SELECT s.id, s.name
+        FROM strain_aliases a JOIN strains s ON s.id = a.strain_id
+        WHERE a.alias COLLATE "C" LIKE %s
+        ORDER BY a.alias COLLATE "C"
+        LIMIT %s
+    """, (pattern, limit * 3))
+    results = []
+    for strain_id, name in cur.fetchall():
+        if len(results) < limit and all(r['id'] != strain_id for r in results):
+            results.append({'id': strain_id, 'name': name})
+
+    if len(results) < limit and len(key) >= 3:
+        seen = [r['id'] for r in results] or [0]
+        cur.execute("""
+            SELECT s.id, s.name, MAX(similarity(a.alias, %s)) AS score
+            FROM strain_aliases a JOIN strains s ON s.id = a.strain_id
+            WHERE a.alias %% %s AND NOT (s.id = ANY(%s))
+            GROUP BY s.id, s.name
+            HAVING MAX(similarity(a.alias, %s)) >= %s
+            ORDER BY score DESC, s.name
+            LIMIT %s
+        """, (key, key, seen, key, FUZZY_THRESHOLD, limit - len(results)))
+        results.extend({'id': row[0], 'name': row[1]} for row in cur.fetchall())
+    return results
+
+
+def user_strain_stats(cur, user_id, sort='sessions', limit=None):
+    """Per-strain aggregates for one user, read from strain_rollups"""
+    order = STRAIN_SORTS[sort]
+    sql = f"""
+        SELECT s.id, s.name, r.sessions, r.thc_mg_total,
+               r.mood_sum, r.energy_sum, r.focus_sum, r.creativity_sum, r.anxiety_sum
+        FROM strain_rollups r JOIN strains s ON s.id = r.strain_id
+        WHERE r.user_id = %s AND r.sessions > 0
+        ORDER BY {order}, s.name
+    """
+    params = (user_id,)
+    if limit:
+        sql += " LIMIT %s"
+        params += (limit,)
+    cur.execute(sql, params)
+
+    stats = []
+    for strain_id, name, sessions, total_mg, *sums in cur.fetchall():
+        stats.append({
+            'id': strain_id,
+            'name': name,
+            'sessions': sessions,
+            'total_thc_mg': round(float(total_mg), 2),
+            'avg_thc_mg': round(float(total_mg) / sessions, 2),
+            **{
+                f'avg_{effect}': round(value / sessions, 2)
+                for effect, value in zip(('mood', 'energy', 'focus', 'creativity', 'anxiety'), sums)
+            }
+        })
+    return stats
+
+
+def merge(cur, source_id, target_id):
+    """Fold strain source_id into target_id: aliases, entries and rollups
+
+    Affected users' data versions are bumped so cached per-strain responses
+    revalidate. The caller commits.
+    """
+    cur.execute("""
+        UPDATE users SET data_version = data_version + 1,
+                         data_updated_at = now() AT TIME ZONE 'utc'
+        WHERE id IN (SELECT user_id FROM strain_rollups WHERE strain_id = %s)
+    """, (source_id,))
+    cur.execute("UPDATE strain_aliases SET strain_id = %s WHERE strain_id = %s", (target_id, source_id))
+    cur.execute("UPDATE entries SET strain_id = %s WHERE strain_id = %s", (target_id, source_id))
+    cur.execute(f"""
+        {_ROLLUP_COLUMNS}
+        SELECT user_id, %s, sessions, thc_mg_total,
+               mood_sum, energy_sum, focus_sum, creativity_sum, anxiety_sum
+        FROM strain_rollups WHERE strain_id = %s
+        {_ADD_ON_CONFLICT}
+    """, (target_id, source_id))
+    cur.execute("DELETE FROM strain_rollups WHERE strain_id = %s", (source_id,))
+    cur.execute("DELETE FROM strains WHERE id = %s", (source_id,))
+
+
+def rebuild(cur, user_id=None):
+    """Link entries to catalog strains and recompute strain_rollups
+
+    Resolves every distinct strain spelling in entries (all users, or one),
+    sets entries.strain_id, and rebuilds the rollups from scratch. Returns
+    the number of rollup rows written. The caller commits.
+    """
+    user_filter, params = ("AND user_id = %s", (user_id,)) if user_id is not None else ("", ())
+    cur.execute(f"SELECT DISTINCT strain FROM entries WHERE strain IS NOT NULL {user_filter}", params)
+    spellings = [row[0] for row in cur.fetchall()]
+    ids = resolve_many(cur, spellings)
+    for start in range(0, len(spellings), _BATCH_CHUNK):
+        chunk = spellings[start:start + _BATCH_CHUNK]
+        values_sql = ', '.join(['(%s, %s::integer)'] * len(chunk))
+        values = [value for spelling in chunk for value in (spelling, ids.get(normalize(spelling)))]
+        cur.execute(f"""
+            UPDATE entries SET strain_id = v.strain_id
+            FROM (VALUES {values_sql}) AS v(strain, strain_id)
+            WHERE entries.strain = v.strain {user_filter}
+        """, tuple(values) + params)
+
+    cur.execute(f"DELETE FROM strain_rollups WHERE TRUE {user_filter}", params)
+    cur.execute(f"""
+        {_ROLLUP_COLUMNS}
+        SELECT user_id, strain_id, COUNT(*), COALESCE(SUM(thc_mg), 0),
+               SUM(mood), SUM(energy), SUM(focus), SUM(creativity), SUM(anxiety)
+        FROM entries
+        WHERE strain_id IS NOT NULL AND user_id IS NOT NULL {user_filter}
+        GROUP BY user_id, strain_id
+    """, params)
+    return cur.rowcount
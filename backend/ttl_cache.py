@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Bounded LRU cache with per-entry TTL and per-user invalidation
+
+    Keys are tuples whose first element identifies the user (id or
+    username) and is what invalidate_user() matches on. Writers call
+    invalidate_user() after committing; readers take generation() before
+    computing a value and pass it to set(), so a result computed from data
+    that was changed mid-flight is dropped instead of cached.
+
+    Invalidation is per process: with several workers, a write on one worker
+    leaves other workers' entries in place until the TTL expires them, so
+    callers that need cross-worker freshness put the user's data version in
+    the key.
+
+    Generations come from one clock ticked by every invalidation; only the
+    most recent max_size invalidations are remembered per user, and a user
+    forgotten since counts as invalidated at the newest forgotten tick, so
+    the bookkeeping stays bounded and errs towards not caching.
+    """
+
+    def __init__(self, max_size=1024, ttl=30.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._user_keys = {}
+        self._clock = 0
+        # user -> clock at their last invalidation, least recent first
+        self._invalidated = OrderedDict()
+        # Clock of the newest invalidation dropped from _invalidated
+        self._floor = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+            'stale_sets': 0,
+        }
+
+    def _discard(self, key):
+        self._data.pop(key, None)
+        keys = self._user_keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[key[0]]
+
+    def get(self, key):
+        """Return the cached value or None"""
+        if self.max_size <= 0:
+            return None
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._counters['misses'] += 1
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                self._discard(key)
+                self._counters['expirations'] += 1
+                self._counters['misses'] += 1
+                return None
+            self._data.move_to_end(key)
+            self._counters['hits'] += 1
+            return value
+
+    def generation(self, user_id):
+        """Token for set(): values computed after this call may be cached with it"""
+        with self._lock:
+            return self._clock
+
+    def set(self, key, value, generation):
+        """Cache value unless the user was invalidated since generation"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if self._invalidated.get(key[0], self._floor) > generation:
+                self._counters['stale_sets'] += 1
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            self._user_keys.setdefault(key[0], set()).add(key)
+            while len(self._data) > self.max_size:
+                oldest = next(iter(self._data))
+                self._discard(oldest)
+                self._counters['evictions'] += 1
+
+    def invalidate_user(self, user_id):
+        """Drop every cached value for a user"""
+        with self._lock:
+            self._clock += 1
+            self._invalidated[user_id] = self._clock
+            self._invalidated.move_to_end(user_id)
+            while len(self._invalidated) > max(self.max_size, 1):
+                _, self._floor = self._invalidated.popitem(last=False)
+            for key in list(self._user_keys.get(user_id, ())):
+                self._discard(key)
+            self._counters['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._user_keys.clear()
+            self._invalidated.clear()
+            self._floor = self._clock
+
+    def stats(self):
+        """Snapshot of size and hit/miss/eviction counters"""
+        with self._lock:
+            stats = {'size': len(self._data), 'max_size': self.max_size, 'ttl': self.ttl}
+            stats.update(self._counters)
+        return stats
@@ -3,4 +3,6 @@
 
 echo "Starting Cannabis Tracker API with Gunicorn..."
 cd backend
-gunicorn --bind 0.0.0.0:$PORT --workers 1 --timeout 120 main:app
+# Apply pending migrations first; concurrent runs serialise on an advisory lock
+flask --app main db-upgrade || exit 1
+gunicorn -c gunicorn.conf.py main:app
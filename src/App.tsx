@@ -234,12 +234,7 @@ const CannabisTracker = () => {
       });
 
       // Reload entries from the server to get the latest data
-      const [entriesData, statsData] = await Promise.all([
-        apiRequest('/entries'),
-        apiRequest('/entries/stats')
-      ]);
-      setEntries(entriesData);
-      setStatsData(statsData);
+      await manualLoadData();
       
       setShowForm(false);
       setFormData({
@@ -275,33 +270,35 @@ const CannabisTracker = () => {
 
   // Load stats on component mount and when entries change
   const [statsData, setStatsData] = useState<any>(null);
+  const [seriesData, setSeriesData] = useState<any[]>([]);
+
+  // Fetch the whole history by following next_cursor, one page at a time
+  const fetchAllEntries = async (): Promise<Entry[]> => {
+    const allEntries: Entry[] = [];
+    let cursor: string | null = null;
+    do {
+      const query: string = cursor ? `&cursor=${encodeURIComponent(cursor)}` : '';
+      const page: any = await apiRequest(`/entries?limit=500${query}`);
+      allEntries.push(...page.entries);
+      cursor = page.next_cursor;
+    } while (cursor);
+    return allEntries;
+  };
 
   // Manual data loading function
   const manualLoadData = async () => {
     if (!isAuthenticated || !authToken) return;
     
     try {
-      const headers: Record<string, string> = {
-        'Content-Type': 'application/json',
-        'Authorization': `Bearer ${authToken}`
-      };
-
-      const [entriesResponse, statsResponse] = await Promise.all([
-        fetch(`${API_BASE_URL}/entries`, { headers }),
-        fetch(`${API_BASE_URL}/entries/stats`, { headers })
-      ]);
-      
-      if (!entriesResponse.ok || !statsResponse.ok) {
-        throw new Error('API request failed');
-      }
-      
-      const [entriesData, statsData] = await Promise.all([
-        entriesResponse.json(),
-        statsResponse.json()
+      const [entriesData, statsData, seriesData] = await Promise.all([
+        fetchAllEntries(),
+        apiRequest('/entries/stats'),
+        apiRequest('/entries/stats/series?days=30')
       ]);
       
       setEntries(entriesData);
       setStatsData(statsData);
+      setSeriesData(seriesData.series);
     } catch (error) {
       console.error('Failed to load data:', error);
     }
@@ -333,36 +330,21 @@ const CannabisTracker = () => {
       weeklyTotal: statsData.weekly_total || 0,
       dailyAvg: statsData.daily_avg || 0,
       avgMood: statsData.avg_mood || 0,
-      totalSessions: statsData.total_sessions || 0
+      totalSessions: statsData.total_sessions || 0,
+      // All-time count from the server; older backends have no windows
+      allSessions: statsData.windows?.all?.sessions ?? null
     };
   }, [statsData]);
 
-  // Prepare chart data
+  // Prepare chart data from server-side daily buckets
   const chartData = useMemo(() => {
-    const last30Days = [];
-    for (let i = 29; i >= 0; i--) {
-      const date = new Date();
-      date.setDate(date.getDate() - i);
-      const dateStr = date.toISOString().split('T')[0];
-      
-      const dayEntries = entries.filter(e => e.date === dateStr);
-      const totalMg = dayEntries.reduce((sum, e) => sum + (e.thc_mg || e.thcMg || 0), 0);
-      const avgMood = dayEntries.length > 0 
-        ? dayEntries.reduce((sum, e) => sum + e.mood, 0) / dayEntries.length 
-        : null;
-      
-      last30Days.push({
-        date: date.toLocaleDateString('en', { month: 'short', day: 'numeric' }),
-        thc: totalMg,
-        mood: avgMood,
-        sessions: dayEntries.length
-      });
-    }
-    
-    // Chart data ready
-    
-    return last30Days;
-  }, [entries]);
+    return seriesData.map(day => ({
+      date: new Date(`${day.date}T00:00:00`).toLocaleDateString('en', { month: 'short', day: 'numeric' }),
+      thc: day.total_thc_mg,
+      mood: day.avg_mood,
+      sessions: day.sessions
+    }));
+  }, [seriesData]);
 
   const methodDistribution = useMemo(() => {
     const dist = entries.reduce((acc: {[key: string]: number}, e) => {
@@ -760,7 +742,8 @@ const CannabisTracker = () => {
                                await apiRequest(`/entries/${entry.id}`, {
                                  method: 'DELETE',
                                });
-                               setEntries(entries.filter(e => e.id !== entry.id));
+                               // Charts and stats come from the server, so reload them too
+                               await manualLoadData();
                              } catch (error: any) {
                                alert('Failed to delete entry: ' + error.message);
                              }
@@ -802,7 +785,7 @@ const CannabisTracker = () => {
               <div className="space-y-4">
                 <div className="bg-gradient-to-r from-purple-50 to-pink-50 p-4 rounded-lg">
                   <h4 className="font-semibold text-purple-900 mb-2">🎯 Quick Stats</h4>
-                  <p className="text-purple-700">You've tracked {entries.length} sessions. Your average mood is {stats?.avgMood.toFixed(1)}/10.</p>
+                  <p className="text-purple-700">You've tracked {stats?.allSessions ?? entries.length} sessions. Your average mood is {stats?.avgMood.toFixed(1)}/10.</p>
                 </div>
                 
                 <div className="bg-gradient-to-r from-green-50 to-blue-50 p-4 rounded-lg">